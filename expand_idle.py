@@ -0,0 +1,35 @@
+import sys, argparse
+
+from sim.idle_runs import expand_idle_runs
+
+
+def expand_file(result_file, output_file):
+    """ Expand the idle records of a consumption file written by run.py
+        with '--idle-runs', so it has one row per time slice.
+
+        Args:
+            result_file (string): consumption file
+            output_file (file): where the expanded lines are written
+    """
+    with open(result_file, 'rU') as f:
+        output_file.writelines(expand_idle_runs(f))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Expand the idle records of consumption files into '
+            'one row per time slice.')
+    parser.add_argument('result_file', nargs='+',
+            help='consumption file written with --idle-runs')
+    parser.add_argument('-o', '--output',
+            help='write the expanded file here instead of the standard '
+            'output')
+    args = parser.parse_args()
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            for result_file in args.result_file:
+                expand_file(result_file, output_file)
+    else:
+        for result_file in args.result_file:
+            expand_file(result_file, sys.stdout)
@@ -0,0 +1,247 @@
+import sys, math, argparse, multiprocessing
+
+sys.path.insert(0, './tools/cfg-wcec')
+
+from sim import sim_manager
+from sim.result_sink import NullResultSink
+from sim.path_cache import PathCache
+import run, sweep
+
+
+# normal quantile of the 95% confidence interval
+Z_95 = 1.959963984540054
+
+# simulation data of the replications: tuple (tasks as returned by
+# sweep.analyse_tasks(), freqs_volt, study, time slice, hyperperiods, approx
+# per cent). Paths are found only once, then _set_config() sets it in this
+# process and, as the initializer of the pool, in each process of the pool.
+_config = None
+
+
+class RunningStat(object):
+    """ Mean and variance of a sample updated online by Welford's method.
+
+        Attributes:
+            _n (int): number of values
+            _mean (float): mean of the values
+            _m2 (float): sum of squared differences from the mean
+    """
+    def __init__(self):
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self._n += 1
+        delta = value - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (value - self._mean)
+
+    def get_n(self):
+        return self._n
+
+    def get_mean(self):
+        return self._mean
+
+    def get_stdev(self):
+        if self._n < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (self._n - 1))
+
+    def get_half_width(self):
+        """ Returns (float) half width of the 95% confidence interval of the
+            mean, taking the normal distribution
+        """
+        if self._n < 2:
+            return float('inf')
+        return Z_95 * self.get_stdev() / math.sqrt(self._n)
+
+    def get_rel_precision(self):
+        """ Returns (float) half width divided by the absolute mean
+        """
+        if self._mean == 0:
+            return 0.0 if self.get_stdev() == 0 else float('inf')
+        return self.get_half_width() / abs(self._mean)
+
+
+def monte_carlo(config_file, study='mine', time_slice=20, hyperperiods=1,
+        replications=1000, seed=0, precision=None, min_replications=30,
+        approx_percent=0.15, jobs=1, exhaustive=True, path_cache=None):
+    """ Simulate independent replications where each job executes a random
+        path. Replication i uses the seed (seed + i), so its paths do not
+        depend on the number of processes. Statistics are updated as results
+        arrive in replication order and the simulation stops early once the
+        confidence interval of every mean is narrow enough.
+
+        Args:
+            config_file (string): configuration file of tasks
+            study (string): wfreq, valentin or mine
+            time_slice (float): slices of time that simulation data must be
+                collected
+            hyperperiods (int): how many times the LCM of tasks' periods must
+                be simulated in each replication
+            replications (int): maximum number of replications
+            seed (int): seed of the first replication
+            precision (float): stop when the half width of the 95% confidence
+                interval of each mean is at most this fraction of the mean. If
+                None, all replications are simulated
+            min_replications (int): replications simulated before checking
+                the precision
+            approx_percent (float): how much per cent from WCEC should be the
+                approximate best path
+            jobs (int): number of processes
+            exhaustive (boolean): if the approximated best path is chosen by
+                enumerating all paths
+            path_cache (PathCache): cache where paths are taken from
+
+        Returns:
+            (list) tuples (statistic name, RunningStat). Statistics are the
+                energy, the end time and, for each task, the mean and the
+                greatest response time and the number of deadline misses of a
+                replication
+    """
+    freqs_volt, tasks = sweep.analyse_tasks(config_file, [approx_percent],
+            exhaustive, path_cache)
+    if any(task[2][approx_percent] is None for task in tasks):
+        print 'approximate best path is not available'
+        sys.exit(1)
+    config = (tasks, freqs_volt, study, float(time_slice), hyperperiods,
+            approx_percent)
+    _set_config(config)
+
+    names = ['energy', 'end_time']
+    for prio in range(1, len(tasks) + 1):
+        names += ['rt_mean_%d' % prio, 'rt_max_%d' % prio, 'misses_%d' % prio]
+    stats = [(name, RunningStat()) for name in names]
+
+    seeds = xrange(seed, seed + replications)
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _set_config, (config,))
+        results = pool.imap(_replicate, seeds, max(1, min(16,
+                replications / (jobs * 4))))
+    else:
+        results = (_replicate(s) for s in seeds)
+
+    try:
+        for values in results:
+            for (name, stat), value in zip(stats, values):
+                stat.add(value)
+            if (precision is not None and
+                    stats[0][1].get_n() >= min_replications and
+                    _precise(stats, precision)):
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return stats
+
+def write_stats(stats, result_file):
+    """ Write the statistics returned by monte_carlo() in a CSV file.
+    """
+    with open(result_file, 'w') as f:
+        f.write('Statistic,N,Mean,StdDev,HalfWidth,Low,High\n')
+        for name, stat in stats:
+            mean = stat.get_mean()
+            half = stat.get_half_width()
+            f.write('%s,%d,%.4f,%.4f,%.4f,%.4f,%.4f\n' % (name, stat.get_n(),
+                    mean, stat.get_stdev(), half, mean - half, mean + half))
+
+def _precise(stats, precision):
+    """ Check if the means are known with the given relative precision.
+        Deadline misses are not taken into account, since they are usually
+        zero.
+    """
+    for name, stat in stats:
+        if name.startswith('misses_'):
+            continue
+        if stat.get_rel_precision() > precision:
+            return False
+    return True
+
+def _set_config(config):
+    """ Set the simulation data of the replications of this process.
+    """
+    global _config
+    _config = config
+
+def _replicate(seed):
+    """ Simulate one replication with the given seed.
+
+        Returns:
+            (list) values of the statistics of monte_carlo() in the same order
+    """
+    tasks, freqs_volt, study, time_slice, hyperperiods, per_cent = _config
+    suffix, valentin = run.STUDIES.get(study, run.STUDIES['mine'])
+
+    simManager = sim_manager.SimManager(time_slice)
+    for wpath, mpath, abpaths, wcec, deadline, period, jitter, init_freq \
+            in tasks:
+        simManager.add_task_paths(wpath, mpath, abpaths[per_cent], wcec,
+                deadline, period, jitter, init_freq, freqs_volt)
+    simManager.set_path_seed(seed)
+    simManager.set_result_sink(NullResultSink())
+
+    response_times = dict((prio, []) for prio in range(1, len(tasks) + 1))
+    simManager.set_job_hook(lambda task:
+            response_times[task.get_priority()].append(
+                task.get_response_time()))
+
+    # results are discarded, but the study is taken from the file name
+    simManager.run_sim('', valentin=valentin,
+            show_result='consumption-random-%s.csv' % suffix,
+            hyperperiods=hyperperiods)
+
+    values = [simManager.get_acc_energy(), simManager.get_end_time()]
+    for prio in range(1, len(tasks) + 1):
+        times = response_times[prio]
+        deadline = tasks[prio - 1][4]
+        values += [sum(times) / len(times), max(times),
+                sum(1 for t in times if t > deadline)]
+    return values
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Simulate replications where each job executes a '
+            'random path and summarize energy and response times.')
+    parser.add_argument('config_file')
+    parser.add_argument('study', help='wfreq, valentin or mine')
+    parser.add_argument('result_file')
+    parser.add_argument('--time-slice', type=float, default=20)
+    parser.add_argument('--hyperperiods', type=int, default=1)
+    parser.add_argument('-n', '--replications', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0,
+            help='seed of the first replication')
+    parser.add_argument('--precision', type=float,
+            help='stop when the 95%% confidence interval half width of each '
+            'mean is at most this fraction of the mean, e.g. 0.01')
+    parser.add_argument('--min-replications', type=int, default=30)
+    parser.add_argument('--approx', type=float, default=0.15,
+            help='approximation per cent of the best path')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+            help='number of processes to run replications in parallel')
+    parser.add_argument('--path-sums', action='store_true',
+            help='choose the approximated best path without enumerating '
+            'paths')
+    parser.add_argument('--path-cache', metavar='DIR',
+            help='keep the paths of each C file in this directory for the '
+            'next runs')
+    parser.add_argument('--max-paths', type=int, metavar='N',
+            help='keep at most N enumerated paths of a C file in memory; '
+            'older ones are spilled to a temporary file, but the RWCEC, '
+            'write count and file offset of every path stay in memory')
+    parser.add_argument('--cache-stats', action='store_true',
+            help='print path cache hits and misses at the end')
+    args = parser.parse_args()
+
+    path_cache = PathCache(args.path_cache, args.max_paths)
+
+    stats = monte_carlo(args.config_file, args.study, args.time_slice,
+            args.hyperperiods, args.replications, args.seed, args.precision,
+            args.min_replications, args.approx, args.jobs,
+            not args.path_sums, path_cache)
+    write_stats(stats, args.result_file)
+    if args.cache_stats:
+        print >> sys.stderr, path_cache.format_stats()
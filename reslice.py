@@ -0,0 +1,80 @@
+import os, glob, argparse
+
+from sim.energy_timeline import read_timelines
+
+
+def reslice(result_file_path, time_slice, output_path):
+    """ Write the consumption files of all binary traces of a result
+        directory with another time slice, without simulating again. Each
+        trace 'trace-<path>-<study>' gives the file
+        'consumption-<path>-<study>.csv', with one part for each simulation
+        as written by SimManager.
+
+        Energy is the one of the segments of the jobs, so a slice has the
+        exact energy of the part of each segment inside it. The simulation
+        rounds up the cycles of a node split by a slice, so values may
+        differ by that rounding from a simulation with the same time slice.
+
+        Args:
+            result_file_path (string): directory of the traces, written by
+                run.py with '--trace'
+            time_slice (float): width of the new slices
+            output_path (string): directory of the new consumption files
+
+        Returns:
+            (list) written consumption files
+    """
+    if not os.path.isdir(output_path):
+        os.makedirs(output_path)
+    written = []
+    for trace_dir in sorted(glob.glob(os.path.join(result_file_path,
+            'trace-*'))):
+        name = os.path.basename(trace_dir)[len('trace-'):]
+        result_file = os.path.join(output_path, 'consumption-%s.csv' % name)
+        with open(result_file, 'w') as f:
+            for timeline in read_timelines(trace_dir):
+                f.write('0,0,0\n')
+                for to_time, slice_energy, acc_energy in timeline.slices(
+                        time_slice):
+                    f.write('%.0f,%.2f,%.2f\n' % (to_time, slice_energy,
+                            acc_energy))
+        written.append(result_file)
+    return written
+
+def window_energy(trace_dir, start, end):
+    """ Returns (list) energy consumed in the window [start, end) by each
+        simulation of a binary trace
+    """
+    return [timeline.energy_between(start, end)
+            for timeline in read_timelines(trace_dir)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Write the consumption files of the binary traces of '
+            'a result directory with another time slice, or print the energy '
+            'of a time window, without simulating again.')
+    parser.add_argument('result_file_path',
+            help='directory of the traces written by run.py --trace')
+    parser.add_argument('time_slice', type=float, nargs='?')
+    parser.add_argument('output_path', nargs='?',
+            help='directory of the new consumption files')
+    parser.add_argument('--window', type=float, nargs=2,
+            metavar=('START', 'END'),
+            help='print the energy of each simulation of each trace in the '
+            'window [START, END)')
+    args = parser.parse_args()
+
+    if args.window is not None:
+        for trace_dir in sorted(glob.glob(os.path.join(args.result_file_path,
+                'trace-*'))):
+            energy = window_energy(trace_dir, *args.window)
+            print '%s,%s' % (os.path.basename(trace_dir),
+                    ','.join('%.2f' % e for e in energy))
+    elif args.time_slice is not None and args.output_path is not None:
+        for result_file in reslice(args.result_file_path, args.time_slice,
+                args.output_path):
+            print result_file
+    else:
+        parser.error('time_slice and output_path are needed without '
+                '--window')
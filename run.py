@@ -1,76 +1,275 @@
-import os, sys
+import os, sys, math, shutil, tempfile, argparse, multiprocessing
 
 sys.path.insert(0, './tools/cfg-wcec')
 
 from cfg import cfg
-from sim import cfg_paths, sim, sim_manager
+from sim import cfg_paths, sim, sim_manager, trace
+from sim.path_cache import PathCache
+from sim.shared_paths import SharedPaths
+from sim.path_trace import read_path_trace, random_path_trace
+
+
+# study name: (suffix of result files, if Valentin's idea should be used)
+STUDIES = {
+    'wfreq': ('wfreq', True), # sim.config wfreq
+    'valentin': ('v', True), # sim.config valentin
+    'mine': ('m', False) # sim-mine.config mine
+}
+
+# worst, middle and approximated best paths: (path name, result file name)
+PATHS = [('w', 'worst'), ('m', 'mid'), ('a', 'approx')]
+
+# random paths taken from a path trace, simulated after PATHS
+RANDOM_PATH = ('', 'random')
 
 
 def run(config_file='sim.config', study='wfreq', time_slice=20,
-        result_file_path=''):
+        result_file_path='', hyperperiods=1, with_trace=False,
+        exhaustive=True, path_cache=None, idle_runs=False, path_trace=None):
     """ Run simulation by first getting the task CFG, then simulating path
         execution on the given C file.
 
         Args:
             filename (string): name of C file
+            hyperperiods (int): how many times the LCM of tasks' periods must
+                be simulated
+            with_trace (boolean): if jobs must also be written in binary
+                traces
+            exhaustive (boolean): if the middle and the approximated best
+                paths are chosen by enumerating all paths, instead of by the
+                RWCEC computed by cfg_paths.PathSums
+            path_cache (PathCache): cache of the paths of C files. If it is
+                None, paths are found once for all paths of the study
+            idle_runs (boolean): if consecutive time slices without energy
+                are written as one idle record
+            path_trace (PathTrace): if it is given, random paths taken from
+                it are also simulated, in result files named 'random'
     """
     print 'start', study
 
-    # create simulation manager and set its configuration
+    # run simulation for worst, middle and approximated best paths
     time_slice = float(time_slice)
-    simManager = reset_config(config_file, time_slice)
+    if path_cache is None:
+        path_cache = PathCache()
+    for path_name, path_file in _paths(path_trace):
+        _run_path(config_file, study, path_name, path_file, time_slice,
+                result_file_path, hyperperiods, with_trace, exhaustive,
+                path_cache, idle_runs, path_trace)
 
-    # run simulation for worst, middle and approximated best paths
-    if study == 'wfreq': # sim.config wfreq
-        result_file = result_file_path + '/consumption-worst-wfreq.csv'
-        simManager.run_sim('w', valentin=True, show_result=result_file)
+    print 'end', study
 
-        result_file = result_file_path + '/consumption-mid-wfreq.csv'
-        simManager = reset_config(config_file, time_slice)
-        simManager.run_sim('m', valentin=True, show_result=result_file)
+def run_parallel(studies, time_slice=20, result_file_path='', hyperperiods=1,
+        jobs=2, with_trace=False, exhaustive=True, path_cache=None,
+        idle_runs=False, path_trace=None):
+    """ Run the simulation of all paths of all studies in a pool of
+        processes. Each simulation writes its results in its own directory,
+        then results are moved or appended to the result files in the same
+        order of a serial run, so files are the same as running each study
+        with run().
 
-        result_file = result_file_path + '/consumption-approx-wfreq.csv'
-        simManager = reset_config(config_file, time_slice)
-        simManager.run_sim('a', valentin=True, show_result=result_file)
+        Args:
+            studies (list): tuples (configuration file, study name)
+            time_slice (float): slices of time that simulation data must be
+                collected
+            result_file_path (string): directory of the result files
+            hyperperiods (int): how many times the LCM of tasks' periods must
+                be simulated
+            jobs (int): number of processes
+            with_trace (boolean): if jobs must also be written in binary
+                traces
+            exhaustive (boolean): if the middle and the approximated best
+                paths are chosen by enumerating all paths, instead of by the
+                RWCEC computed by cfg_paths.PathSums
+            path_cache (PathCache): cache of the paths of C files. Paths are
+                found before the processes are created, so each C file is
+                parsed only once, and processes map them from a SharedPaths
+                file instead of getting a copy.
+            idle_runs (boolean): if consecutive time slices without energy
+                are written as one idle record
+            path_trace (PathTrace): if it is given, random paths taken from
+                it are also simulated, in result files named 'random'
 
-    elif study == 'valentin': # sim.config valentin
-        result_file = result_file_path + '/consumption-worst-v.csv'
-        simManager.run_sim('w', valentin=True, show_result=result_file)
+        Returns:
+            (boolean) True if all simulations succeeded
+    """
+    time_slice = float(time_slice)
+    if path_cache is None:
+        path_cache = PathCache()
+    shared_paths = SharedPaths(path_cache)
+    for config_file, study in set(studies):
+        _find_paths(config_file, exhaustive, shared_paths)
+    work_path = None
+    try:
+        shared_paths.share()
+        work_path = tempfile.mkdtemp(prefix='.run-',
+                dir=result_file_path or '.')
+        paths = _paths(path_trace)
+        sims = []
+        for config_file, study in studies:
+            for path_name, path_file in paths:
+                work_dir = os.path.join(work_path, str(len(sims)))
+                os.mkdir(work_dir)
+                sims.append((config_file, study, path_name, path_file,
+                        time_slice, work_dir, hyperperiods, with_trace,
+                        exhaustive, shared_paths, idle_runs, path_trace))
 
-        result_file = result_file_path + '/consumption-mid-v.csv'
-        simManager = reset_config(config_file, time_slice)
-        simManager.run_sim('m', valentin=True, show_result=result_file)
+        pool = multiprocessing.Pool(jobs)
+        try:
+            done = pool.map(_run_path_job, sims)
+        finally:
+            pool.close()
+            pool.join()
 
-        result_file = result_file_path + '/consumption-approx-v.csv'
-        simManager = reset_config(config_file, time_slice)
-        simManager.run_sim('a', valentin=True, show_result=result_file)
+        succeeded = all(done)
+        if succeeded:
+            for i in range(0, len(sims)):
+                if i % len(paths) == 0:
+                    print 'start', sims[i][1]
+                work_dir = sims[i][5]
+                for name in sorted(os.listdir(work_dir)):
+                    _merge_result_file(os.path.join(work_dir, name),
+                            os.path.join(result_file_path, name))
+                if i % len(paths) == len(paths) - 1:
+                    print 'end', sims[i][1]
+    finally:
+        # the work directory and the shared paths are removed even if a
+        # simulation or a merge fails
+        shared_paths.close()
+        if work_path is not None:
+            shutil.rmtree(work_path)
+    return succeeded
 
-    else: # sim-mine.config mine
-        result_file = result_file_path + '/consumption-worst-m.csv'
-        simManager.run_sim('w', valentin=False, show_result=result_file)
+def load_path_trace(filename, config_file, hyperperiods=1, seed=None,
+        exhaustive=True, path_cache=None):
+    """ Read a path trace. If the file does not exist, the path of each job
+        released in the simulated hyperperiods of the tasks of a
+        configuration file is drawn and the trace is written in it, so all
+        studies and processes take the same random paths.
 
-        result_file = result_file_path + '/consumption-mid-m.csv'
-        simManager = reset_config(config_file, time_slice)
-        simManager.run_sim('m', valentin=False, show_result=result_file)
+        Args:
+            filename (string): path trace file
+            config_file (string): configuration file of the tasks
+            hyperperiods (int): how many times the LCM of tasks' periods is
+                simulated
+            seed (int): seed of the random paths, as
+                SimManager.set_path_seed(). If it is None, paths are seeded
+                from the system.
+            exhaustive (boolean): if all paths are enumerated to choose the
+                middle and the approximated best paths
+            path_cache (PathCache): cache where paths are taken from
+
+        Returns:
+            (PathTrace) trace of paths
+    """
+    if os.path.exists(filename):
+        return read_path_trace(filename)
+    simManager = reset_config(config_file, 1, exhaustive, path_cache)
+    stop_time = simManager.get_hyperperiod() * hyperperiods
+    jobs = {}
+    for task, wpath, mpath, abpath in simManager.get_tasks():
+        jobs[task.get_priority()] = int(math.ceil(stop_time /
+                task.get_period()))
+    path_trace = random_path_trace(jobs, seed)
+    path_trace.save(filename)
+    return path_trace
 
-        result_file = result_file_path + '/consumption-approx-m.csv'
-        simManager = reset_config(config_file, time_slice)
-        simManager.run_sim('a', valentin=False, show_result=result_file)
+def _paths(path_trace):
+    """ Returns (list) tuples (path name, result file name) of the paths
+        to be simulated
+    """
+    return PATHS + [RANDOM_PATH] if path_trace is not None else PATHS
 
-    print 'end', study
+def _result_files(study, path_file, result_file_path):
+    """ Returns (boolean) if Valentin's idea is used by the study, (string)
+        result file and (string) trace directory of a path of the study
+    """
+    suffix, valentin = STUDIES.get(study, STUDIES['mine'])
+    result_file = '%s/consumption-%s-%s.csv' % (result_file_path, path_file,
+            suffix)
+    trace_dir = '%s/trace-%s-%s' % (result_file_path, path_file, suffix)
+    return valentin, result_file, trace_dir
+
+def _run_path(config_file, study, path_name, path_file, time_slice,
+        result_file_path, hyperperiods, with_trace=False, exhaustive=True,
+        path_cache=None, idle_runs=False, path_trace=None):
+    """ Simulate one path of a study, writing results in the given
+        directory. The binary trace is written in the directory
+        'trace-<path>-<study>'.
+    """
+    valentin, result_file, trace_dir = _result_files(study, path_file,
+            result_file_path)
+    simManager = reset_config(config_file, time_slice, exhaustive,
+            path_cache, idle_runs, path_trace)
+    writer = None
+    if with_trace:
+        writer = trace.TraceWriter(trace_dir)
+        simManager.set_trace(writer)
+    try:
+        simManager.run_sim(path_name, valentin=valentin,
+                show_result=result_file, hyperperiods=hyperperiods)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def _run_path_job(args):
+    """ Entry point of pool processes. Returns False if simulation exited.
+    """
+    try:
+        _run_path(*args)
+    except SystemExit:
+        return False
+    return True
+
+def _merge_result_file(work_file, result_file):
+    """ Move a result file written by a parallel simulation to its place. If
+        the result file already exists, the new lines, or the new jobs of a
+        trace directory, are appended as a serial run does. Files are replaced
+        atomically by renaming.
 
-def reset_config(config_file, time_slice):
+        Args:
+            work_file (string): file written by the simulation
+            result_file (string): final result file
+    """
+    if not os.path.exists(result_file):
+        os.rename(work_file, result_file)
+        return
+    if os.path.isdir(work_file):
+        trace.append_trace(work_file, result_file)
+        return
+
+    with open(work_file, 'rU') as f:
+        lines = f.readlines()
+    # the header of detailed results is only written in new files
+    if os.path.basename(result_file).startswith('detailed-'):
+        lines = lines[1:]
+
+    tmp_file = result_file + '.tmp'
+    shutil.copyfile(result_file, tmp_file)
+    with open(tmp_file, 'a') as f:
+        f.writelines(lines)
+    os.rename(tmp_file, result_file)
+
+def reset_config(config_file, time_slice, exhaustive=True, path_cache=None,
+        idle_runs=False, path_trace=None):
     # create simulation manager and set its configuration
     simManager = sim_manager.SimManager(time_slice)
-    set_simulation_config(simManager, config_file)
+    simManager.set_idle_runs(idle_runs)
+    simManager.set_path_trace(path_trace)
+    set_simulation_config(simManager, config_file, exhaustive, path_cache)
     return simManager
 
-def set_simulation_config(simManager, config_file):
+def set_simulation_config(simManager, config_file, exhaustive=True,
+        path_cache=None):
     """ Get task and environment information of a configuration file.
 
         Args:
             simManager (SimManager): simulation manager object
             config_file_name (string): configuration file name
+            exhaustive (boolean): if all paths are enumerated to choose the
+                middle and the approximated best paths
+            path_cache (PathCache): cache where paths are taken from, or
+                SharedPaths of a pool of processes. If it is None, each C file
+                is parsed.
 
         Returns:
             (float) task's WCEC
@@ -79,9 +278,62 @@ def set_simulation_config(simManager, config_file):
             (dic) freqs_volt: dictionary where key is the frequency and supply
                 voltage to use the given frequency is the value
     """
+    if path_cache is not None:
+        freqs_volt, tasks = _find_paths(config_file, exhaustive, path_cache)
+        for wpath, mpath, abpath, wcec, deadline, period, jitter, init_freq \
+                in tasks:
+            simManager.add_task_paths(wpath, mpath, abpath, wcec, deadline,
+                    period, jitter, init_freq, freqs_volt)
+        return
+
+    freqs_volt, tasks = read_config(config_file)
+    for cfile, wcec, deadline, period, jitter, init_freq in tasks:
+        graph = cfg.CFG(cfile)
+        graph.make_cfg()
+        simManager.add_task_sim(
+                graph, wcec, deadline, period, jitter,
+                init_freq, freqs_volt, 0.15, exhaustive)
+
+def _find_paths(config_file, exhaustive, path_cache):
+    """ Get the paths of each task of a configuration file from a cache.
+        Exit if any approximated best path is not available, as
+        SimManager.add_task_sim() does.
+
+        Returns:
+            (dic) freqs_volt of the configuration file
+            (list) tuples (worst path, middle path, approximated best path,
+                WCEC, deadline, period, jitter, initial frequency)
+    """
+    freqs_volt, tasks = read_config(config_file)
+    found = []
+    for cfile, wcec, deadline, period, jitter, init_freq in tasks:
+        wpath, mpath, abpaths = path_cache.find_paths(cfile, [0.15],
+                exhaustive)
+        if abpaths[0.15] is None:
+            print 'approximate best path is not available'
+            sys.exit(1)
+        found.append((wpath, mpath, abpaths[0.15], wcec, deadline, period,
+                jitter, init_freq))
+    return freqs_volt, found
+
+def read_config(config_file):
+    """ Read a configuration file. The first two lines are the available
+        frequencies and their supply voltages. Then, each line is a task:
+        <C file> <WCEC> <deadline> <period> <jitter> <initial frequency>
+
+        Args:
+            config_file (string): configuration file name
+
+        Returns:
+            (dic) freqs_volt: dictionary where key is the frequency and supply
+                voltage to use the given frequency is the value
+            (list) tuples (C file, WCEC, deadline, period, jitter, initial
+                frequency), one for each task
+    """
     freqs = []
     volts = []
     freqs_volt = {}
+    tasks = []
     with open(config_file, 'rU') as f:
         lines = f.readlines()
         try:
@@ -104,14 +356,12 @@ def set_simulation_config(simManager, config_file):
 
                 cfile = data[0]
                 cfile = _find_file(config_file, cfile)
-                graph = cfg.CFG(cfile)
-                graph.make_cfg()
-                simManager.add_task_sim(
-                        graph, wcec, deadline, period, jitter,
-                        init_freq, freqs_volt, 0.15)
+                tasks.append((cfile, wcec, deadline, period, jitter,
+                        init_freq))
         except ValueError, IndexError:
             print 'Invalid data in config file'
             sys.exit(1)
+    return freqs_volt, tasks
 
 def write_path(path):
     """ Print RWCEC and the start line of each node of the given path in
@@ -136,7 +386,72 @@ def _find_file(config_file, cfile):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 5:
+    parser = argparse.ArgumentParser(
+            description='Simulate worst, middle and approximated best paths.')
+    parser.add_argument('config_file',
+            help='configuration file, or comma separated list of them')
+    parser.add_argument('study',
+            help='wfreq, valentin or mine, or comma separated list of them')
+    parser.add_argument('time_slice', type=float)
+    parser.add_argument('result_file_path')
+    parser.add_argument('hyperperiods', type=int, nargs='?', default=1)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+            help='number of processes to run simulations in parallel')
+    parser.add_argument('--trace', action='store_true',
+            help='also write each job in binary traces trace-<path>-<study>')
+    parser.add_argument('--path-sums', action='store_true',
+            help='choose middle and approximated best paths from the RWCEC '
+            'of all paths computed by dynamic programming, without '
+            'enumerating paths')
+    parser.add_argument('--path-cache', metavar='DIR',
+            help='keep the paths of each C file in this directory, so they '
+            'are loaded instead of found again by the next runs')
+    parser.add_argument('--clear-path-cache', action='store_true',
+            help='remove all files of the path cache before running')
+    parser.add_argument('--max-paths', type=int, metavar='N',
+            help='keep at most N enumerated paths of a C file in memory; '
+            'older ones are spilled to a temporary file, but the RWCEC, '
+            'write count and file offset of every path stay in memory')
+    parser.add_argument('--cache-stats', action='store_true',
+            help='print path cache hits and misses at the end')
+    parser.add_argument('--idle-runs', action='store_true',
+            help='write consecutive time slices without energy as one '
+            'record; expand_idle.py expands them')
+    parser.add_argument('--path-trace', metavar='FILE',
+            help='also simulate random paths taken from this path trace; '
+            'it is drawn and written first if it does not exist')
+    parser.add_argument('--path-seed', type=int, metavar='N',
+            help='seed of the random paths of a new path trace')
+    args = parser.parse_args()
+
+    config_files = args.config_file.split(',')
+    studies = args.study.split(',')
+    if len(config_files) == 1:
+        config_files *= len(studies)
+    if len(config_files) != len(studies):
         print 'Arguments not valid'
+        sys.exit(1)
+
+    path_cache = PathCache(args.path_cache, args.max_paths)
+    if args.clear_path_cache:
+        path_cache.clear()
+
+    path_trace = None
+    if args.path_trace:
+        path_trace = load_path_trace(args.path_trace, config_files[0],
+                args.hyperperiods, args.path_seed, not args.path_sums,
+                path_cache)
+
+    studies = zip(config_files, studies)
+    if args.jobs > 1:
+        if not run_parallel(studies, args.time_slice, args.result_file_path,
+                args.hyperperiods, args.jobs, args.trace,
+                not args.path_sums, path_cache, args.idle_runs, path_trace):
+            sys.exit(1)
     else:
-        run(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4])
+        for config_file, study in studies:
+            run(config_file, study, args.time_slice, args.result_file_path,
+                    args.hyperperiods, args.trace, not args.path_sums,
+                    path_cache, args.idle_runs, path_trace)
+    if args.cache_stats:
+        print >> sys.stderr, path_cache.format_stats()
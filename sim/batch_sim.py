@@ -0,0 +1,458 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from scheduler import FixedPriorityScheduler
+
+
+class BatchSim(object):
+    """ Simulates many independent task sets at once. The state of all
+        simulations is kept in NumPy arrays, one element for each task set,
+        or one row for each task set and one column for each task, and each
+        iteration moves every simulation by one call to consume energy. The
+        rules are the ones of SimManager and SimDVFS with a fixed priority
+        scheduler, so each task set consumes the same energy and ends at the
+        same time as when it is simulated alone.
+
+        The frequency changes of a job do not depend on time, so the
+        schedule of each path is taken from SimDVFS.get_schedule(), which
+        applies the type-B and type-L edge rules, once for all task sets where
+        it is the same. A job is then a sequence of chunks, each one executing
+        some cycles with one frequency, which are split by preemptions.
+
+        Args:
+            sims (list): tuples (SimManager, if Valentin's idea should be
+                used, file name to write simulation results), one for each
+                task set. Nothing is written, the file name only tells the
+                study.
+            path_name (string): path name 'w' (worst), 'm' (middle) or 'a'
+                (approximated best path)
+            hyperperiods (int): how many times the LCM of tasks' periods must
+                be simulated. All of them are simulated, so results match
+                SimManager.run_sim() up to floating point rounding if it is
+                greater than one.
+
+        Attributes:
+            _freq (array): frequency of each chunk
+            _cycles (array): cycles of each chunk
+            _volt_sq (array): square of the supply voltage of the frequency
+                of each chunk
+            _close (array): if the frequency changes before each chunk
+            _first (array): first chunk of the path of each task
+            _last (array): chunk after the last one of the path of each task
+            _sim_time (array): simulation time of each task set
+            _result_time (array): time until which energy was collected
+            _collect_time (array): end of the current time slice
+            _acc_energy (array): energy consumed since simulation start
+            _end_time (array): when the last job dispatched by the main loop
+                ended
+            _done (array): if the stop time of each task set was reached
+            _depth (array): number of started jobs that did not end, i.e.
+                the running job and the ones it preempted
+            _stack (array): priority index of the started jobs, from the
+                first one to the running one
+            _call (array): call time of the job of each task
+            _queued (array): if the job of each task is in the ready queue
+            _chunk (array): current chunk of the job of each task
+            _left (array): cycles of the current chunk not executed yet
+            _running (array): time spent running without preemption
+            _total (array): total run time of the job
+            _cpc (array): cycles consumed with the same frequency
+            _horizon (array): preemption horizon of the job
+            _stopped (array): time when the job was preempted
+            _before (array): time the job ran in the chunk before it was
+                preempted
+    """
+    def __init__(self, sims, path_name, hyperperiods=1):
+        if numpy is None:
+            raise ImportError('batched simulation needs numpy')
+        if path_name not in ('w', 'm', 'a'):
+            raise ValueError('path name must be w, m or a')
+        lanes = len(sims)
+        width = max(len(sims[i][0].get_tasks()) for i in range(0, lanes))
+        shape = (lanes, width)
+
+        self._sim_time = numpy.zeros(lanes)
+        self._result_time = numpy.zeros(lanes)
+        self._time_slice = numpy.zeros(lanes)
+        self._stop_time = numpy.zeros(lanes)
+        self._acc_energy = numpy.zeros(lanes)
+        self._end_time = numpy.zeros(lanes)
+        self._done = numpy.zeros(lanes, bool)
+        self._depth = numpy.zeros(lanes, int)
+        self._stack = numpy.zeros(shape, int)
+        self._index = numpy.arange(width)
+
+        self._call = numpy.zeros(shape)
+        self._jitter = numpy.zeros(shape)
+        self._period = numpy.zeros(shape)
+        self._queued = numpy.zeros(shape, bool)
+        self._first = numpy.zeros(shape, int)
+        self._last = numpy.zeros(shape, int)
+
+        self._chunk = numpy.zeros(shape, int)
+        self._left = numpy.zeros(shape)
+        self._running = numpy.zeros(shape)
+        self._total = numpy.zeros(shape)
+        self._cpc = numpy.zeros(shape)
+        self._start = numpy.zeros(shape)
+        self._horizon = numpy.zeros(shape)
+        self._stopped = numpy.zeros(shape)
+        self._before = numpy.zeros(shape)
+
+        chunks = _Chunks()
+        for lane in range(0, lanes):
+            simManager, valentin, result_file = sims[lane]
+            if not isinstance(simManager.get_scheduler(),
+                    FixedPriorityScheduler):
+                raise ValueError('only fixed priority is supported')
+            self._time_slice[lane] = simManager.get_time_slice()
+            self._stop_time[lane] = (simManager.get_hyperperiod() *
+                    hyperperiods)
+            tasks = simManager.get_tasks()
+            volt_sq = tasks[-1][0].get_processor().get_volt_sq()
+            for i in range(0, len(tasks)):
+                task, wpath, mpath, abpath = tasks[i]
+                path = {'w': wpath, 'm': mpath, 'a': abpath}[path_name]
+                self._first[lane, i], self._last[lane, i] = chunks.add(task,
+                        path, valentin, 'wfreq' in result_file, volt_sq)
+                self._jitter[lane, i] = task.get_jitter()
+                self._period[lane, i] = task.get_period()
+                self._queued[lane, i] = True
+        self._collect_time = self._time_slice.copy()
+
+        self._freq = numpy.array(chunks.freq)
+        self._cycles = numpy.array(chunks.cycles, float)
+        self._volt_sq = numpy.array(chunks.volt_sq)
+        self._close = numpy.array(chunks.close, bool)
+
+    def run(self):
+        """ Simulate all task sets until their stop time.
+
+            Returns:
+                (list) tuples (energy consumed, end time of the last job), one
+                    for each task set
+        """
+        while True:
+            idle = numpy.flatnonzero(~self._done & (self._depth == 0))
+            if len(idle):
+                self._dispatch(idle)
+            busy = numpy.flatnonzero(~self._done & (self._depth > 0))
+            if not len(busy):
+                break
+            self._step(busy)
+        return zip(self._acc_energy.tolist(), self._end_time.tolist())
+
+    def _dispatch(self, lanes):
+        """ Start the next job of task sets without any running job, as the
+            main loop of SimManager does, or stop them once their stop time
+            is reached.
+        """
+        sim_time = self._sim_time[lanes]
+        queued = self._queued[lanes]
+        call = self._call[lanes]
+        released = queued & (call < sim_time[:, None] + self._jitter[lanes])
+        tasks = numpy.where(released.any(1), released.argmax(1),
+                numpy.where(queued, call, numpy.inf).argmin(1))
+        call = self._call[lanes, tasks]
+        self._queued[lanes, tasks] = False
+
+        # no job runs until the call time
+        idle = sim_time < call
+        if idle.any():
+            self._sim_time[lanes[idle]] = call[idle]
+            self._skip_slices(lanes[idle], call[idle])
+
+        sim_time = self._sim_time[lanes]
+        stop = sim_time >= self._stop_time[lanes]
+        self._done[lanes[stop]] = True
+        go = ~stop
+        lanes = lanes[go]
+        tasks = tasks[go]
+        sim_time = sim_time[go]
+
+        # wait for the jitter
+        release = call[go] + self._jitter[lanes, tasks]
+        late = release > sim_time
+        wait = release[late] - sim_time[late]
+        self._result_time[lanes[late]] += wait
+        self._sim_time[lanes[late]] = sim_time[late] + wait
+        self._start_jobs(lanes, tasks)
+
+    def _step(self, lanes):
+        """ Execute the current chunk of the running job of the given task
+            sets, unless a job with higher priority is released before the
+            chunk ends, which then preempts it.
+        """
+        tasks = self._stack[lanes, self._depth[lanes] - 1]
+        chunk = self._chunk[lanes, tasks]
+        freq = self._freq[chunk]
+        left = self._left[lanes, tasks]
+        time_to_execute = left / freq
+        end = (self._sim_time[lanes] + self._running[lanes, tasks] +
+                time_to_execute)
+
+        preempt = numpy.zeros(len(lanes), bool)
+        by = numpy.zeros(len(lanes), int)
+        late = numpy.flatnonzero(end > self._horizon[lanes, tasks])
+        if len(late):
+            late_lanes = lanes[late]
+            released = self._queued[late_lanes] & (self._call[late_lanes] +
+                    self._jitter[late_lanes] < end[late, None])
+            by[late] = released.argmax(1)
+            preempt[late] = released.any(1) & (by[late] < tasks[late])
+
+        run = ~preempt
+        if run.any():
+            self._execute(lanes[run], tasks[run], chunk[run], freq[run],
+                    left[run], time_to_execute[run])
+        if preempt.any():
+            self._preempt(lanes[preempt], tasks[preempt], chunk[preempt],
+                    freq[preempt], by[preempt])
+
+    def _execute(self, lanes, tasks, chunk, freq, cycles, time_to_execute):
+        """ Execute the rest of the current chunk of the given jobs and move
+            them to the next chunk, or end them.
+        """
+        self._running[lanes, tasks] += time_to_execute
+        self._consume(lanes, freq, cycles, self._volt_sq[chunk])
+        cpc = self._cpc[lanes, tasks] + cycles
+
+        chunk = chunk + 1
+        ended = chunk == self._last[lanes, tasks]
+        self._cpc[lanes[ended], tasks[ended]] = cpc[ended]
+        more = ~ended
+        if more.any():
+            more_lanes = lanes[more]
+            more_tasks = tasks[more]
+            chunk = chunk[more]
+            cpc = cpc[more]
+            # keep the cycles of the frequency before it changes
+            close = self._close[chunk]
+            spent = close & (cpc > 0)
+            self._total[more_lanes[spent], more_tasks[spent]] += (cpc[spent] /
+                    freq[more][spent])
+            cpc[close] = 0
+            self._cpc[more_lanes, more_tasks] = cpc
+            self._chunk[more_lanes, more_tasks] = chunk
+            self._left[more_lanes, more_tasks] = self._cycles[chunk]
+        if ended.any():
+            self._end_jobs(lanes[ended], tasks[ended], freq[ended])
+
+    def _preempt(self, lanes, tasks, chunk, freq, by):
+        """ Stop the given jobs when the jobs of the tasks 'by' are released,
+            consuming the cycles executed until then, and start these ones.
+        """
+        sim_time = self._sim_time[lanes] + self._running[lanes, tasks]
+        release = self._call[lanes, by] + self._jitter[lanes, by]
+        before = release - sim_time
+        self._consume(lanes, freq, numpy.ceil(before * freq),
+                self._volt_sq[chunk])
+        self._sim_time[lanes] = release
+        self._stopped[lanes, tasks] = release
+        self._before[lanes, tasks] = before
+        self._start_jobs(lanes, by)
+
+    def _start_jobs(self, lanes, tasks):
+        """ Remove the jobs of the given tasks from the ready queue and run
+            them from the current simulation time.
+        """
+        self._queued[lanes, tasks] = False
+        first = self._first[lanes, tasks]
+        self._chunk[lanes, tasks] = first
+        self._left[lanes, tasks] = self._cycles[first]
+        self._running[lanes, tasks] = 0
+        self._total[lanes, tasks] = 0
+        self._cpc[lanes, tasks] = 0
+        self._start[lanes, tasks] = self._sim_time[lanes]
+        self._horizon[lanes, tasks] = self._next_release(lanes, tasks)
+        self._stack[lanes, self._depth[lanes]] = tasks
+        self._depth[lanes] += 1
+
+    def _end_jobs(self, lanes, tasks, freq):
+        """ End the given jobs, queue the next job of their tasks and go back
+            to the jobs they preempted, if any.
+        """
+        cpc = self._cpc[lanes, tasks]
+        total = self._total[lanes, tasks]
+        spent = cpc > 0
+        total[spent] += cpc[spent] / freq[spent]
+        self._total[lanes, tasks] = total
+        self._cpc[lanes, tasks] = 0
+        self._sim_time[lanes] += self._running[lanes, tasks]
+        self._call[lanes, tasks] += self._period[lanes, tasks]
+        self._queued[lanes, tasks] = True
+
+        depth = self._depth[lanes] - 1
+        self._depth[lanes] = depth
+        top = depth == 0
+        self._end_time[lanes[top]] = self._start[lanes[top], tasks[top]] + \
+                total[top]
+        nested = ~top
+        if nested.any():
+            lanes = lanes[nested]
+            self._resume(lanes, self._stack[lanes, depth[nested] - 1])
+
+    def _resume(self, lanes, tasks):
+        """ Start the next job that preempts the given ones, if any.
+            Otherwise, the given jobs go on from where they were preempted.
+        """
+        sim_time = self._sim_time[lanes]
+        released = self._queued[lanes] & (self._call[lanes] +
+                self._jitter[lanes] < sim_time[:, None])
+        by = released.argmax(1)
+        again = released.any(1) & (by < tasks)
+        if again.any():
+            self._start_jobs(lanes[again], by[again])
+
+        back = ~again
+        lanes = lanes[back]
+        tasks = tasks[back]
+        total = self._total[lanes, tasks] + (sim_time[back] -
+                self._stopped[lanes, tasks])
+        self._running[lanes, tasks] = 0
+        freq = self._freq[self._chunk[lanes, tasks]]
+        executed = numpy.ceil(self._before[lanes, tasks] * freq)
+        self._left[lanes, tasks] -= executed
+        cpc = self._cpc[lanes, tasks] + executed
+        spent = cpc > 0
+        total[spent] += cpc[spent] / freq[spent]
+        self._total[lanes, tasks] = total
+        self._cpc[lanes, tasks] = 0
+        self._horizon[lanes, tasks] = self._next_release(lanes, tasks)
+
+    def _next_release(self, lanes, tasks):
+        """ Returns (array) preemption horizon of the jobs of the given
+            tasks, i.e. the earliest release of a queued job with higher
+            priority
+        """
+        higher = self._queued[lanes] & (self._index < tasks[:, None])
+        return numpy.where(higher, self._call[lanes] + self._jitter[lanes],
+                numpy.inf).min(1)
+
+    def _consume(self, lanes, freq, cycles, volt_sq):
+        """ Consume the energy of executing some cycles, as
+            SimManager.energy_consumed() does. The cycles split by the end of
+            a time slice are rounded up on both sides.
+        """
+        exectime = cycles / freq
+        result_time = self._result_time[lanes]
+        collect_time = self._collect_time[lanes]
+        acc_energy = self._acc_energy[lanes]
+        inside = result_time + exectime < collect_time
+
+        # the time slice ends during the execution
+        diff = collect_time - result_time
+        same = diff == exectime
+        until = numpy.where(same, exectime, diff)
+        split_time = numpy.where(same, result_time, result_time + diff)
+        exectime_left = exectime - diff
+        split_energy = acc_energy + numpy.ceil(until * freq) * volt_sq
+        split_energy += numpy.ceil(exectime_left * freq) * volt_sq
+
+        self._acc_energy[lanes] = numpy.where(inside,
+                acc_energy + cycles * volt_sq, split_energy)
+        self._result_time[lanes] = numpy.where(inside,
+                result_time + exectime, split_time + exectime_left)
+        self._collect_time[lanes] = numpy.where(inside, collect_time,
+                collect_time + self._time_slice[lanes])
+
+    def _skip_slices(self, lanes, time):
+        """ Move the time slices of the given task sets to the given time,
+            while no job runs.
+        """
+        collect_time = self._collect_time[lanes]
+        time_slice = self._time_slice[lanes]
+        behind = numpy.flatnonzero(collect_time <= time)
+        while len(behind):
+            collect_time[behind] += time_slice[behind]
+            behind = behind[collect_time[behind] <= time[behind]]
+        self._collect_time[lanes] = collect_time
+        self._result_time[lanes] = time
+
+
+class _Chunks(object):
+    """ Chunks of the schedules of all paths, in flat lists. Task sets with
+        the same path, initial frequency and idea share the same chunks, if
+        overheads and processor can not change the schedule.
+
+        Attributes:
+            freq (list): frequency of each chunk
+            cycles (list): cycles of each chunk
+            volt_sq (list): square of the supply voltage of each chunk
+            close (list): if the frequency changes before each chunk
+            _ranges (dic): the key identifies a schedule and the value is
+                the tuple (first chunk, chunk after the last one)
+            _tables (dic): the key is the id() of a dictionary and the value
+                is the tuple (dictionary, its sorted items)
+    """
+    def __init__(self):
+        self.freq = []
+        self.cycles = []
+        self.volt_sq = []
+        self.close = []
+        self._ranges = {}
+        self._tables = {}
+
+    def add(self, task, path, valentin, wfreq, volt_sq):
+        """ Add the chunks of the schedule of a path, if they were not added
+            yet.
+
+            Args:
+                task (SimDVFS): task that executes the path
+                path (CFGPath): path
+                valentin (boolean): if Valentin's idea should be used
+                wfreq (boolean): if jobs start from the greatest frequency
+                volt_sq (dic): square of the supply voltage of each frequency
+                    used to compute energy
+
+            Returns:
+                (int) first chunk and (int) chunk after the last one
+        """
+        init_freq = task.get_init_freq()
+        if wfreq:
+            init_freq = task.get_processor().get_max_freq()
+        # with Valentin's idea, edges are not checked and the frequency does
+        # not change
+        rules = None
+        if not valentin:
+            rules = (task.get_overheads(),
+                    self._table(task.get_processor().get_freqs_volt()))
+        key = (path.get_plan(), init_freq, valentin, rules,
+                self._table(volt_sq))
+        chunk_range = self._ranges.get(key)
+        if chunk_range is not None:
+            return chunk_range
+
+        schedule = task.get_schedule(path, valentin, wfreq)
+        first = len(self.freq)
+        last_freq = None
+        for freq, cycles in schedule.energy_calls(schedule.get_steps()):
+            self.freq.append(freq)
+            self.cycles.append(cycles)
+            self.volt_sq.append(volt_sq[freq])
+            self.close.append(last_freq is not None and freq != last_freq)
+            last_freq = freq
+        chunk_range = self._ranges[key] = (first, len(self.freq))
+        return chunk_range
+
+    def _table(self, table):
+        """ Returns (tuple) items of a dictionary, kept once for each
+            dictionary object
+        """
+        items = self._tables.get(id(table))
+        if items is None:
+            items = self._tables[id(table)] = (table,
+                    tuple(sorted(table.items())))
+        return items[1]
+
+
+def run_batch(sims, path_name, hyperperiods=1):
+    """ Simulate many independent task sets at once with BatchSim.
+
+        Returns:
+            (list) tuples (energy consumed, end time of the last job), one for
+                each task set
+    """
+    return BatchSim(sims, path_name, hyperperiods).run()
@@ -1,41 +1,452 @@
-import sys, math
+import sys, math, heapq, itertools
+from collections import deque
 
 sys.path.insert(0, '../tools/cfg-wcec')
 
 from cfg.cfg import CFG
 from cfg.cfg_nodes import CFGNodeType, CFGEntryNode, CFGNode
+from spilled_paths import SpilledPaths
 
 
 class CFGPath(object):
     """ Hold path RWCEC and all nodes that made it
 
+        A path may also be given by linked tuples (node, node-wcec, previous
+        linked tuple or None), which are shared by all paths found from the
+        same nodes, so a new path does not copy the nodes it has in common
+        with others. Then, its nodes are the ones of each segment and the WCEC
+        of its loop condition nodes are the ones of its loops, which may be
+        different from the WCEC of their linked tuples.
+
         Args:
             rwcec (int): RWCEC of the given path
             path (list): list whose elements are tuple(node, node-wcec)
+            segments (tuple): instead of path, tuples (last linked tuple,
+                linked tuple before the first one or None) of each part of
+                the path
+            loops (tuple): for the path given by segments, four tuples with
+                the linked tuples, WCEC, index of the segment and RWCEC of the
+                path before them of its loop condition nodes, in the path
+                order. Paths that only differ by the WCEC of loop condition
+                nodes share the first and the third tuples.
+            plan (ExecPlan): path already compiled for simulation, e.g. when
+                it is loaded from a cache. Otherwise, it is compiled from the
+                path.
+
+        Attributes:
+            path (list): nodes of the path. If the path was given by segments,
+                it is built the first time it is needed.
+            plan (ExecPlan): path compiled for simulation. It is created the
+                first time it is needed.
     """
-    def __init__(self, rwcec, path):
+    __slots__ = ('_rwcec', '_path', '_segments', '_loops', '_plan')
+
+    def __init__(self, rwcec, path=None, segments=None, loops=((),) * 4,
+            plan=None):
         self._rwcec = rwcec
-        self._path = list(path)
+        self._path = list(path) if segments is None else None
+        self._segments = segments
+        self._loops = loops
+        self._plan = plan
 
     def get_path_rwcec(self):
         return self._rwcec
 
     def get_path(self):
+        if self._path is None:
+            self._path = _join_segments(self._segments, self._loops)
         return self._path
 
+    def get_segments(self):
+        return self._segments
+
+    def get_loops(self):
+        return self._loops
+
+    def get_plan(self):
+        """ Returns (ExecPlan) the path compiled for simulation
+        """
+        if self._plan is None:
+            self._plan = ExecPlan(self.get_path())
+        return self._plan
+
+
+class ExecPlan(object):
+    """ Path compiled into flat lists, one element for each step, so a
+        simulation does not look up CFG nodes of each job. Values are computed
+        by the same expressions used on CFG nodes and keep their types.
+
+        Edges are classified by the node of the step and its child:
+            NONE: there is not any check, e.g. the last node
+            TYPE_B: if node whose child RWCEC is less than the RWCEC of its
+                worst successor, so frequency may be changed
+            IF: if node whose child is its worst successor. Only the type-B
+                overhead is executed.
+            TYPE_L: loop condition node
+
+        Args:
+            path (list): list whose elements are tuple(node, node-wcec)
+
+        Attributes:
+            cycles (list): WCEC of each step
+            kinds (list): edge kind of each step
+            args (list): for TYPE_B, tuple (RWCEC of the worst successor, RWCEC
+                of the child). For TYPE_L, tuple (WCEC of one loop iteration,
+                RWCEC of the child, maximum iterations, iterations done at
+                runtime), or None if the loop has not any cycle per iteration.
+                Otherwise, None.
+    """
+    NONE = 0
+    TYPE_B = 1
+    IF = 2
+    TYPE_L = 3
+
+    def __init__(self, path):
+        self.cycles = [wcec for n, wcec in path]
+        self.kinds = []
+        self.args = []
+        for i in range(0, len(path)):
+            n, wcec = path[i]
+            kind = ExecPlan.NONE
+            args = None
+            if i + 1 < len(path):
+                child = path[i + 1][0]
+                if n.get_type() == CFGNodeType.IF:
+                    rwcec_succbi = n.get_rwcec() - n.get_wcec()
+                    rwcec_bj = child.get_rwcec()
+                    if rwcec_bj < rwcec_succbi:
+                        kind = ExecPlan.TYPE_B
+                        args = (rwcec_succbi, rwcec_bj)
+                    else:
+                        kind = ExecPlan.IF
+                elif n.get_type() == CFGNodeType.PSEUDO:
+                    kind = ExecPlan.TYPE_L
+                    args = self._loop_args(n, wcec, child)
+            self.kinds.append(kind)
+            self.args.append(args)
+
+    def __len__(self):
+        return len(self.cycles)
+
+    @classmethod
+    def from_columns(cls, cycles, kinds, args):
+        """ Get a plan already compiled, e.g. when it is loaded from a
+            cache, without any path.
+
+            Args:
+                cycles (sequence): WCEC of each step
+                kinds (sequence): edge kind of each step
+                args (sequence): values of the edge of each step
+
+            Returns:
+                (ExecPlan) plan with the given columns
+        """
+        plan = cls([])
+        plan.cycles = cycles
+        plan.kinds = kinds
+        plan.args = args
+        return plan
+
+    def _loop_args(self, n, loop_wcec, child):
+        """ Get the values of a type-L edge.
+
+            Args:
+                n (CFGNode): loop condition node
+                loop_wcec (float): loop RWCEC using all its iterations
+                child (CFGNode): child of n
+
+            Returns:
+                (tuple) WCEC of one loop iteration, RWCEC of the first node
+                    after the loop, maximum number of iterations and
+                    iterations done at runtime, or None if the WCEC of one
+                    iteration is zero
+        """
+        loop_max_iter = n.get_loop_iters()
+        loop_after_rwcec = child.get_rwcec()
+        if loop_max_iter != 0:
+            loop_wcec_once = ((n.get_refnode_rwcec() - n.get_wcec()) /
+                                loop_max_iter)
+        else:
+            loop_wcec_once = n.get_refnode_rwcec()
+        if loop_wcec_once == 0:
+            return None
+        runtime_iter = (loop_wcec - n.get_wcec()) / loop_wcec_once
+        return (loop_wcec_once, loop_after_rwcec, loop_max_iter, runtime_iter)
+
+
+class PathSums(object):
+    """ Set of the RWCEC of all paths of a CFG computed by dynamic programming
+        over its nodes, instead of enumerating paths. Loop condition nodes
+        which are not the first node take each RWCEC from zero to the maximum
+        number of iterations, as in the path enumeration.
+
+        Sets are bitsets: bit k of an integer is set if there is a path whose
+        RWCEC is k. So, node WCECs must be integers.
+
+        Args:
+            graph (CFG): control flow graph
+
+        Attributes:
+            _starts (list): first node of each entry node
+            _tails (dic): the key is id(node) and the value is the bitset of
+                the RWCEC of all paths from the children of the node to the
+                end of the CFG. It is 1 (only zero) if the node has not any
+                child.
+            _sums (int): bitset of the RWCEC of all paths
+    """
+    def __init__(self, graph):
+        self._starts = [entry.get_func_first_node()
+                for entry in graph.get_entry_nodes()]
+        self._tails = {}
+        self._counts = None
+        self._sums = 0
+        for start in self._starts:
+            self._compute_tails(start)
+            self._sums |= self._tails[id(start)] << _int_wcec(start.get_wcec())
+
+    def get_sums(self):
+        """ Returns (int) bitset of the RWCEC of all paths
+        """
+        return self._sums
+
+    def get_rwcecs(self):
+        """ Returns (list) RWCEC of all paths in increasing order
+        """
+        bits = bin(self._sums)[:1:-1]
+        return [i for i in xrange(0, len(bits)) if bits[i] == '1']
+
+    def __len__(self):
+        return bin(self._sums).count('1')
+
+    def __contains__(self, rwcec):
+        return rwcec >= 0 and (self._sums >> rwcec) & 1 == 1
+
+    def greatest_not_above(self, limit):
+        """ Returns (int) the greatest RWCEC less than or equal to the given
+            limit, or None if there is not any
+        """
+        if limit < 0:
+            return None
+        below = self._sums & ((1 << (int(limit) + 1)) - 1)
+        if below == 0:
+            return None
+        return below.bit_length() - 1
+
+    def get_counts(self):
+        """ Get how many paths have each RWCEC.
+
+            Returns:
+                (dic) the key is a RWCEC and the value is the number of paths
+        """
+        if self._counts is None:
+            tails = {}
+            counts = {}
+            for start in self._starts:
+                for n in _postorder(start, tails):
+                    tails[id(n)] = self._count_tail(n, tails)
+                for rwcec, count in tails[id(start)].iteritems():
+                    rwcec += _int_wcec(start.get_wcec())
+                    counts[rwcec] = counts.get(rwcec, 0) + count
+            self._counts = counts
+        return self._counts
+
+    def find_path(self, rwcec):
+        """ Build one path with the given RWCEC. At each node, children are
+            tried from the last one and loops from the maximum number of
+            iterations.
+
+            Args:
+                rwcec (int): RWCEC of the path
+
+            Returns:
+                (CFGPath) path or None if there is not any path with the given
+                    RWCEC
+        """
+        for start in reversed(self._starts):
+            remaining = rwcec - _int_wcec(start.get_wcec())
+            if remaining < 0 or not (self._tails[id(start)] >> remaining) & 1:
+                continue
+            path = [(start, start.get_wcec())]
+            n = start
+            while n.get_children():
+                n, wcec = self._next_step(n, remaining)
+                path.append((n, wcec))
+                remaining -= wcec
+            return CFGPath(rwcec, path)
+        return None
+
+    def _next_step(self, n, remaining):
+        """ Get a child of n and its WCEC in the path, so the remaining RWCEC
+            can still be reached.
+        """
+        for child in reversed(n.get_children()):
+            tail = self._tails[id(child)]
+            for wcec in reversed(_node_wcecs(child)):
+                rest = remaining - wcec
+                if rest >= 0 and (tail >> rest) & 1:
+                    return child, wcec
+        raise ValueError('RWCEC %d is not reachable' % remaining)
+
+    def _compute_tails(self, start):
+        for n in _postorder(start, self._tails):
+            tail = 0
+            for child in n.get_children():
+                child_tail = self._tails[id(child)]
+                for wcec in _node_wcecs(child):
+                    tail |= child_tail << wcec
+            self._tails[id(n)] = tail if n.get_children() else 1
+
+    def _count_tail(self, n, tails):
+        if not n.get_children():
+            return {0: 1}
+        counts = {}
+        for child in n.get_children():
+            child_tail = tails[id(child)]
+            for wcec in _node_wcecs(child):
+                for rwcec, count in child_tail.iteritems():
+                    rwcec += wcec
+                    counts[rwcec] = counts.get(rwcec, 0) + count
+        return counts
+
+def _postorder(start, done):
+    """ Returns (list) nodes reachable from start which are not in done,
+        in an order where children come before their parents
+    """
+    order = []
+    visited = set(done)
+    stack = [(start, False)]
+    while stack:
+        n, expanded = stack.pop()
+        if expanded:
+            order.append(n)
+            continue
+        if id(n) in visited:
+            continue
+        visited.add(id(n))
+        stack.append((n, True))
+        for child in n.get_children():
+            if id(child) not in visited:
+                stack.append((child, False))
+    return order
+
+def _loop_wcec(n, i):
+    """ Returns (int) WCEC of a loop condition node when the loop is done i
+        times
+    """
+    loop_wcec = n.get_refnode_rwcec() - n.get_wcec()
+    loop_wcec = float(loop_wcec) / n.get_loop_iters()
+    loop_wcec = n.get_wcec() + (loop_wcec * i)
+    return int(math.ceil(loop_wcec))
+
+def _node_wcecs(n):
+    """ Returns (list) WCECs that a node may have in a path, which are all
+        numbers of iterations if it is a loop condition node
+    """
+    if n.get_type() == CFGNodeType.PSEUDO:
+        return [_loop_wcec(n, i) for i in range(0, n.get_loop_iters() + 1)]
+    return [_int_wcec(n.get_wcec())]
+
+def _join_segments(segments, loops):
+    """ Returns (list) tuples (node, WCEC) of a path given by segments of
+        linked tuples and the WCEC of its loop condition nodes, as kept by
+        CFGPath
+    """
+    links, loop_wcecs = loops[:2]
+    wcecs = dict((id(links[i]), loop_wcecs[i]) for i in range(0, len(links)))
+    path = []
+    for link, stop in segments:
+        part = []
+        while link is not stop:
+            part.append((link[0], wcecs.get(id(link), link[1])))
+            link = link[2]
+        part.reverse()
+        path += part
+    return path
+
+def _spilled_data(path):
+    """ Returns (list) nodes of a path given by segments and (tuple) what
+        is needed to build it again: WCEC of the nodes, index of each loop
+        condition node in the path and RWCEC of the path before each one
+    """
+    links, loop_wcecs, segs, befores = path.get_loops()
+    loop_ids = dict((id(links[i]), i) for i in range(0, len(links)))
+    nodes = []
+    wcecs = []
+    positions = [0] * len(links)
+    for link, stop in path.get_segments():
+        part = []
+        while link is not stop:
+            part.append(link)
+            link = link[2]
+        part.reverse()
+        for link in part:
+            i = loop_ids.get(id(link))
+            if i is not None:
+                positions[i] = len(nodes)
+                wcecs.append(loop_wcecs[i])
+            else:
+                wcecs.append(link[1])
+            nodes.append(link[0])
+    return nodes, (wcecs, positions, befores)
+
+def _int_wcec(wcec):
+    if wcec != int(wcec):
+        raise ValueError('WCEC must be an integer: %s' % wcec)
+    return int(wcec)
+
 
 class CFGPaths(object):
     """ Find the worst. best and middle paths in a CFG, assuming that each
         given CFG is made by only one function. In other words, all C code must
         be inside 'main()'
 
+        Args:
+            exhaustive (boolean): if the approximate best and the middle paths
+                are chosen by enumerating all paths. Otherwise, the RWCEC of
+                all paths are computed by PathSums and only the chosen path is
+                built.
+            max_paths (int): how many enumerated paths are kept in memory.
+                When there are more, the older half of them is spilled to a
+                temporary file and read again when it is needed, so the same
+                paths are found in more time. The RWCEC of every path, the
+                number of paths written before it and the offset of a
+                spilled path stay in memory. If it is None, all paths are
+                kept in memory.
+
         Attributes:
             _all_paths (dic): holds all paths of a graph. The key is a path
-                RWCEC, whereas the value is a CFGPath object.
+                RWCEC, whereas the value is a CFGPath object, or the offset
+                of the path in _spilled if it was spilled.
+            _written (dic): the key is a path RWCEC and the value is the
+                number of paths kept in _all_paths before its current path
+            _loop_written (dic): the key is a loop condition node and the
+                value is the number of paths kept in _all_paths before it was
+                explored for the first time. A path kept before it does not
+                have the node, so it is not searched for the node.
+            _path_sums (PathSums): RWCEC of all paths of a graph, when paths
+                are not enumerated
+            _spilled (SpilledPaths): paths spilled from _all_paths, or None
+                if none was spilled
+            _spilled_before (int): the paths written before it were spilled
+            _in_memory (deque): tuples (number of paths written before it,
+                RWCEC) of the paths written since the last spill, oldest
+                first. An entry is stale if its path was written again later.
+            _paths_in_memory (int): number of paths in memory, which are the
+                ones of the entries of _in_memory that are not stale
     """
-    def __init__(self):
+    def __init__(self, exhaustive=True, max_paths=None):
+        self._exhaustive = exhaustive
+        self._max_paths = max_paths
+        self._spilled = None
+        self._spilled_before = 0
+        self._in_memory = deque()
+        self._paths_in_memory = 0
         self._all_paths = {}
+        self._written = {}
+        self._writes = 0
+        self._loop_written = {}
         self._visited_loops = {}
+        self._path_sums = None
 
     def find_worst_path(self, graph):
         """ Explore all graph to find the worst path based on RWCEC.
@@ -92,16 +503,24 @@ class CFGPaths(object):
         """
         wcep = self.find_worst_path(graph)
         if wcep is None: return None
+        if not self._exhaustive:
+            path_sums = self._find_path_sums(graph)
+            rwcec = path_sums.greatest_not_above(
+                    math.ceil(wcep.get_path_rwcec() * per_cent))
+            return path_sums.find_path(rwcec) if rwcec is not None else None
+
         all_paths = self._find_all_paths(graph)
         paths_rwcec = sorted(all_paths.keys())
         wcec = wcep.get_path_rwcec()
 
-        approx_path = None
+        approx_rwcec = None
         for rwcec in paths_rwcec:
             if rwcec > math.ceil(wcec * per_cent):
                 break
-            approx_path = self._all_paths[rwcec]
-        return approx_path
+            approx_rwcec = rwcec
+        if approx_rwcec is None:
+            return None
+        return self._cached_path(approx_rwcec)
 
     def find_middle_path(self, graph):
         """ From the list of all paths between worst and best RWCEC, return the
@@ -113,14 +532,71 @@ class CFGPaths(object):
                 paths whose RWCEC are less than the worst and greater than the
                 best one. Return None if there is not any path.
         """
+        if not self._exhaustive:
+            path_sums = self._find_path_sums(graph)
+            paths_rwcec = path_sums.get_rwcecs()
+            if paths_rwcec:
+                return path_sums.find_path(paths_rwcec[len(paths_rwcec) / 2])
+            return None
+
         all_paths = self._find_all_paths(graph)
         paths_rwcec = sorted(all_paths.keys())
         mid_rwcec_idx = len(paths_rwcec) / 2
 
         if mid_rwcec_idx < len(paths_rwcec):
-            return all_paths[paths_rwcec[mid_rwcec_idx]]
+            return self._cached_path(paths_rwcec[mid_rwcec_idx])
         return None
 
+    def iter_paths(self, graph, reverse=False):
+        """ Generate all paths of a graph sorted by RWCEC, without finding all
+            of them first. Partial paths are kept in a heap whose key is
+            their RWCEC plus the least (or the greatest) RWCEC from their last
+            node to the end of the CFG, so a complete path leaves the heap
+            only when no other path can come before it. Loop condition nodes
+            take each number of iterations, as in the path enumeration.
+
+            The generator may be stopped as soon as the wanted paths are
+            found, e.g. itertools.islice(iter_paths(graph, True), 10) are the
+            ten heaviest paths.
+
+            Args:
+                graph (CFG): control flow graph
+                reverse (boolean): if paths are generated from the greatest
+                    RWCEC to the least one
+
+            Returns:
+                (generator) CFGPath objects in increasing RWCEC order, or
+                    decreasing if reverse is True. Paths with the same RWCEC
+                    are all generated.
+        """
+        if not isinstance(graph, CFG): return
+
+        # RWCEC are negated to get the greatest ones first from the heap
+        sign = -1 if reverse else 1
+        bounds = {}
+        heap = []
+        order = itertools.count()
+        for entry in graph.get_entry_nodes():
+            start = entry.get_func_first_node()
+            for n in _postorder(start, bounds):
+                bounds[id(n)] = min([sign * wcec + bounds[id(child)]
+                        for child in n.get_children()
+                        for wcec in _node_wcecs(child)] or [0])
+            wcec = _int_wcec(start.get_wcec())
+            heapq.heappush(heap, (sign * wcec + bounds[id(start)],
+                    next(order), wcec, start, (start, wcec, None)))
+
+        while heap:
+            key, i, rwcec, n, path = heapq.heappop(heap)
+            if not n.get_children():
+                yield CFGPath(rwcec, segments=((path, None),))
+                continue
+            for child in n.get_children():
+                for wcec in _node_wcecs(child):
+                    heapq.heappush(heap, (sign * (rwcec + wcec) +
+                            bounds[id(child)], next(order), rwcec + wcec,
+                            child, (child, wcec, path)))
+
     def _find_all_paths(self, graph):
         """ Explore graph to find all paths.
 
@@ -129,25 +605,37 @@ class CFGPaths(object):
 
             Returns:
                 (dic) Returns a dic where the key is the path RWCEC and the
-                    value is the path itself.
+                    value is the path itself, or its offset if it was spilled.
         """
         if not isinstance(graph, CFG): return
 
         if self._all_paths == {}:
             for entry in graph.get_entry_nodes():
                 start_node = entry.get_func_first_node()
-                path = [(start_node, start_node.get_wcec())]
-                self._find_all_paths_visit(start_node, path,
+                path = (start_node, start_node.get_wcec(), None)
+                self._find_all_paths_visit(start_node, path, ((),) * 4,
                         start_node.get_wcec(), 0)
 
         return self._all_paths
 
+    def _find_path_sums(self, graph):
+        """ Returns (PathSums) RWCEC of all paths of the graph, computed once
+            as all paths are
+        """
+        if self._path_sums is None:
+            self._path_sums = PathSums(graph)
+        return self._path_sums
+
     def _find_worst_path(self, n, path):
         """ Use RWCEC as base to know which child of current node guides the
             execution to the worst case. Since all nodes store the RWCEC,
             starting from them, it is easier to know the worst case from the
             root node in the CFG.
 
+            The path is followed by a loop instead of recursion, so long CFGs
+            are not limited by the recursion limit. The RWCEC is summed from
+            the last node to the first, as it was by recursion.
+
             Args:
                 n (CFGNode): node of CFG
                 path (list): a list to keep track of the worst path
@@ -155,23 +643,27 @@ class CFGPaths(object):
             Returns:
                 RWCEC of the worst path
         """
-        if not isinstance(n, CFGNode): return 0
+        wcecs = []
+        while isinstance(n, CFGNode):
+            path.append((n, n.get_wcec()))
+            next_node = None
+            for child in n.get_children():
+                if (next_node == None or
+                        child.get_rwcec() > next_node.get_rwcec()):
+                    next_node = child
 
-        path.append((n, n.get_wcec()))
-        next_node = None
-        for child in n.get_children():
-            if next_node == None or child.get_rwcec() > next_node.get_rwcec():
-                next_node = child
-
-        if next_node is None:
-            return n.get_wcec()
-        elif n.get_type() == CFGNodeType.PSEUDO:
-            path.remove((n, n.get_wcec()))
-            path.append((n, n.get_refnode_rwcec()))
-            return (n.get_refnode_rwcec() +
-                    self._find_worst_path(next_node, path))
+            if next_node is None:
+                wcecs.append(n.get_wcec())
+                return _sum_from_last(wcecs, wcecs.pop())
+            elif n.get_type() == CFGNodeType.PSEUDO:
+                path.remove((n, n.get_wcec()))
+                path.append((n, n.get_refnode_rwcec()))
+                wcecs.append(n.get_refnode_rwcec())
+            else:
+                wcecs.append(n.get_wcec())
+            n = next_node
 
-        return n.get_wcec() + self._find_worst_path(next_node, path)
+        return _sum_from_last(wcecs, 0)
 
     def _find_best_path(self, n, path):
         """ Use RWCEC as base to know which child of current node guides the
@@ -186,6 +678,8 @@ class CFGPaths(object):
             not any loop iteration, only the loop condition WCEC is used,
             because to not enter in the loop, its condition can not be true.
 
+            As the worst path, the path is followed by a loop.
+
             Args:
                 n (CFGNode): node of CFG
                 path (list): a list to keep track of the best path
@@ -193,19 +687,23 @@ class CFGPaths(object):
             Returns:
                 RWCEC of the best path
         """
-        if not isinstance(n, CFGNode): return 0
+        wcecs = []
+        while isinstance(n, CFGNode):
+            path.append((n, n.get_wcec()))
+            next_node = None
+            for child in n.get_children():
+                if (next_node == None or
+                        child.get_rwcec() < next_node.get_rwcec()):
+                    next_node = child
 
-        path.append((n, n.get_wcec()))
-        next_node = None
-        for child in n.get_children():
-            if next_node == None or child.get_rwcec() < next_node.get_rwcec():
-                next_node = child
+            wcecs.append(n.get_wcec())
+            if next_node is None:
+                return _sum_from_last(wcecs, wcecs.pop())
+            n = next_node
 
-        if next_node is None:
-            return n.get_wcec()
-        return n.get_wcec() + self._find_best_path(next_node, path)
+        return _sum_from_last(wcecs, 0)
 
-    def _find_all_paths_visit(self, n, path, newrwcec, bestrwcec):
+    def _find_all_paths_visit(self, n, path, loops, newrwcec, bestrwcec):
         """ Find all possible paths from a CFG is explore and compute their
             RWCEC computed. By the end, when CFG's last node is reached, check
             if the RWCEC of this new path is better from the previous one. If
@@ -223,9 +721,22 @@ class CFGPaths(object):
             Note II: for each path found, even if it is not the best one, keep
             it in cached to be reused.
 
+            Paths are kept as linked tuples (node, node-wcec, previous tuple),
+            so all paths found from a node share the tuples of the nodes
+            before it, as described in CFGPath.
+
+            The CFG is explored with an explicit stack instead of recursion,
+            so deep CFGs are not limited by the recursion limit. Each element
+            of the stack is the state of a node being explored, a _VisitFrame
+            or a _LoopFrame, and nodes are explored in the same order as by
+            recursion.
+
             Args:
                 n (CFGNode): current node
-                path (list): keep tracking of current path nodes
+                path (tuple): keep tracking of current path nodes as the linked
+                    tuple of n
+                loops (tuple): loop condition nodes of the current path, as
+                    kept by CFGPath
                 newrwcec (int): RWCEC of the new path explored
                 bestrwcec (int): best RWCEC reached until now
 
@@ -234,99 +745,297 @@ class CFGPaths(object):
         """
         if not isinstance(n, CFGNode): return
 
-        tmp_path = cfg_path = None
-        for child in n.get_children():
-            if child.get_type() != CFGNodeType.PSEUDO:
-                data = (child, child.get_wcec())
-                path.append(data)
-                tmp_path = self._find_all_paths_visit(child, path,
-                        newrwcec + child.get_wcec(), bestrwcec)
-                path.remove(data)
-            else:
-                tmp_path = self._find_all_paths_loops(child, path, newrwcec,
-                            bestrwcec)
+        stack = [_VisitFrame(n, path, loops, newrwcec, bestrwcec)]
+        # path found from the last explored node, and if there is any
+        returned = False
+        found = None
+        while stack:
+            frame = stack[-1]
+            if isinstance(frame, _LoopFrame):
+                child = self._find_all_paths_loops(frame, returned, found)
+                returned = False
+                if child is not None:
+                    stack.append(child)
+                    continue
+                stack.pop()
+                returned = True
+                found = frame.cfg_path
+                continue
 
             # set the greatest cfg path
-            if (tmp_path is not None
-                    and (cfg_path is None or tmp_path.get_path_rwcec() >
-                        cfg_path.get_path_rwcec())):
-                cfg_path = tmp_path
-                bestrwcec = cfg_path.get_path_rwcec()
+            if returned:
+                returned = False
+                if (found is not None
+                        and (frame.cfg_path is None or found.get_path_rwcec()
+                            > frame.cfg_path.get_path_rwcec())):
+                    frame.cfg_path = found
+                    frame.bestrwcec = found.get_path_rwcec()
 
-        # get a new cfg path whose RWCEC is valid
-        if n.get_children() == []:
-            # keep the found path in cache
-            self._all_paths[newrwcec] = CFGPath(newrwcec, path)
-            if newrwcec > bestrwcec:
-                cfg_path = CFGPath(newrwcec, path)
+            path = frame.path
+            loops = frame.loops
+            newrwcec = frame.newrwcec
+            bestrwcec = frame.bestrwcec
+            children = frame.children
+            i = frame.next_child
+            if i < len(children):
+                frame.next_child = i + 1
+                child = children[i]
+                if child.get_type() != CFGNodeType.PSEUDO:
+                    if isinstance(child, CFGNode):
+                        stack.append(_VisitFrame(child,
+                                (child, child.get_wcec(), path), loops,
+                                newrwcec + child.get_wcec(), bestrwcec))
+                        continue
+                    found = None
+                elif child.get_start_line() in self._visited_loops:
+                    found = self._find_visited_loop_paths(child, path, loops,
+                            newrwcec, bestrwcec)
+                else:
+                    self._loop_written[child] = self._writes
+                    stack.append(_LoopFrame(child, path, loops, newrwcec,
+                            bestrwcec, len(self._all_paths)))
+                    continue
+                returned = True
+                continue
 
-        return cfg_path
+            # get a new cfg path whose RWCEC is valid
+            cfg_path = frame.cfg_path
+            if children == []:
+                # keep the found path in cache
+                segments = ((path, None),)
+                self._keep_path(CFGPath(newrwcec, segments=segments,
+                        loops=loops))
+                if newrwcec > bestrwcec:
+                    cfg_path = CFGPath(newrwcec, segments=segments,
+                            loops=loops)
 
-    def _find_all_paths_loops(self, child, path, newrwcec, bestrwcec):
-        tmp_path = cfg_path = None
+            stack.pop()
+            returned = True
+            found = cfg_path
+
+        return found
+
+    def _find_visited_loop_paths(self, child, path, loops, newrwcec,
+            bestrwcec):
+        """ Find all paths through a loop condition node that was already
+            explored, by reusing the paths found from it after the current
+            path.
+
+            A path found from the loop is reused by sharing its segments from
+            the loop node, so each new path costs only its loop condition
+            nodes. They are searched instead of all nodes of each path, since
+            a loop condition node is only in a path as one of them.
 
-        if child.get_start_line() in self._visited_loops:
-            paths_visited = self._visited_loops[child.get_start_line()]
-            for rwcec in list(self._all_paths):
-                if paths_visited == 0:
+            Args:
+                child (CFGNode): loop condition node
+                path (tuple): current path nodes as the linked tuple of the
+                    parent of child
+                loops (tuple): loop condition nodes of the current path
+                newrwcec (int): RWCEC of the current path
+                bestrwcec (int): best RWCEC reached until now
+
+            Returns:
+                CFGPath object
+        """
+        tmp_path = cfg_path = None
+        paths_visited = self._visited_loops[child.get_start_line()]
+        written = self._written
+        since = self._loop_written.get(child, -1)
+        for rwcec in list(self._all_paths):
+            if paths_visited == 0:
+                break
+            if written[rwcec] < since:
+                continue
+            found_path = self._all_paths[rwcec]
+            if not isinstance(found_path, CFGPath):
+                found_path = self._read_path(rwcec, found_path)
+            links, wcecs, segs, befores = found_path.get_loops()
+            index = -1
+            for i in range(0, len(links)):
+                node = links[i][0]
+                if node == child:
+                    index = i
                     break
-                found_path = self._all_paths[rwcec].get_path()
-                index = -1
-                for i in range(0, len(found_path)):
-                    node = found_path[i][0]
-                    if node == child:
-                        index = i
-                        break
-                if index > -1:
-                    new_path = path + list(found_path[index:])
-                    newrwcec = 0
-                    for node, wcec in new_path:
-                        newrwcec += wcec
-                    tmp_path = CFGPath(newrwcec, new_path)
-                    if newrwcec not in self._all_paths:
-                        paths_visited -= 1
-                    self._all_paths[newrwcec] = tmp_path
-                    if newrwcec > bestrwcec:
-                        bestrwcec = tmp_path.get_path_rwcec()
-                        if (cfg_path is None or tmp_path.get_path_rwcec() >
-                                    cfg_path.get_path_rwcec()):
-                            cfg_path = tmp_path
-                            bestrwcec = cfg_path.get_path_rwcec()
-            return cfg_path
-
-        prev_all_paths_length = len(self._all_paths)
-        for i in range(0, child.get_loop_iters() + 1):
+            if index > -1:
+                # segments of the found path from the loop node
+                seg = segs[index]
+                before = befores[index]
+                found_segments = found_path.get_segments()
+                new_segments = (((path, None),
+                        (found_segments[seg][0], links[index][2])) +
+                        found_segments[seg + 1:])
+                new_loops = (loops[0] + links[index:],
+                        loops[1] + wcecs[index:],
+                        loops[2] + tuple(found_seg - seg + 1
+                            for found_seg in segs[index:]),
+                        loops[3] + tuple(newrwcec + (found_before - before)
+                            for found_before in befores[index:]))
+                new_rwcec = newrwcec + (rwcec - before)
+                tmp_path = CFGPath(new_rwcec, segments=new_segments,
+                        loops=new_loops)
+                if new_rwcec not in self._all_paths:
+                    paths_visited -= 1
+                self._keep_path(tmp_path)
+                if new_rwcec > bestrwcec:
+                    bestrwcec = tmp_path.get_path_rwcec()
+                    if (cfg_path is None or tmp_path.get_path_rwcec() >
+                                cfg_path.get_path_rwcec()):
+                        cfg_path = tmp_path
+                        bestrwcec = cfg_path.get_path_rwcec()
+        return cfg_path
+
+    def _keep_path(self, path):
+        """ Keep a found path in cache by its RWCEC, replacing any path with
+            the same RWCEC, and count it as written. If there are more paths
+            in memory than max_paths, paths are spilled.
+        """
+        rwcec = path.get_path_rwcec()
+        written = self._written
+        if written.get(rwcec, -1) < self._spilled_before:
+            self._paths_in_memory += 1
+        self._all_paths[rwcec] = path
+        written[rwcec] = self._writes
+        if self._max_paths is not None:
+            self._in_memory.append((self._writes, rwcec))
+            if (self._paths_in_memory > self._max_paths or
+                    len(self._in_memory) > 2 * self._max_paths):
+                self._spill()
+        self._writes += 1
+
+    def _spill(self):
+        """ Drop the stale entries of the paths in memory and, if there are
+            more paths in memory than max_paths, write the older half of
+            them to the spilled paths, and keep their offset instead. Only
+            the paths in memory are looked at, so each spill takes time in
+            proportion to max_paths.
+        """
+        written = self._written
+        live = [(stamp, rwcec) for stamp, rwcec in self._in_memory
+                if written[rwcec] == stamp]
+        spills = 0
+        if len(live) > self._max_paths:
+            if self._spilled is None:
+                self._spilled = SpilledPaths()
+            spills = len(live) / 2
+            for stamp, rwcec in live[:spills]:
+                nodes, data = _spilled_data(self._all_paths[rwcec])
+                self._all_paths[rwcec] = self._spilled.write(nodes, data)
+            self._spilled_before = live[spills][0]
+        self._in_memory = deque(live[spills:])
+        self._paths_in_memory = len(self._in_memory)
+
+    def _read_path(self, rwcec, offset):
+        """ Returns (CFGPath) spilled path, as a path of only one segment
+            with the same nodes and loop condition nodes as when it was
+            found
+        """
+        nodes, (wcecs, positions, befores) = self._spilled.read(offset)
+        links = []
+        link = None
+        for n, wcec in zip(nodes, wcecs):
+            link = (n, wcec, link)
+            links.append(link)
+        loops = (tuple(links[i] for i in positions),
+                tuple(wcecs[i] for i in positions), (0,) * len(positions),
+                befores)
+        return CFGPath(rwcec, segments=((link, None),), loops=loops)
+
+    def _cached_path(self, rwcec):
+        """ Returns (CFGPath) path of _all_paths with the given RWCEC, which
+            is read if it was spilled
+        """
+        path = self._all_paths[rwcec]
+        if not isinstance(path, CFGPath):
+            path = self._read_path(rwcec, path)
+        return path
+
+    def _find_all_paths_loops(self, frame, returned, found):
+        """ Find all paths through a loop condition node that was not
+            explored yet, by doing the loop from zero to its maximum number
+            of iterations. The loop is explored from the first number of
+            iterations, and a path that does the loop another number of times
+            shares all segments of the path it comes from.
+
+            It goes on from the state kept in the frame until the loop node
+            must be explored, or until all numbers of iterations are done.
+
+            Args:
+                frame (_LoopFrame): state of the loop condition node
+                returned (boolean): if the loop node was explored since the
+                    last call
+                found (CFGPath): path found by exploring the loop node
+
+            Returns:
+                (_VisitFrame) frame of the loop node to explore, or None if
+                    all paths through the loop were found
+        """
+        child = frame.child
+        path = frame.path
+        loops = frame.loops
+        newrwcec = frame.newrwcec
+        bestrwcec = frame.bestrwcec
+        i = frame.iteration
+        cfg_path = frame.cfg_path
+        tmp_path = frame.tmp_path
+        while i < child.get_loop_iters() + 1:
             loop_wcec = child.get_refnode_rwcec() - child.get_wcec()
             loop_wcec = float(loop_wcec) / child.get_loop_iters()
             loop_wcec = child.get_wcec() + (loop_wcec * i)
             loop_wcec = int(math.ceil(loop_wcec))
 
-            if (self._all_paths == {}
+            if returned:
+                returned = False
+                tmp_path = found
+                self._visited_loops[child.get_start_line()] = 1
+            elif (self._all_paths == {}
                     or child.get_start_line() not in self._visited_loops):
-                data = (child, loop_wcec)
-                path.append(data)
-                tmp_path = self._find_all_paths_visit(child, path,
+                frame.save(newrwcec, bestrwcec, i, cfg_path, tmp_path)
+                link = (child, loop_wcec, path)
+                if not isinstance(child, CFGNode):
+                    returned = True
+                    found = None
+                    continue
+                return _VisitFrame(child, link,
+                        (loops[0] + (link,), loops[1] + (loop_wcec,),
+                            loops[2] + (0,), loops[3] + (newrwcec,)),
                         newrwcec + loop_wcec, bestrwcec)
-                path.remove(data)
-                self._visited_loops[child.get_start_line()] = 1
             else:
                 prev_loop_wcec = child.get_refnode_rwcec() - child.get_wcec()
                 prev_loop_wcec = float(prev_loop_wcec) / child.get_loop_iters()
                 prev_loop_wcec = child.get_wcec() + (prev_loop_wcec * (i - 1))
                 prev_loop_wcec = int(math.ceil(prev_loop_wcec))
                 data = (child, prev_loop_wcec)
+                written = self._written
+                since = self._loop_written[child]
                 for rwcec in list(self._all_paths):
-                    if data in self._all_paths[rwcec].get_path():
-                        new_path = list(self._all_paths[rwcec].get_path())
-                        index = new_path.index(data)
-                        new_data = (child, loop_wcec)
-                        new_path[index] = new_data
+                    if written[rwcec] < since:
+                        continue
+                    found_path = self._all_paths[rwcec]
+                    if not isinstance(found_path, CFGPath):
+                        found_path = self._read_path(rwcec, found_path)
+                    links, wcecs, segs, befores = found_path.get_loops()
+                    index = -1
+                    for j in range(0, len(links)):
+                        if (links[j][0], wcecs[j]) == data:
+                            index = j
+                            break
+                    if index > -1:
+                        new_loops = (links,
+                                wcecs[:index] + (loop_wcec,) +
+                                    wcecs[index + 1:],
+                                segs,
+                                befores[:index + 1] + tuple(found_before -
+                                    prev_loop_wcec + loop_wcec for
+                                    found_before in befores[index + 1:]))
                         newrwcec = rwcec - prev_loop_wcec + loop_wcec
                         # keep the found path in cache
-                        self._all_paths[newrwcec] = CFGPath(newrwcec,
-                                new_path)
+                        self._keep_path(CFGPath(newrwcec,
+                                segments=found_path.get_segments(),
+                                loops=new_loops))
                         if newrwcec > bestrwcec:
-                            tmp_path = CFGPath(newrwcec, new_path)
+                            tmp_path = CFGPath(newrwcec,
+                                    segments=found_path.get_segments(),
+                                    loops=new_loops)
                             bestrwcec = tmp_path.get_path_rwcec()
 
             # set the greatest cfg path by exploring each loop iteration
@@ -335,7 +1044,86 @@ class CFGPaths(object):
                         cfg_path.get_path_rwcec())):
                 cfg_path = tmp_path
                 bestrwcec = cfg_path.get_path_rwcec()
+            i += 1
 
-        found_paths_num = len(self._all_paths) - prev_all_paths_length
+        found_paths_num = len(self._all_paths) - frame.all_paths_length
         self._visited_loops[child.get_start_line()] = found_paths_num
-        return cfg_path
+        frame.cfg_path = cfg_path
+        return None
+
+
+class _VisitFrame(object):
+    """ State of a node explored by CFGPaths._find_all_paths_visit().
+
+        Attributes:
+            n (CFGNode): node
+            path (tuple): linked tuple of the node
+            loops (tuple): loop condition nodes of the path, as kept by
+                CFGPath
+            newrwcec (int): RWCEC of the path
+            bestrwcec (int): best RWCEC reached until now
+            children (list): children of the node
+            next_child (int): index of the next child to explore
+            cfg_path (CFGPath): greatest path found from the node, or None
+    """
+    __slots__ = ('n', 'path', 'loops', 'newrwcec', 'bestrwcec', 'children',
+            'next_child', 'cfg_path')
+
+    def __init__(self, n, path, loops, newrwcec, bestrwcec):
+        self.n = n
+        self.path = path
+        self.loops = loops
+        self.newrwcec = newrwcec
+        self.bestrwcec = bestrwcec
+        self.children = n.get_children()
+        self.next_child = 0
+        self.cfg_path = None
+
+
+class _LoopFrame(object):
+    """ State of a loop condition node explored by
+        CFGPaths._find_all_paths_loops().
+
+        Attributes:
+            child (CFGNode): loop condition node
+            path (tuple): linked tuple of the parent of the node
+            loops (tuple): loop condition nodes of the path
+            newrwcec (int): RWCEC of the path
+            bestrwcec (int): best RWCEC reached until now
+            iteration (int): number of iterations being explored
+            cfg_path (CFGPath): greatest path found, or None
+            tmp_path (CFGPath): last path found, or None
+            all_paths_length (int): number of paths found before the loop
+    """
+    __slots__ = ('child', 'path', 'loops', 'newrwcec', 'bestrwcec',
+            'iteration', 'cfg_path', 'tmp_path', 'all_paths_length')
+
+    def __init__(self, child, path, loops, newrwcec, bestrwcec,
+            all_paths_length):
+        self.child = child
+        self.path = path
+        self.loops = loops
+        self.newrwcec = newrwcec
+        self.bestrwcec = bestrwcec
+        self.iteration = 0
+        self.cfg_path = None
+        self.tmp_path = None
+        self.all_paths_length = all_paths_length
+
+    def save(self, newrwcec, bestrwcec, iteration, cfg_path, tmp_path):
+        """ Keep the state of the loop before the node is explored.
+        """
+        self.newrwcec = newrwcec
+        self.bestrwcec = bestrwcec
+        self.iteration = iteration
+        self.cfg_path = cfg_path
+        self.tmp_path = tmp_path
+
+
+def _sum_from_last(wcecs, rwcec):
+    """ Returns the given RWCEC plus all WCEC, added from the last to the
+        first one
+    """
+    for wcec in reversed(wcecs):
+        rwcec = wcec + rwcec
+    return rwcec
@@ -0,0 +1,125 @@
+import bisect
+from array import array
+
+from trace import TraceReader
+
+
+class EnergyTimeline(object):
+    """ Energy consumed over time by the jobs of one simulation, kept as the
+        boundaries of their segments and the energy consumed until each one.
+        A segment runs with only one frequency, so energy grows linearly
+        inside it, and it does not grow while no job runs. Then, the energy
+        consumed until any time is found by bisection, and the energy of any
+        window or of time slices of any width is found without simulating
+        again.
+
+        Args:
+            segments (list): tuples (start time, end time, energy) of the
+                segments of all jobs, in any order
+            end (float): simulation time when the simulation stopped. If it
+                is None, the end of the last segment is used.
+
+        Attributes:
+            _times (array): boundaries of the segments, in time order
+            _energy (array): energy consumed until each boundary, i.e. its
+                prefix sum
+    """
+    def __init__(self, segments, end=None):
+        self._times = array('d')
+        self._energy = array('d')
+        acc_energy = 0.0
+        last = 0.0
+        for start, stop, energy in sorted(segments):
+            # segments do not overlap, but times may be rounded
+            start = max(start, last)
+            stop = max(stop, start)
+            self._times.extend((start, stop))
+            self._energy.extend((acc_energy, acc_energy + energy))
+            acc_energy += energy
+            last = stop
+        self._end = last if end is None else end
+
+    def __len__(self):
+        return len(self._times)
+
+    def get_end(self):
+        """ Returns (float) simulation time when the simulation stopped
+        """
+        return self._end
+
+    def get_total(self):
+        """ Returns (float) energy consumed by all jobs
+        """
+        return self._energy[-1] if self._energy else 0.0
+
+    def energy_at(self, time):
+        """ Returns (float) energy consumed from time zero until the given
+            time
+        """
+        i = bisect.bisect_right(self._times, time)
+        if i == 0:
+            return 0.0
+        if i == len(self._times):
+            return self._energy[-1]
+        t0 = self._times[i - 1]
+        t1 = self._times[i]
+        e0 = self._energy[i - 1]
+        return e0 + (self._energy[i] - e0) * (time - t0) / (t1 - t0)
+
+    def energy_between(self, start, end):
+        """ Returns (float) energy consumed in the window [start, end)
+        """
+        return self.energy_at(end) - self.energy_at(start)
+
+    def slices(self, time_slice):
+        """ Energy of each time slice until the simulation stopped, as
+            written in consumption files by SimManager.
+
+            Args:
+                time_slice (float): width of the slices
+
+            Returns:
+                (list) tuples (time when the slice ends, energy consumed
+                    during the slice, energy consumed since time zero)
+        """
+        rows = []
+        acc_energy = 0.0
+        to_time = time_slice
+        while to_time <= self._end:
+            energy = self.energy_at(to_time)
+            rows.append((to_time, energy - acc_energy, energy))
+            acc_energy = energy
+            to_time += time_slice
+        return rows
+
+
+def read_timelines(directory):
+    """ Read the energy timeline of each simulation of a binary trace. Jobs
+        of a simulation that did not stop are not read.
+
+        Args:
+            directory (string): trace directory
+
+        Returns:
+            (list) EnergyTimeline objects, in the order of the simulations
+    """
+    reader = TraceReader(directory)
+    try:
+        seg_counts = reader.column('segments')
+        seg_start = reader.column('seg_start')
+        seg_end = reader.column('seg_end')
+        seg_energy = reader.column('seg_energy')
+        timelines = []
+        job = 0
+        seg = 0
+        for jobs, sim_end in zip(reader.column('jobs'),
+                reader.column('sim_end')):
+            count = sum(seg_counts[job:job + jobs])
+            timelines.append(EnergyTimeline(zip(seg_start[seg:seg + count],
+                    seg_end[seg:seg + count], seg_energy[seg:seg + count]),
+                    sim_end))
+            job += jobs
+            seg += count
+        return timelines
+    finally:
+        reader.close()
@@ -0,0 +1,42 @@
+# first field of a record of consecutive time slices without energy
+IDLE_RUN = '#idle'
+
+
+def format_idle_run(to_time, time_slice, count, acc_energy):
+    """ Format consecutive time slices without energy as one record. The
+        record starts with '#', so gnuplot skips it as a comment. Times are
+        written with repr(), so the expander finds the same slice ends.
+
+        Args:
+            to_time (float): time when the first slice ends
+            time_slice (float): width of the slices
+            count (int): number of slices
+            acc_energy (float): energy consumed since simulation start
+
+        Returns:
+            (string) record line
+    """
+    return '%s,%r,%r,%d,%.2f\n' % (IDLE_RUN, to_time, time_slice, count,
+            acc_energy)
+
+def expand_idle_runs(lines):
+    """ Expand the idle records of a consumption file into one row per time
+        slice, as written without idle records. Other lines are not changed.
+
+        Args:
+            lines (iterable): lines of a consumption file
+
+        Yields:
+            (string) lines of the expanded file
+    """
+    for line in lines:
+        if not line.startswith(IDLE_RUN + ','):
+            yield line
+            continue
+        fields = line.rstrip('\r\n').split(',')
+        to_time = float(fields[1])
+        time_slice = float(fields[2])
+        acc_energy = fields[4]
+        for i in xrange(0, int(fields[3])):
+            yield '%.0f,0.00,%s\n' % (to_time, acc_energy)
+            to_time += time_slice
@@ -0,0 +1,235 @@
+import os, sys, glob, hashlib, tempfile, cPickle
+
+sys.path.insert(0, '../tools/cfg-wcec')
+
+from cfg import cfg
+import cfg_paths
+from cfg_paths import CFGPath, CFGPaths, ExecPlan
+
+
+# version of the data stored by the cache. It must be changed whenever it
+# changes, so old files are not used.
+CACHE_VERSION = 1
+
+_SUFFIX = '.paths'
+
+
+class PathCache(object):
+    """ Keep the worst, middle and approximated best paths of C files, so a
+        CFG is parsed and its paths are found only once. Paths are kept in
+        memory and, if a directory is given, in files named by a hash of the
+        contents of the C file, the analysis parameters and the version of
+        the tools, i.e. the sources of the cfg package and of cfg_paths. So,
+        if any of them changes, the old file is not used anymore.
+
+        Paths are kept without their CFG: each node is only its start line,
+        and the path is already compiled for simulation. So, the same paths
+        are returned when they are found and when they are loaded.
+
+        Args:
+            directory (string): directory of the cache files. It is created
+                if it does not exist. If it is None, paths are only kept in
+                memory.
+            max_paths (int): how many enumerated paths are kept in memory
+                while paths are found, as by CFGPaths. The same paths are
+                found with any of them, so it is not part of the hash.
+
+        Attributes:
+            _entries (dic): the key is the hash of an entry and the value is
+                a tuple (worst path, middle path, dic of approximated best
+                paths by per cent)
+            _stats (dic): number of memory hits, disk hits, misses, files
+                stored and files that could not be read
+    """
+    def __init__(self, directory=None, max_paths=None):
+        self._directory = directory
+        self._max_paths = max_paths
+        self._entries = {}
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                'stores': 0, 'errors': 0}
+        self._tool_version = None
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def find_paths(self, cfile, approx_percents=(0.15,), exhaustive=True):
+        """ Get the paths of a C file from the cache, or find them and keep
+            them in the cache.
+
+            Args:
+                cfile (string): C file of the task
+                approx_percents (list): how much per cent from WCEC should be
+                    the approximate best path
+                exhaustive (boolean): if all paths are enumerated to choose
+                    the middle and the approximated best paths
+
+            Returns:
+                (CFGPath) worst path
+                (CFGPath) middle path
+                (dic) approximated best paths by per cent. A path is None if
+                    there is not any.
+        """
+        key = self._key(cfile, approx_percents, exhaustive)
+        paths = self._entries.get(key)
+        if paths is not None:
+            self._stats['memory_hits'] += 1
+            return paths
+
+        data = self._load(key)
+        if data is not None:
+            self._stats['disk_hits'] += 1
+        else:
+            self._stats['misses'] += 1
+            data = _analyse(cfile, approx_percents, exhaustive,
+                    self._max_paths)
+            self._store(key, data)
+        wdata, mdata, abdata = data
+        paths = (_from_data(wdata), _from_data(mdata),
+                dict((per_cent, _from_data(d)) for per_cent, d in abdata))
+        self._entries[key] = paths
+        return paths
+
+    def clear(self):
+        """ Remove all paths from memory and all files of the cache
+            directory.
+        """
+        self._entries = {}
+        if self._directory is not None:
+            for filename in glob.glob(os.path.join(self._directory,
+                    '*' + _SUFFIX)):
+                os.remove(filename)
+
+    def get_stats(self):
+        """ Returns (dic) number of memory hits, disk hits, misses, files
+            stored, files that could not be read, and the number and total
+            size of the files in the cache directory
+        """
+        stats = dict(self._stats)
+        stats['files'] = 0
+        stats['bytes'] = 0
+        if self._directory is not None:
+            for filename in glob.glob(os.path.join(self._directory,
+                    '*' + _SUFFIX)):
+                stats['files'] += 1
+                stats['bytes'] += os.path.getsize(filename)
+        return stats
+
+    def format_stats(self):
+        """ Returns (string) cache stats as shown to the user
+        """
+        return ('path cache: %(memory_hits)d memory hits, %(disk_hits)d disk '
+                'hits, %(misses)d misses, %(stores)d stored, %(errors)d '
+                'errors, %(files)d files (%(bytes)d bytes)' %
+                self.get_stats())
+
+    def _key(self, cfile, approx_percents, exhaustive):
+        """ Returns (string) hash of the C file contents, the analysis
+            parameters and the tools version
+        """
+        if self._tool_version is None:
+            self._tool_version = _tool_version()
+        with open(cfile, 'rb') as f:
+            source = hashlib.sha1(f.read()).hexdigest()
+        params = repr((sorted(set(approx_percents)), bool(exhaustive)))
+        return hashlib.sha1('\n'.join([self._tool_version, source,
+                params])).hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self._directory, key + _SUFFIX)
+
+    def _load(self, key):
+        """ Returns (tuple) data stored by _store(), or None if there is not
+            any file or it could not be read
+        """
+        if self._directory is None:
+            return None
+        try:
+            with open(self._filename(key), 'rb') as f:
+                stored_key, data = cPickle.load(f)
+        except IOError:
+            return None
+        except (cPickle.UnpicklingError, EOFError, ValueError, TypeError,
+                AttributeError, ImportError, IndexError, KeyError):
+            # truncated or corrupted files, or files of older classes
+            self._stats['errors'] += 1
+            return None
+        if stored_key != key:
+            self._stats['errors'] += 1
+            return None
+        return data
+
+    def _store(self, key, data):
+        """ Write data in a new file, which is renamed to its name so other
+            processes never read a partial file.
+        """
+        if self._directory is None:
+            return
+        fd, tmp_file = tempfile.mkstemp(suffix='.tmp', dir=self._directory)
+        with os.fdopen(fd, 'wb') as f:
+            cPickle.dump((key, data), f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, self._filename(key))
+        self._stats['stores'] += 1
+
+
+class CachedNode(object):
+    """ Node of a path kept by PathCache. Only its start line is kept, which
+        is what is shown of each node of a path.
+    """
+    __slots__ = ('_start_line',)
+
+    def __init__(self, start_line):
+        self._start_line = start_line
+
+    def get_start_line(self):
+        return self._start_line
+
+
+def _analyse(cfile, approx_percents, exhaustive, max_paths=None):
+    """ Parse a C file and find its paths.
+
+        Returns:
+            (tuple) data of the worst path, of the middle path and list of
+                tuples (per cent, data of the approximated best path), as
+                returned by _to_data()
+    """
+    graph = cfg.CFG(cfile)
+    graph.make_cfg()
+    paths_finder = CFGPaths(exhaustive, max_paths)
+    wpath = paths_finder.find_worst_path(graph)
+    mpath = paths_finder.find_middle_path(graph)
+    abdata = [(per_cent, _to_data(paths_finder.find_approximate_best_path(
+            graph, per_cent))) for per_cent in sorted(set(approx_percents))]
+    return (_to_data(wpath), _to_data(mpath), abdata)
+
+def _to_data(path):
+    """ Returns (tuple) RWCEC, start lines of the nodes, WCEC of the nodes and
+        the lists of the compiled plan of a path, or None if there is not any
+        path
+    """
+    if path is None:
+        return None
+    nodes = path.get_path()
+    plan = path.get_plan()
+    return (path.get_path_rwcec(), [n.get_start_line() for n, wcec in nodes],
+            [wcec for n, wcec in nodes], (plan.cycles, plan.kinds, plan.args))
+
+def _from_data(data):
+    """ Returns (CFGPath) path whose data was returned by _to_data()
+    """
+    if data is None:
+        return None
+    rwcec, lines, wcecs, (cycles, kinds, args) = data
+    plan = ExecPlan.from_columns(cycles, kinds, args)
+    return CFGPath(rwcec, [(CachedNode(line), wcec) for line, wcec in
+            zip(lines, wcecs)], plan=plan)
+
+def _tool_version():
+    """ Returns (string) hash of the sources of the cfg package and of
+        cfg_paths, which make the paths
+    """
+    sources = glob.glob(os.path.join(os.path.dirname(cfg.__file__), '*.py'))
+    sources.append(os.path.splitext(cfg_paths.__file__)[0] + '.py')
+    version = hashlib.sha1(str(CACHE_VERSION))
+    for filename in sorted(sources):
+        with open(filename, 'rb') as f:
+            version.update(f.read())
+    return version.hexdigest()
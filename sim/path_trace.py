@@ -0,0 +1,124 @@
+import os
+from random import Random
+
+
+# version of the path trace format, written in its header
+PATH_TRACE_VERSION = 1
+
+# path names by their 2-bit code
+PATH_NAMES = 'wma'
+
+_CODES = dict((path_name, code) for code, path_name in enumerate(PATH_NAMES))
+
+
+class PathTrace(object):
+    """ Path executed by each job of random path simulations, indexed by
+        task's priority and job number, so the same random paths can be
+        simulated by any study, in any process. Each path is a 2-bit code, 0
+        for the worst, 1 for the middle and 2 for the approximated best path,
+        packed four jobs per byte.
+
+        Attributes:
+            _codes (dic): the key is task's priority and the value is a
+                bytearray of the packed codes of its jobs
+            _jobs (dic): the key is task's priority and the value is the
+                number of its jobs in the trace
+    """
+    def __init__(self):
+        self._codes = {}
+        self._jobs = {}
+
+    def get_tasks(self):
+        """ Returns (list) priorities of the tasks in the trace
+        """
+        return sorted(self._jobs)
+
+    def get_jobs(self, task_prio):
+        """ Returns (int) number of jobs of a task in the trace
+        """
+        return self._jobs.get(task_prio, 0)
+
+    def get_path(self, task_prio, job):
+        """ Returns (string) path name 'w', 'm' or 'a' of a job of a task,
+            counted from 0, or None if the job is not in the trace
+        """
+        if job >= self._jobs.get(task_prio, 0):
+            return None
+        code = (self._codes[task_prio][job >> 2] >> ((job & 3) << 1)) & 3
+        return PATH_NAMES[code]
+
+    def add_path(self, task_prio, path_name):
+        """ Add the path of the next job of a task.
+
+            Args:
+                task_prio (int): task's priority
+                path_name (string): 'w', 'm' or 'a'
+        """
+        job = self._jobs.get(task_prio, 0)
+        codes = self._codes.setdefault(task_prio, bytearray())
+        if job & 3 == 0:
+            codes.append(0)
+        codes[job >> 2] |= _CODES[path_name] << ((job & 3) << 1)
+        self._jobs[task_prio] = job + 1
+
+    def save(self, filename):
+        """ Write the trace in a file: a text header with the number of jobs
+            of each task, then the packed codes of each task in the same
+            order. The file is replaced atomically by renaming.
+        """
+        tmp_file = filename + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(_header())
+            for task_prio in self.get_tasks():
+                f.write('task %d %d\n' % (task_prio, self._jobs[task_prio]))
+            f.write('end\n')
+            for task_prio in self.get_tasks():
+                f.write(self._codes[task_prio])
+        os.rename(tmp_file, filename)
+
+
+def read_path_trace(filename):
+    """ Returns (PathTrace) trace written by PathTrace.save()
+    """
+    path_trace = PathTrace()
+    with open(filename, 'rb') as f:
+        if f.readline() != _header():
+            raise ValueError('path trace format not supported: %s' %
+                    filename)
+        tasks = []
+        for line in iter(f.readline, 'end\n'):
+            fields = line.split()
+            if len(fields) != 3 or fields[0] != 'task':
+                raise ValueError('path trace is not valid: %s' % filename)
+            tasks.append((int(fields[1]), int(fields[2])))
+        for task_prio, jobs in tasks:
+            codes = bytearray(f.read((jobs + 3) >> 2))
+            if len(codes) != (jobs + 3) >> 2:
+                raise ValueError('path trace is truncated: %s' % filename)
+            path_trace._codes[task_prio] = codes
+            path_trace._jobs[task_prio] = jobs
+    return path_trace
+
+def random_path_trace(jobs, seed=None):
+    """ Draw the paths of the jobs of each task. Each task has its own random
+        stream, as SimManager.set_path_seed() does, so the trace has the paths
+        a simulation with the same seed takes.
+
+        Args:
+            jobs (dic): the key is task's priority and the value is its
+                number of jobs
+            seed (int): seed of the random streams, or None to seed them from
+                the system
+
+        Returns:
+            (PathTrace) trace with the drawn paths
+    """
+    path_trace = PathTrace()
+    for task_prio in sorted(jobs):
+        rng = Random(None if seed is None else (seed << 16) + task_prio)
+        for job in xrange(0, jobs[task_prio]):
+            path_trace.add_path(task_prio, PATH_NAMES[rng.randint(0, 2)])
+    return path_trace
+
+def _header():
+    return 'cfg-wcec-sim path trace %d\n' % PATH_TRACE_VERSION
@@ -0,0 +1,118 @@
+import re, bisect
+
+
+class Processor(object):
+    """ Frequencies and supply voltages of a processor. Frequencies are kept
+        sorted, so a requested frequency is mapped to an available one by
+        bisection, and the square of the voltage of each frequency is computed
+        once, so the energy of some cycles is a table lookup. The same object
+        is shared by all tasks running on the processor.
+
+        Args:
+            freqs_volt (dic): dictionary where key is the frequency and supply
+                voltage to use the given frequency is the value
+            name (string): processor name
+
+        Attributes:
+            _freqs (list): available frequencies in increasing order
+            _volt_sq (dic): key is the frequency and the square of its supply
+                voltage is the value
+    """
+    __slots__ = ('_name', '_freqs_volt', '_freqs', '_volt_sq')
+
+    def __init__(self, freqs_volt, name=''):
+        self._name = name
+        self._freqs_volt = dict(freqs_volt)
+        self._freqs = sorted(self._freqs_volt)
+        self._volt_sq = dict((freq, volt**2) for freq, volt in
+                self._freqs_volt.iteritems())
+
+    def get_name(self):
+        return self._name
+
+    def get_freqs_volt(self):
+        return self._freqs_volt
+
+    def get_freqs(self):
+        """ Returns (list) available frequencies in increasing order
+        """
+        return self._freqs
+
+    def get_max_freq(self):
+        return self._freqs[-1]
+
+    def get_volt(self, freq):
+        return self._freqs_volt[freq]
+
+    def get_volt_sq(self):
+        """ Returns (dic) square of the supply voltage of each frequency. It
+            is meant to be kept by the hot loops of the simulation, which
+            compute energy as cycles * volt_sq[freq].
+        """
+        return self._volt_sq
+
+    def energy(self, freq, cycles):
+        """ Returns (float) energy consumed by executing the given cycles at
+            the given frequency
+        """
+        return cycles * self._volt_sq[freq]
+
+    def ceil_freq(self, freq):
+        """ Map a frequency to the smallest available one that is greater than
+            or equal to it.
+
+            Returns:
+                (float) available frequency, or None if all of them are less
+                    than the given one
+        """
+        i = bisect.bisect_left(self._freqs, freq)
+        if i == len(self._freqs):
+            return None
+        return self._freqs[i]
+
+
+def read_processor_tables(filename):
+    """ Read all frequency and supply voltage tables of a processor.info
+        file. Each table starts with a 'F (MHz) | V' header and each of its
+        lines is '<frequency> | <voltage>'. The table is named by the
+        processor cited in the text before it, e.g. 'Intel XScale [1]'.
+
+        Args:
+            filename (string): processor.info file name
+
+        Returns:
+            (list) tuples (processor name, freqs_volt) where freqs_volt is a
+                dictionary whose key is the frequency and the supply voltage
+                to use the given frequency is the value
+    """
+    tables = []
+    text = ''
+    freqs_volt = None
+    with open(filename, 'rU') as f:
+        for line in f:
+            columns = [c.strip() for c in line.split('|')]
+            if len(columns) == 2 and columns[0].startswith('F'):
+                name = re.findall(r'Intel\s+([\w-]+)', text)
+                name = name[-1] if name else 'processor%d' % len(tables)
+                freqs_volt = {}
+                tables.append((name, freqs_volt))
+                text = ''
+                continue
+            if freqs_volt is not None and len(columns) == 2:
+                try:
+                    freqs_volt[float(columns[0])] = float(columns[1])
+                    continue
+                except ValueError:
+                    pass
+            freqs_volt = None
+            text += line
+    return tables
+
+def read_processors(filename):
+    """ Read all processors of a processor.info file.
+
+        Returns:
+            (list) Processor objects, in the order of the tables
+    """
+    return [Processor(freqs_volt, name) for name, freqs_volt in
+            read_processor_tables(filename)]
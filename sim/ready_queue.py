@@ -0,0 +1,376 @@
+import heapq
+
+from scheduler import FixedPriorityScheduler
+
+
+class _ReleaseView(object):
+    """ Splits the jobs of a ready queue into the ones that are not released
+        yet, ordered by their release threshold, and the released ones, ordered
+        by the scheduler key. Jobs move from one heap to the other as the
+        query time advances, so each query costs O(log n).
+
+        Attributes:
+            _released (function): predicate(call_time, task, time) that tells
+                if the job was released before the given time
+            _pending (list): heap of (threshold, prio, seq, call_time, task)
+            _ready (list): heap of (key, prio, seq, threshold, call_time, task)
+            _watermark (float): greatest time used in a query. If a query uses
+                a smaller time, released jobs are moved back to pending.
+    """
+    def __init__(self, released):
+        self._released = released
+        self._pending = []
+        self._ready = []
+        self._watermark = None
+
+    def push(self, threshold, prio, seq, call_time, task):
+        heapq.heappush(self._pending, (threshold, prio, seq, call_time, task))
+
+    def clear(self):
+        self._pending = []
+        self._ready = []
+        self._watermark = None
+
+    def rebuild(self, is_valid):
+        """ Drop entries of jobs that are not in the queue anymore.
+        """
+        entries = [e for e in self._pending if is_valid(e[1], e[2])]
+        entries += [(e[3], e[1], e[2], e[4], e[5]) for e in self._ready
+                if is_valid(e[1], e[2])]
+        heapq.heapify(entries)
+        self._pending = entries
+        self._ready = []
+        self._watermark = None
+
+    def best(self, time, is_valid, key_of):
+        """ Returns the ready heap entry with the smallest key among the jobs
+            released before the given time, or None.
+        """
+        if self._watermark is not None and time < self._watermark:
+            self._rewind(time)
+        pending = self._pending
+        while pending:
+            threshold, prio, seq, call_time, task = pending[0]
+            if not is_valid(prio, seq):
+                heapq.heappop(pending)
+                continue
+            if not self._released(call_time, task, time):
+                break
+            heapq.heappop(pending)
+            heapq.heappush(self._ready, (key_of(task, call_time), prio, seq,
+                    threshold, call_time, task))
+        self._watermark = time
+
+        ready = self._ready
+        while ready and not is_valid(ready[0][1], ready[0][2]):
+            heapq.heappop(ready)
+        return ready[0] if ready else None
+
+    def _rewind(self, time):
+        """ Move back to pending all jobs that are not released at the given
+            time. It only happens if queries go back in time.
+        """
+        ready = []
+        for entry in self._ready:
+            key, prio, seq, threshold, call_time, task = entry
+            if self._released(call_time, task, time):
+                ready.append(entry)
+            else:
+                heapq.heappush(self._pending,
+                        (threshold, prio, seq, call_time, task))
+        heapq.heapify(ready)
+        self._ready = ready
+
+
+class _PriorityReleases(object):
+    """ Release time (call time plus jitter) of the job of each task, for
+        schedulers whose key is the priority of the task. A segment tree over
+        task priorities keeps the smallest release of each range, so the
+        smallest release of the tasks with higher priority than a given one
+        costs O(log n).
+
+        Attributes:
+            _size (int): number of leaves, a power of two greater than every
+                priority
+            _tree (list): node i keeps the smallest release of its children
+                2i and 2i + 1. Leaf _size + p is the release of the job of
+                the task of priority p, or infinity if it has not any job.
+    """
+    def __init__(self):
+        self._size = 1
+        self._tree = [float('inf')] * 2
+
+    def push(self, release, key, prio, seq):
+        if prio >= self._size:
+            self._grow(prio)
+        self._set(prio, release)
+
+    def remove(self, prio):
+        if prio < self._size:
+            self._set(prio, float('inf'))
+
+    def clear(self):
+        self._tree = [float('inf')] * (2 * self._size)
+
+    def rebuild(self, is_valid):
+        pass
+
+    def min_release(self, cur_key, is_valid):
+        """ Returns (float) the smallest release of the tasks whose priority
+            is less than cur_key, or infinity if there is not any
+        """
+        tree = self._tree
+        release = float('inf')
+        low = self._size
+        high = self._size + min(max(cur_key, 0), self._size)
+        while low < high:
+            if low & 1:
+                if tree[low] < release:
+                    release = tree[low]
+                low += 1
+            if high & 1:
+                high -= 1
+                if tree[high] < release:
+                    release = tree[high]
+            low >>= 1
+            high >>= 1
+        return release
+
+    def _set(self, prio, release):
+        tree = self._tree
+        i = self._size + prio
+        tree[i] = release
+        i >>= 1
+        while i:
+            tree[i] = min(tree[2 * i], tree[2 * i + 1])
+            i >>= 1
+
+    def _grow(self, prio):
+        """ Double the number of leaves until there is a leaf for the given
+            priority.
+        """
+        leaves = self._tree[self._size:]
+        while self._size <= prio:
+            self._size *= 2
+        leaves += [float('inf')] * (self._size - len(leaves))
+        tree = [float('inf')] * self._size + leaves
+        for i in range(self._size - 1, 0, -1):
+            tree[i] = min(tree[2 * i], tree[2 * i + 1])
+        self._tree = tree
+
+
+class _ReleaseHeap(object):
+    """ Release time (call time plus jitter) of each job, for schedulers whose
+        key changes from one job to the next. The jobs are kept in a heap
+        ordered by release and the smallest release of the jobs with less key
+        than a given one is found by walking the heap in release order, only
+        as far as the first such job. Under EDF, jobs released earlier
+        usually have earlier deadlines, so the walk stops after a few jobs.
+
+        Attributes:
+            _heap (list): heap of (release, key, prio, seq)
+    """
+    def __init__(self):
+        self._heap = []
+
+    def push(self, release, key, prio, seq):
+        heapq.heappush(self._heap, (release, key, prio, seq))
+
+    def remove(self, prio):
+        pass
+
+    def clear(self):
+        self._heap = []
+
+    def rebuild(self, is_valid):
+        """ Drop entries of jobs that are not in the queue anymore.
+        """
+        self._heap = [e for e in self._heap if is_valid(e[2], e[3])]
+        heapq.heapify(self._heap)
+
+    def min_release(self, cur_key, is_valid):
+        """ Returns (float) the smallest release of the jobs whose key is less
+            than cur_key, or infinity if there is not any
+        """
+        heap = self._heap
+        while heap and not is_valid(heap[0][2], heap[0][3]):
+            heapq.heappop(heap)
+        if not heap:
+            return float('inf')
+        # entries are visited in release order: an entry is pushed in the
+        # frontier only after its parent, whose release is not greater
+        frontier = [(heap[0][0], 0)]
+        count = len(heap)
+        while frontier:
+            release, i = heapq.heappop(frontier)
+            entry = heap[i]
+            if entry[1] < cur_key and is_valid(entry[2], entry[3]):
+                return release
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < count:
+                    heapq.heappush(frontier, (heap[child][0], child))
+        return float('inf')
+
+
+class ReadyQueue(object):
+    """ Keeps the next call time of each task and answers the two questions
+        asked by the simulation manager in O(log n): which job should be
+        dispatched at a given time and which job preempts the running one.
+
+        A task has at most one job in the queue. Removed or replaced jobs are
+        discarded lazily from the heaps.
+
+        Args:
+            scheduler (Scheduler): policy used to order released jobs
+
+        Attributes:
+            _jobs (dic): the key is task's priority and the value is a tuple
+                (call time, task, sequence number of the job entry)
+            _by_call (list): heap of (call_time, prio, seq) used when there is
+                not any job to dispatch at the current time
+            _dispatch (_ReleaseView): a job may be dispatched if its call time
+                is less than the current time plus its jitter
+            _preemp (_ReleaseView): a job may preempt the running one if its
+                call time plus jitter is less than the current time
+            _releases (_PriorityReleases or _ReleaseHeap): call time plus
+                jitter of each job, to find the preemption horizon of the
+                running job
+    """
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._jobs = {}
+        self._seq = 0
+        self._by_call = []
+        self._dispatch = _ReleaseView(
+                lambda call_time, task, time:
+                    call_time < time + task.get_jitter())
+        self._preemp = _ReleaseView(
+                lambda call_time, task, time:
+                    call_time + task.get_jitter() < time)
+        if isinstance(scheduler, FixedPriorityScheduler):
+            self._releases = _PriorityReleases()
+        else:
+            self._releases = _ReleaseHeap()
+        self._is_valid = self._valid_entry
+        self._key_of = scheduler.job_key
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, task_prio):
+        return task_prio in self._jobs
+
+    def get_call_time(self, task_prio):
+        return self._jobs[task_prio][0]
+
+    def jobs(self):
+        """ Returns (list) tuples (call time, task) of all jobs in the queue
+        """
+        return [(job[0], job[1]) for job in self._jobs.values()]
+
+    def push(self, task, call_time):
+        """ Set the next call time of the given task.
+
+            Args:
+                task (SimDVFS): task to be invoked
+                call_time (float): time that the task will be invoked
+        """
+        self._seq += 1
+        seq = self._seq
+        prio = task.get_priority()
+        self._jobs[prio] = (call_time, task, seq)
+        heapq.heappush(self._by_call, (call_time, prio, seq))
+        self._dispatch.push(call_time - task.get_jitter(), prio, seq,
+                call_time, task)
+        self._preemp.push(call_time + task.get_jitter(), prio, seq,
+                call_time, task)
+        self._releases.push(call_time + task.get_jitter(),
+                self._key_of(task, call_time), prio, seq)
+        if len(self._by_call) > 4 * len(self._jobs) + 16:
+            self._compact()
+
+    def remove(self, task_prio):
+        """ Remove the job of the given task from the queue.
+        """
+        del self._jobs[task_prio]
+        self._releases.remove(task_prio)
+
+    def clear(self):
+        self._jobs = {}
+        self._by_call = []
+        self._dispatch.clear()
+        self._preemp.clear()
+        self._releases.clear()
+
+    def next_dispatch(self, sim_time):
+        """ Get the job to run when there is not any job running. It is the
+            job with the highest priority whose call time is less than the
+            current time plus its jitter. If there is not any, take the one
+            with the smallest call time.
+
+            Args:
+                sim_time (float): current simulation time
+
+            Returns:
+                (tuple) call time and task (SimDVFS) of the job, or None if the
+                    queue is empty
+        """
+        entry = self._dispatch.best(sim_time, self._is_valid, self._key_of)
+        if entry is not None:
+            return (entry[4], entry[5])
+
+        by_call = self._by_call
+        while by_call and not self._valid_entry(by_call[0][1], by_call[0][2]):
+            heapq.heappop(by_call)
+        if not by_call:
+            return None
+        job = self._jobs[by_call[0][1]]
+        return (job[0], job[1])
+
+    def next_preemption(self, cur_key, sim_time):
+        """ Get the job that preempts the running one before the given time.
+
+            Args:
+                cur_key (object): scheduler key of the running job
+                sim_time (float): simulation time if the current node of the
+                    running job is executed
+
+            Returns:
+                (tuple) call time and task (SimDVFS) of the job with the highest
+                    priority released before sim_time, if it has higher
+                    priority than the running job. Otherwise, None.
+        """
+        entry = self._preemp.best(sim_time, self._is_valid, self._key_of)
+        if entry is None or not entry[0] < cur_key:
+            return None
+        return (entry[4], entry[5])
+
+    def next_release(self, cur_key):
+        """ Get the earliest time that a job in the queue may preempt the
+            running one. Since the queue only changes when a job is dispatched
+            or preempts another one, the running job can not be preempted
+            before this time.
+
+            Args:
+                cur_key (object): scheduler key of the running job
+
+            Returns:
+                (float) the smallest call time plus jitter among the jobs with
+                    higher priority than the running one, or infinity if there
+                    is not any
+        """
+        return self._releases.min_release(cur_key, self._is_valid)
+
+    def _valid_entry(self, prio, seq):
+        job = self._jobs.get(prio)
+        return job is not None and job[2] == seq
+
+    def _compact(self):
+        """ Drop stale entries of removed or replaced jobs.
+        """
+        self._by_call = [e for e in self._by_call
+                if self._valid_entry(e[1], e[2])]
+        heapq.heapify(self._by_call)
+        self._dispatch.rebuild(self._is_valid)
+        self._preemp.rebuild(self._is_valid)
+        self._releases.rebuild(self._is_valid)
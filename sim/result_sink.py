@@ -0,0 +1,155 @@
+import os, threading, Queue
+
+
+class ResultSink(object):
+    """ Destination of the rows written by a simulation. Rows are text lines
+        appended to result files, which are named by the simulation.
+    """
+    def write(self, filename, text):
+        """ Append text to the given result file.
+        """
+        raise NotImplementedError
+
+    def exists(self, filename):
+        """ Returns (boolean) True if anything was already written to the given
+            result file, by this or by a previous simulation
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """ Make sure all written text is in the result files.
+        """
+        pass
+
+    def close(self):
+        """ Flush and release the result files.
+        """
+        pass
+
+
+class CSVResultSink(ResultSink):
+    """ Append rows to CSV files. Files are opened once and kept open until
+        the sink is closed, and rows are written in batches. Optionally,
+        batches are written by a background thread, so the simulation does
+        not wait for the disk.
+
+        Args:
+            buffer_rows (int): rows kept in memory before they are written. If
+                it is 0, each row is written as soon as it arrives and files
+                are not kept open
+            background (boolean): if batches should be written by a thread
+
+        Attributes:
+            _buffers (dic): the key is the file name and the value is the list
+                of rows not written yet
+            _rows (int): number of rows in the buffers
+            _files (dic): the key is the file name and the value is the file
+                object opened in append mode
+            _known (set): files that were written by this sink
+            _queue (Queue): batches to be written by the thread, or None
+            _error (Exception): error raised in the thread, or None
+    """
+    def __init__(self, buffer_rows=512, background=False):
+        self._buffer_rows = buffer_rows
+        self._buffers = {}
+        self._rows = 0
+        self._files = {}
+        self._known = set()
+        self._queue = None
+        self._thread = None
+        self._error = None
+        if background:
+            self._queue = Queue.Queue(maxsize=8)
+            self._thread = threading.Thread(target=self._write_batches)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def write(self, filename, text):
+        self._known.add(filename)
+        if self._buffer_rows == 0:
+            with open(filename, 'a') as dataLog:
+                dataLog.write(text)
+            return
+
+        buf = self._buffers.get(filename)
+        if buf is None:
+            buf = self._buffers[filename] = []
+        buf.append(text)
+        self._rows += 1
+        if self._rows >= self._buffer_rows:
+            self._flush_buffers()
+
+    def exists(self, filename):
+        return filename in self._known or os.path.exists(filename)
+
+    def flush(self):
+        self._flush_buffers()
+        if self._queue is not None:
+            self._queue.join()
+        self._check_error()
+
+    def close(self):
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+        for dataLog in self._files.values():
+            dataLog.close()
+        self._files = {}
+
+    def _flush_buffers(self):
+        """ Write the buffered rows or hand them to the thread.
+        """
+        if not self._buffers:
+            return
+        batch = [(name, ''.join(rows)) for name, rows in
+                self._buffers.iteritems()]
+        self._buffers = {}
+        self._rows = 0
+        if self._queue is not None:
+            self._check_error()
+            self._queue.put(batch)
+        else:
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        for filename, text in batch:
+            dataLog = self._files.get(filename)
+            if dataLog is None:
+                dataLog = self._files[filename] = open(filename, 'a')
+            dataLog.write(text)
+        for dataLog in self._files.values():
+            dataLog.flush()
+
+    def _write_batches(self):
+        """ Thread loop that writes the batches until it gets None.
+        """
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                if self._error is None:
+                    self._write_batch(batch)
+            except (IOError, OSError) as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+class NullResultSink(ResultSink):
+    """ Discard all rows. It is used when only the values kept by the
+        simulation manager are needed, e.g. the energy consumed.
+    """
+    def write(self, filename, text):
+        pass
+
+    def exists(self, filename):
+        return True
@@ -0,0 +1,124 @@
+class Schedule(object):
+    """ Execution of a path by a task without any preemption. Given the
+        path, the initial frequency, the idea and the overheads, it is always
+        the same, so it is recorded once and replayed for the following jobs.
+        Times are kept relative to the job start, as the sums computed by the
+        task, so replayed jobs have exactly the same values.
+
+        Args:
+            snapshots (list): task state before each step of the path and at
+                its end, as returned by SimDVFS.get_exec_state(), plus how
+                many times energy was consumed until it
+            chunks (list): tuples (step, running time before the chunk, time
+                to execute the chunk) of each time preemption is checked
+            energy (list): tuples (frequency, cycles) of each call to the
+                simulation manager to consume energy
+            segments (list): tuples (frequency, cycles) of the frequency
+                history of the job
+
+        Attributes:
+            _segments (list): tuples (frequency, cycles, time spent, total run
+                time after the segment)
+            _end_running_time (float): running time at the end of the job
+    """
+    def __init__(self, snapshots, chunks, energy, segments):
+        self._snapshots = snapshots
+        self._chunks = chunks
+        self._energy = energy
+        self._segments = []
+        total_run_time = 0
+        for freq, cycles in segments:
+            freq_time_spent = float(cycles) / float(freq)
+            total_run_time += freq_time_spent
+            self._segments.append((freq, cycles, freq_time_spent,
+                    total_run_time))
+        self._end_running_time = snapshots[-1][5]
+
+    def get_steps(self):
+        return len(self._snapshots) - 1
+
+    def get_snapshot(self, step):
+        return self._snapshots[step]
+
+    def first_preempted_step(self, sim_time, horizon):
+        """ Find the first step where the job is preempted, by checking each
+            chunk as the task does.
+
+            Args:
+                sim_time (float): simulation time when the job starts
+                horizon (float): preemption horizon of the job
+
+            Returns:
+                (int) step of the first chunk that ends after the horizon, or
+                    the number of steps if the job is not preempted
+        """
+        # chunk ends are summed in another order than the end of the job, so
+        # they may differ from it by a few ulps. A slack far greater than
+        # that rounding makes sure that no chunk ends after the horizon when
+        # the fast path is taken; otherwise, chunks are checked one by one
+        # as the task does, so the slack never changes the result.
+        end = sim_time + self._end_running_time
+        if end + abs(end) * 1e-9 < horizon:
+            return self.get_steps()
+        for step, running_time, time_to_execute in self._chunks:
+            if sim_time + running_time + time_to_execute > horizon:
+                return step
+        return self.get_steps()
+
+    def energy_calls(self, step):
+        """ Returns (list) tuples (frequency, cycles) of the energy consumed
+            before the given step
+        """
+        return self._energy[:self._snapshots[step][8]]
+
+    def fill_segments(self, history, start_time, count):
+        """ Set the first segments of the frequency history.
+
+            Args:
+                history (SegmentBuffer): frequency history of the job. Its
+                    segments are replaced.
+                start_time (float): time when the job started
+                count (int): number of segments
+        """
+        history.clear()
+        st = start_time
+        for freq, cycles, freq_time_spent, total_run_time in \
+                self._segments[:count]:
+            history.append(freq, cycles, st, st + freq_time_spent)
+            st = start_time + total_run_time
+
+
+class ScheduleRecorder(object):
+    """ Takes the place of the simulation manager while a path is executed
+        without preemption, recording the chunks and the energy consumed.
+
+        Attributes:
+            snapshots (list): task state before each step and at the end of
+                the path
+            chunks (list): tuples (step, running time, time to execute)
+            energy (list): tuples (frequency, cycles)
+            _running_time (float): running time of the task, summed as the
+                task does
+    """
+    def __init__(self):
+        self.snapshots = []
+        self.chunks = []
+        self.energy = []
+        self._running_time = 0
+
+    def get_sim_time(self):
+        return 0
+
+    def snapshot(self, state):
+        """ Keep the task state before a step, adding how many times energy
+            was consumed until it.
+        """
+        self.snapshots.append(state + (len(self.energy),))
+
+    def energy_consumed(self, curfreq, cycles_to_execute, time=0,
+            task_prio=-1):
+        time_to_execute = cycles_to_execute / curfreq
+        self.chunks.append((len(self.snapshots) - 1, self._running_time,
+                time_to_execute))
+        self._running_time += time_to_execute
+        self.energy.append((curfreq, cycles_to_execute))
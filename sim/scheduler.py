@@ -0,0 +1,33 @@
+class Scheduler(object):
+    """ Scheduling policy used by the simulation manager to order the jobs
+        kept in the ready queue. Each job is mapped to a key and, as with task
+        priorities, less value means higher priority. A job preempts the
+        running one only if its key is strictly less than the running job key.
+    """
+    def job_key(self, task, call_time):
+        """ Returns the key used to order the given job.
+
+            Args:
+                task (SimDVFS): task that owns the job
+                call_time (float): time when the job was invoked
+
+            Returns:
+                (object) a comparable value where less means higher priority
+        """
+        raise NotImplementedError
+
+
+class FixedPriorityScheduler(Scheduler):
+    """ Jobs are ordered by the priority of their task, which is set by the
+        order that tasks are added to the simulation manager.
+    """
+    def job_key(self, task, call_time):
+        return task.get_priority()
+
+
+class EDFScheduler(Scheduler):
+    """ Earliest deadline first: jobs are ordered by their absolute deadline,
+        which is the call time plus the task's deadline.
+    """
+    def job_key(self, task, call_time):
+        return call_time + task.get_deadline()
@@ -0,0 +1,55 @@
+from array import array
+
+
+class SegmentBuffer(object):
+    """ Frequency history of a job: one segment for each time the job ran
+        with the same frequency. Segments are read as tuples (frequency,
+        cycles, start time, end time), but they are kept in one array of
+        doubles that is reused by all jobs of a task, so no object is created
+        for each segment. The array only grows when a job has more segments
+        than any job before.
+
+        Args:
+            capacity (int): number of segments preallocated
+
+        Attributes:
+            _values (array): four values of each segment
+            _count (int): number of segments of the current job
+    """
+    __slots__ = ('_values', '_count')
+
+    def __init__(self, capacity=16):
+        self._values = array('d', [0.0]) * (4 * capacity)
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError('segment index out of range')
+        i = 4 * index
+        return tuple(self._values[i:i + 4])
+
+    def __iter__(self):
+        values = self._values
+        for i in xrange(0, 4 * self._count, 4):
+            yield (values[i], values[i + 1], values[i + 2], values[i + 3])
+
+    def clear(self):
+        """ Remove all segments, keeping the allocated array.
+        """
+        self._count = 0
+
+    def append(self, freq, cycles, start, end):
+        i = 4 * self._count
+        values = self._values
+        if i == len(values):
+            values.extend(values)
+        values[i] = freq
+        values[i + 1] = cycles
+        values[i + 2] = start
+        values[i + 3] = end
+        self._count += 1
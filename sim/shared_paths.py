@@ -0,0 +1,225 @@
+import os, mmap, ctypes, tempfile
+from array import array
+
+from cfg_paths import CFGPath, ExecPlan
+
+
+# array typecode of a column: ctypes type of the column mapped in memory
+_CTYPES = {'l': ctypes.c_long, 'd': ctypes.c_double, 'b': ctypes.c_byte}
+
+# columns are written at offsets multiple of this size
+_ALIGN = 8
+
+
+class SharedPaths(object):
+    """ Paths of C files written once in a file that the processes of a pool
+        map in memory, so each process gets a small handle instead of a copy
+        of the paths. Only what a simulation needs is written: the RWCEC of
+        each path and the columns of its compiled plan, i.e. the WCEC and the
+        edge kind of each step and the values of its edges. Columns are ctypes
+        arrays over the mapped file, so all processes read the same pages.
+
+        Paths are taken from a PathCache by find_paths() until share() is
+        called. Then, the object is pickled as the name of the file and the
+        layout of each path in it, and find_paths() of an unpickled object
+        returns paths read from the file. These paths have only their plan:
+        their get_path() is an empty list.
+
+        Args:
+            path_cache (PathCache): cache where paths are taken from before
+                they are shared
+
+        Attributes:
+            _paths (dic): the key is (C file, approx per cents, exhaustive)
+                and the value is the tuple returned by find_paths()
+            _layouts (dic): layouts of the paths by the same key: tuple
+                (worst path, middle path, list of tuples (per cent,
+                approximated best path)), as returned by _write_path()
+            _filename (string): file of the paths, or None if they are not
+                shared yet
+            _owner (boolean): if the file was written by this object, so it
+                is removed when it is closed
+            _map (mmap): mapped file, or None if it is not mapped yet
+    """
+    def __init__(self, path_cache):
+        self._path_cache = path_cache
+        self._paths = {}
+        self._layouts = None
+        self._filename = None
+        self._owner = False
+        self._map = None
+
+    def find_paths(self, cfile, approx_percents=(0.15,), exhaustive=True):
+        """ Get the paths of a C file, as PathCache.find_paths() does. Once
+            the paths are shared, only paths found before can be returned.
+
+            Raises:
+                KeyError: the paths are shared and the paths of the C file
+                    with these parameters were not found before
+        """
+        key = (cfile, tuple(sorted(set(approx_percents))), bool(exhaustive))
+        paths = self._paths.get(key)
+        if paths is not None:
+            return paths
+        if self._path_cache is not None:
+            paths = self._path_cache.find_paths(cfile, approx_percents,
+                    exhaustive)
+        elif key in self._layouts:
+            wlayout, mlayout, ablayouts = self._layouts[key]
+            paths = (self._read_path(wlayout), self._read_path(mlayout),
+                    dict((per_cent, self._read_path(layout))
+                    for per_cent, layout in ablayouts))
+        else:
+            raise KeyError('paths of %s were not shared' % cfile)
+        self._paths[key] = paths
+        return paths
+
+    def share(self):
+        """ Write all paths found so far in a temporary file, so the object
+            can be pickled. No paths are found after it.
+        """
+        fd, self._filename = tempfile.mkstemp(prefix='shared-',
+                suffix='.paths')
+        self._owner = True
+        self._layouts = {}
+        with os.fdopen(fd, 'wb') as f:
+            for key, (wpath, mpath, abpaths) in self._paths.items():
+                self._layouts[key] = (_write_path(f, wpath),
+                        _write_path(f, mpath),
+                        [(per_cent, _write_path(f, path))
+                        for per_cent, path in sorted(abpaths.items())])
+        self._path_cache = None
+
+    def get_filename(self):
+        return self._filename
+
+    def close(self):
+        """ Forget the paths read from the file and, if the file was written
+            by this object, remove it.
+        """
+        self._map = None
+        if self._path_cache is None:
+            self._paths = {}
+        if self._owner and self._filename is not None:
+            os.remove(self._filename)
+            self._filename = None
+            self._owner = False
+
+    def __getstate__(self):
+        if self._filename is None:
+            raise ValueError('paths must be shared before they are pickled')
+        return (self._filename, self._layouts)
+
+    def __setstate__(self, state):
+        self._filename, self._layouts = state
+        self._path_cache = None
+        self._paths = {}
+        self._owner = False
+        self._map = None
+
+    def _read_path(self, layout):
+        """ Returns (CFGPath) path whose layout was returned by
+            _write_path(), or None if there is not any path
+        """
+        if layout is None:
+            return None
+        rwcec, columns, lists = layout
+        if columns is None:
+            plan = ExecPlan.from_columns(*lists)
+        else:
+            cycles, kinds, firsts, values = [self._column(*column)
+                    for column in columns]
+            plan = ExecPlan.from_columns(cycles, kinds,
+                    _MappedArgs(firsts, values))
+        return CFGPath(rwcec, [], plan=plan)
+
+    def _column(self, offset, typecode, count):
+        """ Returns (ctypes array) a column over the mapped file
+        """
+        ctype = _CTYPES[typecode]
+        if count == 0:
+            return (ctype * 0)()
+        if self._map is None:
+            with open(self._filename, 'rb') as f:
+                # a private copy on write mapping allows ctypes to use the
+                # buffer, and pages are shared while they are not written
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        return (ctype * count).from_buffer(self._map, offset)
+
+
+class _MappedArgs(object):
+    """ Values of the edges of a plan, as ExecPlan.args, read from a column of
+        the values of all steps and a column of the index of the first value
+        of each step. A step without values is None.
+    """
+    __slots__ = ('_firsts', '_values')
+
+    def __init__(self, firsts, values):
+        self._firsts = firsts
+        self._values = values
+
+    def __len__(self):
+        return len(self._firsts) - 1
+
+    def __getitem__(self, index):
+        first = self._firsts[index]
+        last = self._firsts[index + 1]
+        if first == last:
+            return None
+        return tuple(self._values[first:last])
+
+
+def _write_path(f, path):
+    """ Write the columns of the plan of a path at the end of a file.
+
+        Returns:
+            (tuple) RWCEC of the path, list of tuples (offset, typecode,
+                number of values) of the columns of the WCEC and the kind of
+                each step, the index of the first value of each step and the
+                values of the edges, and None. If a column has values of more
+                than one type, or values a column cannot keep, columns are
+                None and the last element is the tuple (cycles, kinds, args)
+                of the plan. It is None if there is not any path.
+    """
+    if path is None:
+        return None
+    plan = path.get_plan()
+    firsts = [0]
+    values = []
+    for args in plan.args:
+        if args is not None:
+            if len(args) == 0:
+                return _inline_plan(path)
+            values.extend(args)
+        firsts.append(len(values))
+
+    columns = []
+    for column, typecode in ((plan.cycles, _typecode(plan.cycles)),
+            (plan.kinds, 'b'), (firsts, 'l'), (values, _typecode(values))):
+        if typecode is None:
+            return _inline_plan(path)
+        try:
+            data = array(typecode, column).tostring()
+        except OverflowError:
+            return _inline_plan(path)
+        offset = f.tell()
+        f.write(data + '\0' * (-len(data) % _ALIGN))
+        columns.append((offset, typecode, len(column)))
+    return (path.get_path_rwcec(), columns, None)
+
+def _inline_plan(path):
+    """ Returns (tuple) layout of a path whose plan is kept in the layout
+    """
+    plan = path.get_plan()
+    return (path.get_path_rwcec(), None, (plan.cycles, plan.kinds, plan.args))
+
+def _typecode(values):
+    """ Returns (string) array typecode that keeps the values and their type,
+        or None if there is not any
+    """
+    types = set(type(value) for value in values)
+    if types <= set([int]):
+        return 'l'
+    if types == set([float]):
+        return 'd'
+    return None
@@ -3,11 +3,15 @@ from decimal import *
 
 sys.path.insert(0, '../tools/cfg-wcec')
 
-from cfg_paths import CFGPath
+from cfg_paths import CFGPath, ExecPlan
+from processor import Processor
+from result_sink import CSVResultSink
+from schedule import Schedule, ScheduleRecorder
+from segment_buffer import SegmentBuffer
 
-from cfg.cfg import CFG
-from cfg.cfg_nodes import CFGNodeType, CFGEntryNode, CFGNode
 
+# sink used when a task is simulated without a simulation manager
+_direct_sink = CSVResultSink(0)
 
 class SimDVFS(object):
     """ Simulates path execution and holds each frequency changing information,
@@ -22,15 +26,15 @@ class SimDVFS(object):
             jitter (float): task's jitter
             init_freq (float): task's initial frequency
             freqs_volt (dic): dictionary where key is the frequency and supply
-                voltage to use the given frequency is the value
+                voltage to use the given frequency is the value, or the
+                Processor shared by all tasks
             overheadB (float): cycles overhead of changing frequency in type-B
                 edges
             overheadL (float): cycles overhead of changing frequency in type-L
                 edges
 
         Attributes:
-            _freqs_available (list): list of the supported frequencies
-            _freqs_volt (dic): key is the frequency and voltage is the value
+            _processor (Processor): frequencies and supply voltages
             _deadline (float): task's deadline
             _typeB_overhead (float): cycles overhead of typeB edges operations
             _typeL_overhead (float): cycles overhead of typeL edges operations
@@ -48,11 +52,24 @@ class SimDVFS(object):
             _call_time (float): when task simulation was called to start. It
                 does not mean that task simulation start at the sime time
             _running_time (float): time spent running without preemption
-            _freq_cycles_consumed (list): list to store path execution history
+            _freq_cycles_consumed (SegmentBuffer): path execution history
                 where each element is a tuple(frequency used, cycles consumed
-                by the given frequency)
+                by the given frequency, start time, end time). It is reused by
+                all jobs.
             _newfreq (float): the new frequency to set task execution
+            _preemp_horizon (float): earliest time that a job with higher
+                priority may preempt the current one. Nodes that end before
+                it are executed without checking preemption.
+            _schedules (dic): schedules of jobs without preemption. The key is
+                a tuple (ExecPlan, initial frequency, valentin).
     """
+    __slots__ = ('_wcec', '_priority', '_deadline', '_period', '_jitter',
+            '_init_freq', '_processor', '_typeB_overhead',
+            '_typeL_overhead', '_schedules', '_curfreq', '_newfreq',
+            '_cpc_consumed', '_wcec_consumed', '_sec', '_start_time',
+            '_call_time', '_running_time', '_total_run_time', '_waitpreemp',
+            '_curfreq_st', '_freq_cycles_consumed', '_preemp_horizon')
+
     def __init__(
             self, wcec, priority=0, deadline=0, period=0, jitter=0,
             init_freq=0, freqs_volt={}, overheadB=100, overheadL=100):
@@ -62,10 +79,13 @@ class SimDVFS(object):
         self._period = period
         self._jitter = jitter
         self._init_freq = init_freq
-        self._freqs_volt = freqs_volt
-        self._freqs_available = sorted(list(freqs_volt.keys()))
+        if not isinstance(freqs_volt, Processor):
+            freqs_volt = Processor(freqs_volt)
+        self._processor = freqs_volt
         self._typeB_overhead = float(overheadB)
         self._typeL_overhead = float(overheadL)
+        self._schedules = {}
+        self._freq_cycles_consumed = SegmentBuffer()
 
     def _init_data(self):
         """ Initializes main data to keep track.
@@ -81,7 +101,11 @@ class SimDVFS(object):
         self._total_run_time = 0
         self._waitpreemp = 0
         self._curfreq_st = 0
-        self._freq_cycles_consumed = []
+        self._freq_cycles_consumed.clear()
+        self._preemp_horizon = float('inf')
+
+    def get_wcec(self):
+        return self._wcec
 
     def get_deadline(self):
         return self._deadline
@@ -95,6 +119,15 @@ class SimDVFS(object):
     def get_jitter(self):
         return self._jitter
 
+    def get_init_freq(self):
+        return self._init_freq
+
+    def get_overheads(self):
+        """ Returns (float) cycles overhead of type-B edges and (float) cycles
+            overhead of type-L edges
+        """
+        return self._typeB_overhead, self._typeL_overhead
+
     def get_volt_from_freq(self, freq):
         """ Returns the supply voltage that matches to the given frequency
 
@@ -104,14 +137,32 @@ class SimDVFS(object):
             Returns:
                 (float) supply voltage
         """
-        return self._freqs_volt[freq]
+        return self._processor.get_volt(freq)
+
+    def get_processor(self):
+        return self._processor
 
     def get_curfreq(self):
         return self._curfreq
 
+    def get_call_time(self):
+        return self._call_time
+
     def get_end_time(self):
         return self._start_time + self._total_run_time
 
+    def get_response_time(self):
+        """ Returns (float) time from the call to the end of the last job
+        """
+        return (self._start_time - self._call_time) + self._total_run_time
+
+    def get_job_state(self):
+        """ Returns (tuple) call time, start time, total run time and the
+            frequency history of the last job execution
+        """
+        return (self._call_time, self._start_time, self._total_run_time,
+                list(self._freq_cycles_consumed))
+
     def start_sim(self, simManager, call_time, start_time, path_name, cfg_path,
             valentin=False, result_file=''):
         """ Start path execution and check for each typeB and typeL edges.
@@ -129,11 +180,12 @@ class SimDVFS(object):
                     anyone is given, there is not any writing
 
             Returns:
-                (list) List where each element is a tuple made by the frequency
-                used and how many cycles where consumed using the same
-                frequency. This list order is according to frequency
+                (SegmentBuffer) Sequence where each element is a tuple made by
+                the frequency used and how many cycles where consumed using
+                the same frequency. This order is according to frequency
                 appearance. In other words, one frequency can be presented in
                 more than one tuple since it was used in different moments.
+                It is reused by the next job.
         """
         if not isinstance(cfg_path, CFGPath): return
 
@@ -144,15 +196,69 @@ class SimDVFS(object):
 
         # to know if it is the worst frequency scenario
         if 'wfreq' in result_file :
-            self._curfreq = max(self._freqs_volt)
+            self._curfreq = self._processor.get_max_freq()
             self._newfreq = self._curfreq
 
-        if simManager and not result_file:
-            print '\n>>> start task %d at %.2f' % (self._priority, start_time)
+        if simManager:
+            self._preemp_horizon = simManager.get_preemp_horizon(
+                    self._priority)
+            if not result_file:
+                print '\n>>> start task %d at %.2f' % (self._priority,
+                        start_time)
+
+        # replay the schedule without preemption until the step where the
+        # job is preempted, if any, then simulate the remaining steps
+        plan = cfg_path.get_plan()
+        first_step = 0
+        if simManager:
+            first_step = self._replay_schedule(simManager, plan, valentin)
+        self._run_plan(simManager, plan, first_step, path_name, valentin,
+                result_file)
+
+        # store last information if cycles consumed are greater than zero
+        self._update_data(self._curfreq, self._curfreq, self._cpc_consumed)
+
+        # update simulation time with how much time a task took executing
+        # after a preemption. If there weren't any preemption, then add how
+        # much time current task spent executing.
+        if simManager:
+            simManager.add_sim_time(self._running_time)
+            if not result_file:
+                print '>>> end task %d at %.2f <<<' % (self._priority,
+                        start_time + self._total_run_time)
+
+        # show task simulation results
+        if result_file and path_name:
+            self.print_to_csv(
+                    path_name, result_file, cfg_path.get_path_rwcec(),
+                    self._freq_cycles_consumed, valentin,
+                    simManager.get_result_sink() if simManager else None)
 
-        path = cfg_path.get_path()
-        for i in range(0, len(path)):
-            n, wcec = path[i]
+        return self._freq_cycles_consumed
+
+    def _run_plan(self, simManager, plan, first_step, path_name, valentin,
+            result_file, recorder=None):
+        """ Execute the steps of a path from the given one, checking
+            preemptions and typeB and typeL edges.
+
+            Args:
+                simManager (SimManager): simulation manager object to check
+                    preemptions
+                plan (ExecPlan): path compiled for simulation
+                first_step (int): step to start from
+                path_name (string): current path name
+                valentin (boolean): if Valentin's idea should be used
+                result_file (string): file name to write simulation results
+                recorder (ScheduleRecorder): if it is given, the state before
+                    each step is saved in it
+        """
+        plan_cycles = plan.cycles
+        plan_kinds = plan.kinds
+        plan_args = plan.args
+        for i in range(first_step, len(plan_cycles)):
+            if recorder:
+                recorder.snapshot(self.get_exec_state())
+            wcec = plan_cycles[i]
             self._wcec_consumed += wcec
 
             # new freq should be set only when a child from (n -> child) is
@@ -170,15 +276,17 @@ class SimDVFS(object):
 
             # check if n is not last node, because typeB and typeL edges are
             # always check with the pair (parent, child)
-            if valentin == False and i + 1 < len(path):
+            if valentin == False and i + 1 < len(plan_cycles):
                 overhead = 0
-                child = path[i + 1][0]
-                if n.get_type() == CFGNodeType.IF:
+                kind = plan_kinds[i]
+                if kind == ExecPlan.TYPE_B:
                     overhead = self._typeB_overhead
-                    self._check_typeB_edge(n, child)
-                elif n.get_type() == CFGNodeType.PSEUDO:
+                    self._check_typeB_edge(*plan_args[i])
+                elif kind == ExecPlan.IF:
+                    overhead = self._typeB_overhead
+                elif kind == ExecPlan.TYPE_L:
                     overhead = self._typeL_overhead
-                    self._check_typeL_edge(n, wcec, child)
+                    self._check_typeL_edge(plan_args[i])
                 if overhead > 0:
                     # check if a preemption happened during overhead execution
                     # so, "cycles to execute" can be equal to overhead, zero or
@@ -192,44 +300,119 @@ class SimDVFS(object):
 
                 self._wcec_consumed += self._sec
                 self._sec = 0
+        if recorder:
+            recorder.snapshot(self.get_exec_state())
+
+    def get_exec_state(self):
+        """ Returns (tuple) current frequency, new frequency, cycles consumed
+            with the current frequency, cycles consumed from WCEP, saved
+            execution cycles, running time, total run time and the number of
+            frequency history entries of the running job
+        """
+        return (self._curfreq, self._newfreq, self._cpc_consumed,
+                self._wcec_consumed, self._sec, self._running_time,
+                self._total_run_time, len(self._freq_cycles_consumed))
 
-        # store last information if cycles consumed are greater than zero
-        self._update_data(self._curfreq, self._curfreq, self._cpc_consumed)
+    def _replay_schedule(self, simManager, plan, valentin):
+        """ Replay the schedule of the current job without preemption until
+            the first step where the job may be preempted. The schedule is
+            recorded the first time a path is executed from a frequency.
 
-        # update simulation time with how much time a task took executing
-        # after a preemption. If there weren't any preemption, then add how
-        # much time current task spent executing.
-        if simManager:
-            simManager.add_sim_time(self._running_time)
-            if not result_file:
-                print '>>> end task %d at %.2f <<<' % (self._priority,
-                        start_time + self._total_run_time)
+            Args:
+                simManager (SimManager): simulation manager object
+                plan (ExecPlan): path compiled for simulation
+                valentin (boolean): if Valentin's idea should be used
 
-        # show task simulation results
-        if result_file and path_name:
-            self.print_to_csv(
-                    path_name, result_file, cfg_path.get_path_rwcec(),
-                    self._freq_cycles_consumed, valentin)
+            Returns:
+                (int) step where simulation must continue. It is the number of
+                    steps if the whole job was replayed.
+        """
+        schedule = self._get_schedule(plan, valentin)
+        step = schedule.first_preempted_step(simManager.get_sim_time(),
+                self._preemp_horizon)
+        for freq, cycles in schedule.energy_calls(step):
+            simManager.energy_consumed(freq, cycles, 0, self._priority)
+
+        (self._curfreq, self._newfreq, self._cpc_consumed,
+                self._wcec_consumed, self._sec, self._running_time,
+                self._total_run_time, count, calls) = \
+                schedule.get_snapshot(step)
+        schedule.fill_segments(self._freq_cycles_consumed, self._start_time,
+                count)
+        if count > 0:
+            self._curfreq_st = self._start_time + self._total_run_time
+        return step
 
-        return self._freq_cycles_consumed
+    def get_schedule(self, cfg_path, valentin=False, wfreq=False):
+        """ Get the execution of a path by a job without any preemption. The
+            frequency changes of a job do not depend on time, so the schedule
+            is the same for all jobs which start from the same frequency.
 
-    def _check_typeB_edge(self, n, child):
-        """ Check if current child has a RWCEC less than the greatest RWCEC of
-            a successor of current node. If it is, so this is a type-B edge.
-            Then, compute typeB speed update ratio and change frequency if it is
-            possible.
+            Args:
+                cfg_path (CFGPath): path executed by the job
+                valentin (boolean): if Valentin's idea should be used
+                wfreq (boolean): if the job starts from the greatest frequency,
+                    as in the worst frequency study, instead of the initial
+                    frequency of the task
+
+            Returns:
+                (Schedule) schedule of the path
+        """
+        self._init_data()
+        if wfreq:
+            self._curfreq = self._processor.get_max_freq()
+            self._newfreq = self._curfreq
+        return self._get_schedule(cfg_path.get_plan(), valentin)
+
+    def _get_schedule(self, plan, valentin):
+        """ Returns (Schedule) schedule of a path from the current frequency,
+            which is recorded the first time it is asked
+        """
+        key = (plan, self._curfreq, valentin)
+        schedule = self._schedules.get(key)
+        if schedule is None:
+            schedule = self._record_schedule(plan, valentin)
+            self._schedules[key] = schedule
+        return schedule
+
+    def _record_schedule(self, plan, valentin):
+        """ Execute a path without preemption to record its schedule. The
+            state of the job is restored at the end.
+
+            Returns:
+                (Schedule) schedule of the path from the current frequency
+        """
+        horizon = self._preemp_horizon
+        self._preemp_horizon = float('inf')
+        recorder = ScheduleRecorder()
+        self._run_plan(recorder, plan, 0, '', valentin, 'schedule', recorder)
+        self._update_data(self._curfreq, self._curfreq, self._cpc_consumed)
+        schedule = Schedule(recorder.snapshots, recorder.chunks,
+                recorder.energy, [(freq, cycles) for freq, cycles, st, et in
+                    self._freq_cycles_consumed])
+
+        (self._curfreq, self._newfreq, self._cpc_consumed,
+                self._wcec_consumed, self._sec, self._running_time,
+                self._total_run_time, count, calls) = \
+                schedule.get_snapshot(0)
+        self._freq_cycles_consumed.clear()
+        self._curfreq_st = self._start_time
+        self._preemp_horizon = horizon
+        return schedule
+
+    def _check_typeB_edge(self, rwcec_succbi, rwcec_bj):
+        """ Compute typeB speed update ratio of a type-B edge, whose child has
+            a RWCEC less than the greatest RWCEC of a successor of current
+            node. Then, change frequency if it is possible.
 
             Args:
-                n (CFGNode): current node being visited
-                child (CFGNode): child of n
+                rwcec_succbi (float): RWCEC of the worst successor of current
+                    node
+                rwcec_bj (float): RWCEC of the child
         """
-        rwcec_succbi = n.get_rwcec() - n.get_wcec()
-        rwcec_bj = child.get_rwcec()
-        bjline = child.get_start_line()
-        if rwcec_bj < rwcec_succbi:
-            ratio = self._compute_typeB_sur(rwcec_succbi, rwcec_bj)
-            self._change_freq(ratio)
-            self._sec = rwcec_succbi - rwcec_bj
+        ratio = self._compute_typeB_sur(rwcec_succbi, rwcec_bj)
+        self._change_freq(ratio)
+        self._sec = rwcec_succbi - rwcec_bj
 
     def _compute_typeB_sur(self, rwcec_wsbi, rwcec_bj):
         """ Compute speed update ratio from type-B edge
@@ -246,25 +429,20 @@ class SimDVFS(object):
             return float(1)
         return float(rwcec_bj) / (rwcec_wsbi - self._typeB_overhead)
 
-    def _check_typeL_edge(self, n, loop_wcec, child):
+    def _check_typeL_edge(self, loop_args):
         """ Compute typeL speed update ratio by using how many loop iterations
             were done in the given path and its WCEC of one execution. Then,
             change frequency if it is possible.
 
             Args:
-                n (CFGNode): current node being visited
-                loop_wcec (float): loop RWCEC using all its iterations
-                child (CFGNode): child of n
+                loop_args (tuple): WCEC of one loop iteration, RWCEC of the
+                    first node after the loop, maximum number of iterations and
+                    iterations done at runtime, as compiled in ExecPlan
         """
-        loop_max_iter = n.get_loop_iters()
-        loop_after_line = child.get_start_line()
-        loop_after_rwcec = child.get_rwcec()
-        if loop_max_iter != 0:
-            loop_wcec_once = ((n.get_refnode_rwcec() - n.get_wcec()) /
-                                loop_max_iter)
-        else:
-            loop_wcec_once = n.get_refnode_rwcec()
-        runtime_iter = (loop_wcec - n.get_wcec()) / loop_wcec_once
+        if loop_args is None:
+            raise ZeroDivisionError('loop iteration without cycles')
+        loop_wcec_once, loop_after_rwcec, loop_max_iter, runtime_iter = \
+                loop_args
 
         ratio = self._compute_typeL_sur(loop_wcec_once, loop_after_rwcec,
                 loop_max_iter, runtime_iter)
@@ -330,14 +508,11 @@ class SimDVFS(object):
             # check for an available frequency - ceil operation
             # check for the smallest value that is greater than or equal to
             # new frequency
-            set_freq = 0
-            for freq in self._freqs_available:
-                if freq >= newfreq and (set_freq == 0 or freq <= set_freq):
-                    set_freq = freq
+            set_freq = self._processor.ceil_freq(newfreq)
             # if the new frequency value mapped into frequency set is equal
             # to current frequency, it does not update data, because
             # frequency is the same as before
-            if set_freq != 0 and set_freq != self._curfreq:
+            if set_freq is not None and set_freq != self._curfreq:
                 self._newfreq = set_freq
 
     def _update_data(self, curfreq, newfreq, cycles_consumed):
@@ -354,8 +529,8 @@ class SimDVFS(object):
         if cycles_consumed > 0:
             freq_time_spent = float(cycles_consumed) / float(curfreq)
             curfreq_endt = self._curfreq_st + freq_time_spent
-            data = (curfreq, cycles_consumed, self._curfreq_st, curfreq_endt)
-            self._freq_cycles_consumed.append(data)
+            self._freq_cycles_consumed.append(curfreq, cycles_consumed,
+                    self._curfreq_st, curfreq_endt)
             self._total_run_time += freq_time_spent
             self._curfreq_st = self._start_time + self._total_run_time
         self._curfreq = newfreq
@@ -382,6 +557,12 @@ class SimDVFS(object):
         """
         while simManager:
             time_to_execute = cycles_to_execute / self._curfreq
+            # there is no need to ask simulation manager while cycles are
+            # executed before the preemption horizon
+            if (simManager.get_sim_time() + self._running_time +
+                    time_to_execute <= self._preemp_horizon):
+                self._running_time += time_to_execute
+                break
             times = simManager.check_preemp(path_name, self._priority,
                     self._running_time, time_to_execute, valentin,
                     result_file)
@@ -400,11 +581,13 @@ class SimDVFS(object):
             cycles_to_execute -= wcec_executed
             self._cpc_consumed += wcec_executed
             self._update_data(self._curfreq, self._curfreq, self._cpc_consumed)
+            self._preemp_horizon = simManager.get_preemp_horizon(
+                    self._priority)
 
         return cycles_to_execute
 
     def print_to_csv(self, path_name, result_file, path_rwcec,
-            freq_cycles_consumed, valentin):
+            freq_cycles_consumed, valentin, sink=None):
         """ Print summary information in CSV format comparing the result to the
             use of greatest frequency available in the same path execution.
 
@@ -415,16 +598,19 @@ class SimDVFS(object):
                 <cycles consumed with freqn>,<time spent with freqn>
 
             Note: this information is written in only one line.
+
+            Args:
+                sink (ResultSink): where the line is written. If it is None,
+                    the file is written directly
         """
+        if sink is None:
+            sink = _direct_sink
 
         # check if the current file exist, if so, do not write header
         filename = os.path.dirname(result_file) + '/detailed-' + \
                 os.path.basename(result_file)
         csv = ''
-        try:
-            with open(filename, 'rU') as dataLog:
-                pass
-        except IOError as e: # file does not exist, then write header
+        if not sink.exists(filename): # file does not exist, then write header
             csv += 'Idea,Path,WCEC,PEC,PECO,Consumption,Reduction,Jitter,Call'
             csv += ',Ci,Start,End,Wait to Start,Time to End,Ri,Di,Pi'
             csv += ',Initial Freq.,Cycles,Start Using, End Using'
@@ -452,10 +638,11 @@ class SimDVFS(object):
         total_time = 0
         total_wcec = 0
         total_energy = 0
+        volt_sq = self._processor.get_volt_sq()
         for freq, cycles, st, et in freq_cycles_consumed:
             total_wcec += cycles
             time_spent = float(cycles) / freq
-            energy_consumed = float(cycles) * (self._freqs_volt[freq]**2)
+            energy_consumed = float(cycles) * volt_sq[freq]
             ci += time_spent
             total_energy += energy_consumed
             # print not used frequencies
@@ -466,12 +653,12 @@ class SimDVFS(object):
             csv += ',%.2f' % (et - st) # how long took to execute its cycles
 
         # compare to use of higher frequency
-        worst_freq = max(self._freqs_available)
-        worst_energy = float(path_rwcec) * (self._freqs_volt[worst_freq]**2)
+        worst_freq = self._processor.get_max_freq()
+        worst_energy = float(path_rwcec) * volt_sq[worst_freq]
         energy_reduction = 100 - (total_energy * 100) / worst_energy
         energy_reduction = round(energy_reduction, 2) + 0
 
-        ri = (self._start_time - self._call_time) + self._total_run_time
+        ri = self.get_response_time()
         csv %= {
             'wcec': self._wcec,
             'path_rwcec': path_rwcec,
@@ -491,10 +678,9 @@ class SimDVFS(object):
         }
         csv += '\n'
 
-        with open(filename, 'a') as dataLog:
-            dataLog.write(csv)
+        sink.write(filename, csv)
 
-    def write_end_time(self, valentin, path_name, result_file):
+    def write_end_time(self, valentin, path_name, result_file, sink=None):
         if '-wfreq.csv' in result_file:
             csv = '0,Pior Caso'
         elif '-v.csv' in result_file:
@@ -508,11 +694,14 @@ class SimDVFS(object):
             filename = filename + '/end-time-worst.csv'
         elif path_name == 'm':
             filename = filename + '/end-time-mid.csv'
-        else:
+        elif path_name == 'a':
             filename = filename + '/end-time-approx.csv'
+        else: # random paths
+            filename = filename + '/end-time-random.csv'
 
         # print csv
         # append information
-        with open(filename, 'a') as dataLog:
-            dataLog.write(csv)
+        if sink is None:
+            sink = _direct_sink
+        sink.write(filename, csv)
 
@@ -2,9 +2,14 @@ import os, sys, math
 
 sys.path.insert(0, '../tools/cfg-wcec')
 
-from random import randint
+from random import randint, Random
 from cfg_paths import CFGPaths
 from sim import SimDVFS
+from processor import Processor
+from ready_queue import ReadyQueue
+from scheduler import FixedPriorityScheduler
+from result_sink import CSVResultSink
+from idle_runs import format_idle_run
 
 
 class SimManager(object):
@@ -16,8 +21,10 @@ class SimManager(object):
                 is task's priority and the value is a list where the first
                 element is SimDVFS object that will simulate task execution,
                 the second and the following elements are: WCEP, MCEP and ABCEP
-            ready_queue (dic): keeps the time that each task will be invoked.
-                The key is the time while value is the same as task_sims object
+            ready_queue (ReadyQueue): keeps the time that each task will be
+                invoked and which job must run next
+            scheduler (Scheduler): policy used to order the jobs in the ready
+                queue. Fixed priority is used by default.
             priority_count (int): counter to set priority of each task while
                 they are added to simulation manager. Note: less value means
                 high priority
@@ -29,38 +36,180 @@ class SimManager(object):
                 random execution
             first_time (boolean): flag to know when ends the first execution of
                 a random path
+            path_seed (int): if it is set, random paths are taken from one
+                random stream per task seeded by it, so the path of each job
+                depends only on the seed, the task and the job number
+            path_rngs (dic): the key is task's priority and the value is its
+                random stream of paths
+            path_trace (PathTrace): if it is set, random paths are taken from
+                it by task and job number. Jobs that are not in it yet are
+                drawn and added to it.
+            path_jobs (dic): the key is task's priority and the value is the
+                number of its jobs whose path was taken from the path trace
+            job_hook (function): called with the task (SimDVFS) after each job
+                ends, or None
+            trace (TraceWriter): binary trace where each job is added, or
+                None
+            job_paths (dic): the key is task's priority and the value is the
+                name of the path executed by its current job
+            result_sink (ResultSink): where results are written. If it is
+                None, each simulation writes CSV files through its own
+                buffered sink, which is closed at the end of the simulation
+            processor (Processor): processor shared by the tasks
+            volt_sq (dic): square of the supply voltage of each frequency of
+                the processor
+            idle_runs (boolean): if consecutive time slices without energy
+                are written as one idle record
     """
-    def __init__(self, time_slice=20):
+    __slots__ = ('_tasks_sims', '_scheduler', '_ready_queue',
+            '_priority_count', '_sim_time', '_random_path', '_first_time',
+            '_path_list', '_path_idx', '_path_seed', '_path_rngs',
+            '_path_trace', '_path_jobs', '_job_hook',
+            '_trace', '_job_paths', '_time_slice', '_collect_time',
+            '_sim_time_for_result', '_acc_energy_consumed',
+            '_slice_energy_consumed', '_processor', '_volt_sq', '_filename',
+            '_result_sink',
+            '_sink', '_handle_task', '_handle_task_time', '_end_time',
+            '_idle_runs')
+
+    def __init__(self, time_slice=20, scheduler=None):
         self._tasks_sims = {}
-        self._ready_queue = {}
+        if scheduler is None:
+            scheduler = FixedPriorityScheduler()
+        self._scheduler = scheduler
+        self._ready_queue = ReadyQueue(scheduler)
         self._priority_count = 0
         self._sim_time = 0
         self._random_path = False
         self._first_time = True
         self._path_list = []
         self._path_idx = 0
+        self._path_seed = None
+        self._path_rngs = {}
+        self._path_trace = None
+        self._path_jobs = {}
+        self._job_hook = None
+        self._trace = None
+        self._job_paths = {}
         self._time_slice = time_slice # slices of time that simulation data
                                       # must be collected
         self._collect_time = self._time_slice
         self._sim_time_for_result = 0
         self._acc_energy_consumed = 0
         self._slice_energy_consumed = 0
-        self._freq_volt = {}
+        self._processor = None
+        self._volt_sq = {}
         self._filename = ''
+        self._result_sink = None
+        self._sink = None
         self._handle_task = {}
         self._handle_task_time = {}
+        self._end_time = 0
+        self._idle_runs = False
 
     def get_sim_time(self):
         """ Returns (float) current simulation time
         """
         return self._sim_time
 
+    def get_acc_energy(self):
+        """ Returns (float) energy consumed since simulation start
+        """
+        return self._acc_energy_consumed
+
+    def get_end_time(self):
+        """ Returns (float) when the last job of the simulation ended
+        """
+        return self._end_time
+
+    def get_time_slice(self):
+        return self._time_slice
+
+    def get_scheduler(self):
+        return self._scheduler
+
+    def get_tasks(self):
+        """ Returns (list) tuples (SimDVFS, worst path, middle path,
+            approximated best path) of all tasks, in priority order
+        """
+        return [self._tasks_sims[task_prio] for task_prio in
+                sorted(self._tasks_sims)]
+
+    def get_hyperperiod(self):
+        """ Returns (float) LCM of tasks' periods
+        """
+        return self._lcm([self._tasks_sims[task_prio][0].get_period()
+                for task_prio in self._tasks_sims])
+
+    def set_path_seed(self, seed):
+        """ Use seeded random streams in random path simulations. Each
+            simulation with the same seed executes the same path in each job of
+            a task, even if studies schedule jobs in a different order.
+
+            Args:
+                seed (int): seed of the random streams, or None to use the
+                    global random generator
+        """
+        self._path_seed = seed
+
+    def set_path_trace(self, path_trace):
+        """ Take the paths of random path simulations from a trace, by
+            task's priority and job number, so studies simulated by different
+            simulation managers or processes execute the same path in each
+            job.
+
+            Args:
+                path_trace (PathTrace): trace of paths, or None to draw paths
+                    as set_path_seed() sets
+        """
+        self._path_trace = path_trace
+
+    def set_result_sink(self, result_sink):
+        """ Set where results are written. The sink is flushed, but not
+            closed, at the end of each simulation.
+
+            Args:
+                result_sink (ResultSink): sink of results, or None to write CSV
+                    files
+        """
+        self._result_sink = result_sink
+
+    def get_result_sink(self):
+        """ Returns (ResultSink) the sink used by the current simulation
+        """
+        return self._sink
+
+    def set_job_hook(self, job_hook):
+        """ Set a function called with the task (SimDVFS) after each job
+            ends, e.g. to collect response times.
+        """
+        self._job_hook = job_hook
+
+    def set_idle_runs(self, idle_runs):
+        """ Write consecutive time slices without energy as one idle record,
+            instead of one row for each slice. 'idle_runs.expand_idle_runs'
+            gives back the rows.
+
+            Args:
+                idle_runs (boolean): if idle records are written
+        """
+        self._idle_runs = idle_runs
+
+    def set_trace(self, trace):
+        """ Add each job and the end of each simulation to a binary trace.
+            The trace is not closed by the simulation manager.
+
+            Args:
+                trace (TraceWriter): trace writer, or None
+        """
+        self._trace = trace
+
     def add_sim_time(self, time):
         self._sim_time += time
 
     def add_task_sim(
             self, graph, wcec, deadline, period, jitter, init_freq,
-            freqs_volt, approx_percent):
+            freqs_volt, approx_percent, exhaustive=True):
         """ Simulate all tasks execution by checking their priority and
             periods. It also is responsible to schedule when current task will
             be simulate again based on its period and jitter.
@@ -76,13 +225,11 @@ class SimManager(object):
                     supply voltage to use the given frequency is the value
                 per_cent (float): how much per cent from WCEC should be
                     approximate best path.
+            exhaustive (boolean): if all paths are enumerated to choose the
+                middle and the approximated best paths. Otherwise, they are
+                chosen from the RWCEC computed by cfg_paths.PathSums
         """
-        self._priority_count += 1
-        simulate = SimDVFS(
-                wcec, self._priority_count, deadline, period,
-                jitter, init_freq, freqs_volt)
-
-        cfg_paths = CFGPaths()
+        cfg_paths = CFGPaths(exhaustive)
         wpath = cfg_paths.find_worst_path(graph)
         mpath = cfg_paths.find_middle_path(graph)
         abpath = cfg_paths.find_approximate_best_path(graph, approx_percent)
@@ -90,7 +237,46 @@ class SimManager(object):
             print 'approximate best path is not available'
             sys.exit(1)
 
-        self._freq_volt = freqs_volt
+        self.add_task_paths(wpath, mpath, abpath, wcec, deadline, period,
+                jitter, init_freq, freqs_volt)
+
+    def add_task_paths(
+            self, wpath, mpath, abpath, wcec, deadline, period, jitter,
+            init_freq, freqs_volt, overheadB=100, overheadL=100):
+        """ Add a task whose worst, middle and approximated best paths were
+            already found. It allows to simulate the same paths with different
+            parameters without analysing the CFG again.
+
+            Args:
+                wpath (CFGPath): worst path
+                mpath (CFGPath): middle path
+                abpath (CFGPath): approximated best path
+                wcec (float): task's WCEC
+                deadline (float): task's new deadline equals to response time
+                period (float): task's period
+                jitter (float): task's jitter
+                init_freq (float): task's initial frequency
+                freqs_volt (dic): dictionary where key is the frequency and
+                    supply voltage to use the given frequency is the value, or
+                    a Processor. Tasks with the same table share the same
+                    Processor.
+                overheadB (float): cycles overhead of changing frequency in
+                    type-B edges
+                overheadL (float): cycles overhead of changing frequency in
+                    type-L edges
+        """
+        self._priority_count += 1
+        processor = self._processor
+        if isinstance(freqs_volt, Processor):
+            processor = freqs_volt
+        elif processor is None or processor.get_freqs_volt() != freqs_volt:
+            processor = Processor(freqs_volt)
+        simulate = SimDVFS(
+                wcec, self._priority_count, deadline, period,
+                jitter, init_freq, processor, overheadB, overheadL)
+
+        self._processor = processor
+        self._volt_sq = processor.get_volt_sq()
         self._tasks_sims[self._priority_count] = (
                 simulate, wpath, mpath, abpath)
 
@@ -111,7 +297,8 @@ class SimManager(object):
 
         return z
 
-    def run_sim(self, path_name='', valentin=False, show_result=''):
+    def run_sim(self, path_name='', valentin=False, show_result='',
+            hyperperiods=1):
         """ Simulate all tasks execution by checking their priority and
             periods. It also is responsible to schedule when current task will
             be simulate again based on its period and jitter.
@@ -123,13 +310,25 @@ class SimManager(object):
                 valentin (boolean): if Valentin's idea should be used
                 show_result (string): file name to write simulation results. If
                     anyone is given, there is not any writing
+                hyperperiods (int): how many times the LCM of tasks' periods
+                    must be simulated
         """
-        # check if the current file exist, if so, remove it
+        sink = self._result_sink
+        self._sink = sink if sink is not None else CSVResultSink()
         try:
-            with open(show_result, 'a') as f:
-                f.write('0,0,0\n')
-        except IOError as e:
-            pass # file does not exist
+            self._run_sim(path_name, valentin, show_result, hyperperiods)
+        finally:
+            if sink is None:
+                self._sink.close()
+            else:
+                self._sink.flush()
+
+    def _run_sim(self, path_name, valentin, show_result, hyperperiods):
+        """ Simulation loop of run_sim().
+        """
+        # mark the start of a new simulation in the result file
+        if show_result:
+            self._sink.write(show_result, '0,0,0\n')
 
         self._sim_time = 0
         self._path_idx = 0
@@ -139,42 +338,34 @@ class SimManager(object):
         self._slice_energy_consumed = 0
         self._filename = show_result
         call_time = 0
-        deadlines = []
 
         # all tasks are called at time 0 initialy
-        self._ready_queue = {}
+        self._ready_queue.clear()
         for task_prio in self._tasks_sims:
             task = self._tasks_sims[task_prio][0]
-            self._ready_queue[task_prio] = call_time
-            deadlines.append(task.get_period())
+            self._ready_queue.push(task, call_time)
 
         # set stop constraint to LCM of tasks' dealines
-        stop_time = self._lcm(deadlines)
+        hyperperiod = self.get_hyperperiod()
+        stop_time = hyperperiod * hyperperiods
 
         self._random_path = False if path_name else True
+        self._path_jobs = {}
+        if self._path_seed is not None:
+            self._path_rngs = {}
+            for task_prio in self._tasks_sims:
+                self._path_rngs[task_prio] = Random(
+                        (self._path_seed << 16) + task_prio)
+
+        last_task = None
         while True:
             # at this point, there is no preemption. Then, get task from ready
             # queue whose call time is less than the (current sim time + task
             # jitter time) and has the greatest priority. If there is not any
             # task, so take the one with the smallest call time
-            task_prio = -1
-            call_time = -1
-            for next_task_prio in self._ready_queue:
-                next_call_time = self._ready_queue[next_task_prio]
-                task = self._tasks_sims[next_task_prio][0]
-                if (next_call_time < self._sim_time + task.get_jitter() and (
-                        call_time == -1 or next_task_prio < task_prio)):
-                    task_prio = next_task_prio
-                    call_time = next_call_time
-            if task_prio == -1:
-                for next_task_prio in self._ready_queue:
-                    next_call_time = self._ready_queue[next_task_prio]
-                    task = self._tasks_sims[next_task_prio][0]
-                    if call_time == -1 or next_call_time < call_time:
-                        task_prio = next_task_prio
-                        call_time = next_call_time
-            task = self._tasks_sims[task_prio][0]
-            del self._ready_queue[task.get_priority()]
+            call_time, task = self._ready_queue.next_dispatch(self._sim_time)
+            task_prio = task.get_priority()
+            self._ready_queue.remove(task_prio)
 
             # at this point, there is no task running, that's why sim time is
             # updated to the closer time that has a task.
@@ -185,7 +376,11 @@ class SimManager(object):
                 self.energy_consumed(0, 0, self._sim_time)
             if self._sim_time >= stop_time:
                 self.energy_consumed(0, 0, self._sim_time)
-                last_task.write_end_time(valentin, path_name, show_result)
+                if self._trace is not None:
+                    self._trace.end_sim(self._sim_time)
+                last_task.write_end_time(valentin, path_name, show_result,
+                        self._sink)
+                self._end_time = last_task.get_end_time()
                 break
 
             # check if jitter has already passed. If condition is false, jitter
@@ -202,14 +397,24 @@ class SimManager(object):
             result = task.start_sim(
                     self, call_time, self._sim_time, path_name,
                     path, valentin, show_result)
+            self._finish_job(task, path, valentin)
             last_task = task
 
             # set next execution time of the current task
             next_call_time = call_time + task.get_period()
-            self._ready_queue[task.get_priority()] = next_call_time
+            self._ready_queue.push(task, next_call_time)
 
         self._first_time = False
 
+    def _finish_job(self, task, path, valentin):
+        """ Add a finished job to the trace and call the job hook.
+        """
+        if self._trace is not None:
+            self._trace.add_job(task, self._job_paths[task.get_priority()],
+                    path.get_path_rwcec(), valentin)
+        if self._job_hook is not None:
+            self._job_hook(task)
+
     def check_preemp(self, path_name, curpriority, time_past, time_to_execute,
             valentin, result_file):
         """ Check if any preemption should happen during the execution of the
@@ -268,14 +473,16 @@ class SimManager(object):
                         self._sim_time)
 
             # run simulation
+            self._ready_queue.remove(task_prio)
             path = self._get_path(path_name, task_prio)
             result = task.start_sim(
                     self, call_time, self._sim_time, path_name, path,
                     valentin, result_file)
+            self._finish_job(task, path, valentin)
 
             # set next execution time of the current task
             next_call_time = call_time + task.get_period()
-            self._ready_queue[task.get_priority()] = next_call_time
+            self._ready_queue.push(task, next_call_time)
 
             # check if a preemption will happen
             next_task_info = self._get_next_task_info(
@@ -289,9 +496,9 @@ class SimManager(object):
         return (time_still_running, wait_preemp_time)
 
     def _get_next_task_info(self, curpriority, sim_updated_time):
-        """ Check if a preemption may happen by searching all tasks whose
-            priority is greater than current one. After that, check if its
-            its call time is less than current sim time.
+        """ Check if a preemption may happen by searching the released job with
+            the highest priority in the ready queue. Then, check if it has
+            greater priority than the current one.
 
             Args:
                 curpriority (int): priority of the current path
@@ -304,23 +511,32 @@ class SimManager(object):
                     Then, the second element means next task priority while the
                     last element is the task (SimDVFS object) itself.
         """
-        if self._ready_queue.keys() == []: return None
-        next_task_prio = -1
-        next_call_time = -1
-        for prio in self._ready_queue:
-            prio_call_time = self._ready_queue[prio]
-            prio_task = self._tasks_sims[prio][0]
-            if ((next_task_prio == -1 or prio < next_task_prio) and
-                    prio < curpriority and prio_call_time +
-                    prio_task.get_jitter() < sim_updated_time):
-                next_task_prio = prio
-                next_call_time = prio_call_time
-
-        if next_task_prio == -1:
+        cur_key = self._job_key(curpriority)
+        next_job = self._ready_queue.next_preemption(cur_key, sim_updated_time)
+        if next_job is None:
             return None
-        return (next_call_time,
-                next_task_prio,
-                self._tasks_sims[next_task_prio][0])
+        next_call_time, next_task = next_job
+        return (next_call_time, next_task.get_priority(), next_task)
+
+    def get_preemp_horizon(self, curpriority):
+        """ Get the earliest time that the running job of the given task may
+            be preempted. Until the ready queue changes, there is not any
+            preemption if the job runs only before this time.
+
+            Args:
+                curpriority (int): priority of the running task
+
+            Returns:
+                (float) preemption horizon or infinity if the running job can
+                    not be preempted
+        """
+        return self._ready_queue.next_release(self._job_key(curpriority))
+
+    def _job_key(self, task_prio):
+        """ Returns the scheduler key of the current job of the given task
+        """
+        task = self._tasks_sims[task_prio][0]
+        return self._scheduler.job_key(task, task.get_call_time())
 
     def _get_path(self, path_name, task_prio):
         """ Check if current simulation is or not a random one. If it is, save
@@ -335,7 +551,11 @@ class SimManager(object):
                 (CFGPath) The path that must be executed
         """
         if self._random_path:
-            if self._first_time:
+            if self._path_trace is not None:
+                path_name = self._traced_path(task_prio)
+            elif self._path_seed is not None:
+                path_name = 'wma'[self._path_rngs[task_prio].randint(0, 2)]
+            elif self._first_time:
                 # save paths
                 path = randint(0, 2)
                 if path == 0:
@@ -351,6 +571,7 @@ class SimManager(object):
                 self._path_idx += 1
 
         # get task path to execute
+        self._job_paths[task_prio] = path_name
         if path_name == 'w':
             path = self._tasks_sims[task_prio][1]
         elif path_name == 'm':
@@ -360,6 +581,25 @@ class SimManager(object):
 
         return path
 
+    def _traced_path(self, task_prio):
+        """ Returns (string) path name of the current job of a task in the
+            path trace. If the job is not in the trace, its path is drawn and
+            added to the trace. With a path seed, the random stream of the
+            task draws for every job, also the ones read from the trace, so
+            job k always takes the k-th draw of the stream, as
+            path_trace.random_path_trace() does.
+        """
+        job = self._path_jobs.get(task_prio, 0)
+        self._path_jobs[task_prio] = job + 1
+        drawn = None
+        if self._path_seed is not None:
+            drawn = 'wma'[self._path_rngs[task_prio].randint(0, 2)]
+        path_name = self._path_trace.get_path(task_prio, job)
+        if path_name is None:
+            path_name = drawn if drawn is not None else 'wma'[randint(0, 2)]
+            self._path_trace.add_path(task_prio, path_name)
+        return path_name
+
     def add_sim_time_result(self, time):
         self._sim_time_for_result += time
 
@@ -370,15 +610,12 @@ class SimManager(object):
         """
         # case 1: simulation reached the end or it jumped in time
         if time > 0:
+            if self._idle_runs:
+                self._write_idle_slices(time)
+                return
             while self._collect_time <= time:
-                csv = '%(to_time).0f'
-                csv += ',%(slice_energy).2f,%(acc_energy).2f\n'
-                csv %= {
-                    'to_time': self._collect_time,
-                    'slice_energy': self._slice_energy_consumed,
-                    'acc_energy': self._acc_energy_consumed
-                }
-                self.print_graph_data_to_csv(csv)
+                self._write_slice(self._collect_time,
+                        self._slice_energy_consumed, self._acc_energy_consumed)
                 self._slice_energy_consumed = 0
                 self._collect_time += self._time_slice
             self._sim_time_for_result = time
@@ -387,7 +624,7 @@ class SimManager(object):
         # case 2: no time slice was reached
         exectime = cycles_to_execute / curfreq
         if self._sim_time_for_result + exectime < self._collect_time:
-            energy_to_spend = cycles_to_execute * (self._freq_volt[curfreq]**2)
+            energy_to_spend = cycles_to_execute * self._volt_sq[curfreq]
             self._slice_energy_consumed += energy_to_spend
             self._acc_energy_consumed += energy_to_spend
             self._sim_time_for_result += exectime
@@ -406,21 +643,14 @@ class SimManager(object):
         exectime -= diff
 
         cycles_consumed = math.ceil(time_running_until_slice * curfreq)
-        energy_spent = cycles_consumed * (self._freq_volt[curfreq]**2)
+        energy_spent = cycles_consumed * self._volt_sq[curfreq]
         self._handle_task[task_prio] += energy_spent
         self._handle_task_time[task_prio] += time_running_until_slice
         self._slice_energy_consumed += energy_spent
         self._acc_energy_consumed += energy_spent
 
-        csv = '%(to_time).0f'
-        csv += ',%(slice_energy).2f,%(acc_energy).2f\n'
-        csv %= {
-            'to_time': self._collect_time,
-            'slice_energy': self._slice_energy_consumed,
-            'acc_energy': self._acc_energy_consumed
-        }
-
-        self.print_graph_data_to_csv(csv)
+        self._write_slice(self._collect_time, self._slice_energy_consumed,
+                self._acc_energy_consumed)
         cycles_to_execute = math.ceil(exectime * curfreq)
         self._slice_energy_consumed = 0
         self._collect_time += self._time_slice
@@ -429,19 +659,62 @@ class SimManager(object):
             self._handle_task[prio] = 0
             self._handle_task_time[prio] = 0
 
-        energy_to_spend = cycles_to_execute * (self._freq_volt[curfreq]**2)
+        energy_to_spend = cycles_to_execute * self._volt_sq[curfreq]
         self._handle_task[task_prio] += energy_to_spend
         self._handle_task_time[task_prio] += exectime
         self._slice_energy_consumed += energy_to_spend
         self._acc_energy_consumed += energy_to_spend
         self._sim_time_for_result += exectime
 
+    def _write_idle_slices(self, time):
+        """ Write the time slices that end until the given time, when
+            no job runs, as one idle record. Only the first slice may have
+            energy of a job. Slice ends are still summed one by one, so they
+            are the same as writing one row for each slice.
+        """
+        if self._collect_time <= time and self._slice_energy_consumed:
+            self._write_slice(self._collect_time,
+                    self._slice_energy_consumed, self._acc_energy_consumed)
+            self._slice_energy_consumed = 0
+            self._collect_time += self._time_slice
+        first_time = self._collect_time
+        count = 0
+        while self._collect_time <= time:
+            count += 1
+            self._collect_time += self._time_slice
+        if count > 0:
+            self._write_slice(first_time, 0, self._acc_energy_consumed, count)
+        self._sim_time_for_result = time
+
+    def _write_slice(self, to_time, slice_energy, acc_energy, count=1):
+        """ Write the energy consumed until the end of a time slice.
+
+            Args:
+                to_time (float): time when the slice ends
+                slice_energy (float): energy consumed during the slice
+                acc_energy (float): energy consumed since simulation start
+                count (int): number of consecutive slices without energy
+                    written as one idle record, starting at this one. If it
+                    is 1, a row is written.
+        """
+        if count > 1:
+            self.print_graph_data_to_csv(format_idle_run(to_time,
+                    self._time_slice, count, acc_energy))
+            return
+        csv = '%(to_time).0f'
+        csv += ',%(slice_energy).2f,%(acc_energy).2f\n'
+        csv %= {
+            'to_time': to_time,
+            'slice_energy': slice_energy,
+            'acc_energy': acc_energy
+        }
+        self.print_graph_data_to_csv(csv)
+
     def get_handle(self):
         return self._handle_task
 
     def print_graph_data_to_csv(self, csv):
         if self._filename:
-            with open(self._filename, 'a') as dataLog:
-                dataLog.write(csv)
+            self._sink.write(self._filename, csv)
         else:
             print csv
@@ -0,0 +1,79 @@
+import tempfile, cPickle
+
+
+class SpilledPaths(object):
+    """ Paths spilled by CFGPaths to a temporary file, so all paths of a CFG
+        do not have to be kept in memory. Each path is written once, and it
+        is read by the offset returned when it was written. Nodes are written
+        as their index in a table of the nodes of all paths, so the same node
+        objects are read.
+
+        Attributes:
+            _file (file): temporary file of the paths, removed when it is
+                closed
+            _size (int): number of bytes written to the file
+            _count (int): number of paths written to the file
+            _nodes (list): nodes of the paths, by index
+            _node_ids (dic): the key is the id() of a node and the value is
+                its index in _nodes
+    """
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._size = 0
+        self._count = 0
+        self._nodes = []
+        self._node_ids = {}
+
+    def __len__(self):
+        return self._count
+
+    def get_size(self):
+        """ Returns (int) number of bytes written to the file
+        """
+        return self._size
+
+    def write(self, nodes, data):
+        """ Write a path at the end of the file.
+
+            Args:
+                nodes (list): nodes of the path
+                data (tuple): anything else kept of the path, which can be
+                    pickled
+
+            Returns:
+                (int) offset of the path in the file
+        """
+        node_ids = [self._node_id(n) for n in nodes]
+        pickled = cPickle.dumps((node_ids, data), cPickle.HIGHEST_PROTOCOL)
+        self._file.seek(0, 2)
+        self._file.write(pickled)
+        offset = self._size
+        self._size += len(pickled)
+        self._count += 1
+        return offset
+
+    def read(self, offset):
+        """ Read a path written by write().
+
+            Returns:
+                (list) nodes of the path
+                (tuple) data of the path
+        """
+        self._file.seek(offset)
+        node_ids, data = cPickle.load(self._file)
+        return [self._nodes[node_id] for node_id in node_ids], data
+
+    def close(self):
+        """ Remove the temporary file.
+        """
+        self._file.close()
+
+    def _node_id(self, n):
+        """ Returns (int) index of a node in the node table, adding it if it
+            is not there
+        """
+        node_id = self._node_ids.get(id(n))
+        if node_id is None:
+            node_id = self._node_ids[id(n)] = len(self._nodes)
+            self._nodes.append(n)
+        return node_id
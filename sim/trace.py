@@ -0,0 +1,266 @@
+import os, sys, mmap, ctypes, shutil
+from array import array
+
+
+# version of the trace format, written in its header file
+TRACE_VERSION = 2
+
+# columns of the job table: (name, array typecode). One file per column.
+JOB_COLUMNS = [
+    ('task', 'i'), # task's priority
+    ('valentin', 'B'), # 1 if Valentin's idea was used
+    ('path', 'B'), # ord() of the path name 'w', 'm' or 'a'
+    ('wcec', 'd'),
+    ('path_rwcec', 'd'),
+    ('total_wcec', 'd'), # cycles executed
+    ('energy', 'd'),
+    ('jitter', 'd'),
+    ('call', 'd'),
+    ('start', 'd'),
+    ('end', 'd'),
+    ('response', 'd'),
+    ('deadline', 'd'),
+    ('period', 'd'),
+    ('segments', 'i') # number of rows in the segment table
+]
+
+# columns of the segment table: each job has one row for each time it ran
+# with the same frequency, in the order of the job table
+SEGMENT_COLUMNS = [
+    ('freq', 'd'),
+    ('cycles', 'd'),
+    ('seg_start', 'd'),
+    ('seg_end', 'd'),
+    ('seg_energy', 'd')
+]
+
+# columns of the simulation table: each simulation written in the trace has
+# one row once it stops, in the order of the job table
+SIM_COLUMNS = [
+    ('jobs', 'i'), # number of rows in the job table
+    ('sim_end', 'd') # simulation time when it stopped
+]
+
+COLUMNS = JOB_COLUMNS + SEGMENT_COLUMNS + SIM_COLUMNS
+
+_CTYPES = {'i': ctypes.c_int, 'B': ctypes.c_ubyte, 'd': ctypes.c_double}
+
+
+class TraceWriter(object):
+    """ Write the jobs of simulations in a directory with one binary file
+        for each column. Values are in machine byte order. Rows are buffered
+        and appended to the files, so a trace can be written incrementally
+        and a trace that already exists is extended.
+
+        Args:
+            directory (string): trace directory. It is created if it does not
+                exist
+            buffer_jobs (int): jobs kept in memory before they are written
+
+        Attributes:
+            _columns (dic): the key is the column name and the value is an
+                array of values not written yet
+            _files (dic): the key is the column name and the value is the file
+                object opened in append mode
+            _sim_jobs (int): jobs added since the last simulation ended
+    """
+    def __init__(self, directory, buffer_jobs=4096):
+        self._directory = directory
+        self._buffer_jobs = buffer_jobs
+        self._jobs = 0
+        self._sim_jobs = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        _write_header(directory)
+        self._columns = {}
+        self._files = {}
+        for name, typecode in COLUMNS:
+            self._columns[name] = array(typecode)
+            self._files[name] = open(_column_file(directory, name), 'ab')
+
+    def add_job(self, task, path_name, path_rwcec, valentin):
+        """ Add the last job executed by a task.
+
+            Args:
+                task (SimDVFS): task that executed the job
+                path_name (string): path name 'w', 'm' or 'a'
+                path_rwcec (float): RWCEC of the path
+                valentin (boolean): if Valentin's idea was used
+        """
+        call, start, total_run_time, segments = task.get_job_state()
+        columns = self._columns
+        total_wcec = 0
+        total_energy = 0
+        volt_sq = task.get_processor().get_volt_sq()
+        for freq, cycles, st, et in segments:
+            energy = float(cycles) * volt_sq[freq]
+            total_wcec += cycles
+            total_energy += energy
+            columns['freq'].append(freq)
+            columns['cycles'].append(cycles)
+            columns['seg_start'].append(st)
+            columns['seg_end'].append(et)
+            columns['seg_energy'].append(energy)
+
+        columns['task'].append(task.get_priority())
+        columns['valentin'].append(1 if valentin else 0)
+        columns['path'].append(ord(path_name))
+        columns['wcec'].append(task.get_wcec())
+        columns['path_rwcec'].append(path_rwcec)
+        columns['total_wcec'].append(total_wcec)
+        columns['energy'].append(total_energy)
+        columns['jitter'].append(task.get_jitter())
+        columns['call'].append(call)
+        columns['start'].append(start)
+        columns['end'].append(start + total_run_time)
+        columns['response'].append((start - call) + total_run_time)
+        columns['deadline'].append(task.get_deadline())
+        columns['period'].append(task.get_period())
+        columns['segments'].append(len(segments))
+
+        self._sim_jobs += 1
+        self._jobs += 1
+        if self._jobs >= self._buffer_jobs:
+            self.flush()
+
+    def end_sim(self, sim_end):
+        """ Mark the end of a simulation, whose jobs are the ones added since
+            the previous one ended.
+
+            Args:
+                sim_end (float): simulation time when it stopped
+        """
+        self._columns['jobs'].append(self._sim_jobs)
+        self._columns['sim_end'].append(sim_end)
+        self._sim_jobs = 0
+
+    def flush(self):
+        for name, values in self._columns.iteritems():
+            if values:
+                values.tofile(self._files[name])
+                del values[:]
+            self._files[name].flush()
+        self._jobs = 0
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class TraceReader(object):
+    """ Read a trace written by TraceWriter. Column files are memory mapped
+        and exposed as ctypes arrays, so values are only read from disk when
+        they are accessed.
+
+        Args:
+            directory (string): trace directory
+
+        Attributes:
+            _arrays (dic): the key is the column name and the value is a
+                ctypes array over the mapped file
+            _seg_offsets (array): index of the first segment of each job. It
+                is computed the first time segments are read.
+    """
+    def __init__(self, directory):
+        _check_header(directory)
+        self._maps = []
+        self._arrays = {}
+        for name, typecode in COLUMNS:
+            self._arrays[name] = self._map_column(directory, name, typecode)
+        self._seg_offsets = None
+
+    def __len__(self):
+        return len(self._arrays['task'])
+
+    def column(self, name):
+        """ Returns (ctypes array) all values of a job, segment or simulation
+            column
+        """
+        return self._arrays[name]
+
+    def job(self, index):
+        """ Returns (dic) all values of a job by column name
+        """
+        job = {}
+        for name, typecode in JOB_COLUMNS:
+            job[name] = self._arrays[name][index]
+        job['path'] = chr(job['path'])
+        return job
+
+    def segments(self, index):
+        """ Returns (list) tuples (frequency, cycles, start time, end time,
+            energy) of a job
+        """
+        if self._seg_offsets is None:
+            offsets = array('l', [0])
+            total = 0
+            for count in self._arrays['segments']:
+                total += count
+                offsets.append(total)
+            self._seg_offsets = offsets
+        first = self._seg_offsets[index]
+        last = self._seg_offsets[index + 1]
+        return zip(*[self._arrays[name][first:last]
+                for name, typecode in SEGMENT_COLUMNS])
+
+    def close(self):
+        self._arrays = {}
+        self._maps = []
+
+    def _map_column(self, directory, name, typecode):
+        ctype = _CTYPES[typecode]
+        with open(_column_file(directory, name), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            count = size / ctypes.sizeof(ctype)
+            if count == 0:
+                return (ctype * 0)()
+            # a private copy on write mapping allows ctypes to use the buffer
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._maps.append(mapped)
+        return (ctype * count).from_buffer(mapped)
+
+
+def append_trace(src, dst):
+    """ Append the jobs of a trace to another one. Since segments are linked
+        to jobs by their count, column files are only concatenated. Each file
+        is replaced atomically by renaming.
+
+        Args:
+            src (string): directory of the trace to be appended
+            dst (string): directory of the trace that is extended
+    """
+    _check_header(src)
+    _check_header(dst)
+    for name, typecode in COLUMNS:
+        dst_file = _column_file(dst, name)
+        tmp_file = dst_file + '.tmp'
+        shutil.copyfile(dst_file, tmp_file)
+        with open(tmp_file, 'ab') as out:
+            with open(_column_file(src, name), 'rb') as f:
+                shutil.copyfileobj(f, out)
+        os.rename(tmp_file, dst_file)
+
+def _column_file(directory, name):
+    return os.path.join(directory, name + '.bin')
+
+def _header():
+    header = 'cfg-wcec-sim trace %d\n' % TRACE_VERSION
+    header += 'byteorder %s\n' % sys.byteorder
+    for name, typecode in COLUMNS:
+        header += '%s %s %d\n' % (name, typecode, array(typecode).itemsize)
+    return header
+
+def _write_header(directory):
+    filename = os.path.join(directory, 'header')
+    if os.path.exists(filename):
+        _check_header(directory)
+        return
+    with open(filename, 'w') as f:
+        f.write(_header())
+
+def _check_header(directory):
+    with open(os.path.join(directory, 'header'), 'rU') as f:
+        if f.read() != _header():
+            raise ValueError('trace format not supported: %s' % directory)
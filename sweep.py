@@ -0,0 +1,305 @@
+import sys, argparse, itertools, multiprocessing
+
+sys.path.insert(0, './tools/cfg-wcec')
+
+from sim import sim_manager, processor, batch_sim
+from sim.path_cache import PathCache
+from sim.result_sink import NullResultSink
+import run
+
+
+# tasks of the swept configuration: list of tuples (worst path, middle path,
+# dic of approximated best paths by per cent, WCEC, deadline, period, jitter,
+# initial frequency). CFGs and paths are analysed only once, then _set_tasks()
+# sets them in this process and, as the initializer of the pool, in each
+# process of the pool, so they do not depend on processes being forked.
+_tasks = None
+
+
+def sweep(config_file, processors=None, overheadsB=(100,), overheadsL=(100,),
+        approx_percents=(0.15,), studies=('wfreq', 'valentin', 'mine'),
+        paths=('w', 'm', 'a'), time_slice=20, jobs=1, exhaustive=True,
+        path_cache=None, batch=False):
+    """ Simulate all combinations of processor tables, frequency change
+        overheads, approximation per cent, studies and paths. The CFG and paths
+        of each task are found only once, then all combinations are simulated
+        in a pool of processes.
+
+        Args:
+            config_file (string): configuration file of tasks
+            processors (list): tuples (processor name, freqs_volt). If it is
+                None, the frequencies of the configuration file are used
+            overheadsB (list): cycles overhead of changing frequency in
+                type-B edges
+            overheadsL (list): cycles overhead of changing frequency in
+                type-L edges
+            approx_percents (list): how much per cent from WCEC should be the
+                approximate best path
+            studies (list): wfreq, valentin or mine
+            paths (list): 'w', 'm' or 'a'
+            time_slice (float): slices of time that simulation data must be
+                collected
+            jobs (int): number of processes
+            exhaustive (boolean): if the middle and the approximated best
+                paths are chosen by enumerating all paths, instead of by the
+                RWCEC computed by cfg_paths.PathSums
+            path_cache (PathCache): cache where paths are taken from
+            batch (boolean): if combinations are simulated at once by
+                batch_sim.BatchSim, one batch for each path in each process,
+                instead of one by one
+
+        Returns:
+            (list) tuples (processor name, overheadB, overheadL, approx per
+                cent, study, path, energy, end time), one for each combination
+                whose simulation succeeded
+    """
+    freqs_volt, tasks = analyse_tasks(config_file, approx_percents,
+            exhaustive, path_cache)
+    _set_tasks(tasks)
+    if processors is None:
+        processors = [('config', freqs_volt)]
+
+    points = []
+    for point in itertools.product(processors, overheadsB, overheadsL,
+            approx_percents, studies, paths):
+        if any(task[2][point[3]] is None for task in tasks):
+            continue
+        points.append(point + (float(time_slice),))
+    skipped = set(approx_percents) - set(p[3] for p in points)
+    for per_cent in sorted(skipped):
+        print >> sys.stderr, \
+            'approximate best path is not available for %g' % per_cent
+
+    if batch:
+        results = _simulate_batches(points, jobs)
+    elif jobs > 1:
+        pool = multiprocessing.Pool(jobs, _set_tasks, (tasks,))
+        try:
+            results = pool.map(_simulate, points)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(_simulate, points)
+
+    rows = []
+    for point, result in zip(points, results):
+        if result is not None:
+            (name, freqs_volt), overheadB, overheadL, per_cent, study, \
+                path_name = point[:6]
+            rows.append((name, overheadB, overheadL, per_cent, study,
+                    path_name) + result)
+    return rows
+
+def analyse_tasks(config_file, approx_percents, exhaustive=True,
+        path_cache=None):
+    """ Find the worst, middle and approximated best paths of each task of a
+        configuration file.
+
+        Args:
+            config_file (string): configuration file of tasks
+            approx_percents (list): how much per cent from WCEC should be the
+                approximate best path
+            exhaustive (boolean): if the middle and the approximated best
+                paths are chosen by enumerating all paths, instead of by the
+                RWCEC computed by cfg_paths.PathSums
+            path_cache (PathCache): cache where paths are taken from. If it
+                is None, paths are only kept while they are analysed.
+
+        Returns:
+            (dic) freqs_volt of the configuration file
+            (list) tuples (worst path, middle path, dic of approximated best
+                paths by per cent, WCEC, deadline, period, jitter, initial
+                frequency), one for each task
+    """
+    if path_cache is None:
+        path_cache = PathCache()
+    freqs_volt, tasks = run.read_config(config_file)
+    analysed = []
+    for cfile, wcec, deadline, period, jitter, init_freq in tasks:
+        wpath, mpath, abpaths = path_cache.find_paths(cfile, approx_percents,
+                exhaustive)
+        analysed.append((wpath, mpath, abpaths, wcec, deadline, period,
+                jitter, init_freq))
+    return freqs_volt, analysed
+
+def write_rows(rows, result_file):
+    """ Write the rows returned by sweep() in a CSV file.
+    """
+    with open(result_file, 'w') as f:
+        f.write('Processor,OverheadB,OverheadL,Approx,Study,Path,Energy,End\n')
+        for row in rows:
+            f.write('%s,%g,%g,%g,%s,%s,%.2f,%.2f\n' % row)
+
+def _set_tasks(tasks):
+    """ Set the tasks simulated by this process.
+    """
+    global _tasks
+    _tasks = tasks
+
+def _simulate(point):
+    """ Simulate one combination of parameters. Results are discarded, but a
+        result file name is still given, since the simulation manager takes
+        the study from it.
+
+        Returns:
+            (tuple) energy consumed and end time, or None if the simulation
+                exited
+    """
+    simManager, valentin, result_file = _sim_manager(point)
+    simManager.set_result_sink(NullResultSink())
+    try:
+        simManager.run_sim(point[5], valentin=valentin,
+                show_result=result_file)
+    except SystemExit:
+        return None
+    return (simManager.get_acc_energy(), simManager.get_end_time())
+
+def _simulate_batches(points, jobs=1):
+    """ Simulate combinations of parameters with batch_sim.BatchSim. The
+        combinations of each path are split in one batch for each process.
+
+        Returns:
+            (list) tuples (energy consumed, end time), in the order of points
+    """
+    batches = []
+    for path_name in sorted(set(point[5] for point in points)):
+        indexes = [i for i in range(0, len(points))
+                if points[i][5] == path_name]
+        for part in range(0, jobs):
+            if indexes[part::jobs]:
+                batches.append(indexes[part::jobs])
+    batch_points = [[points[i] for i in batch] for batch in batches]
+
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _set_tasks, (_tasks,))
+        try:
+            batch_results = pool.map(_simulate_batch, batch_points)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        batch_results = map(_simulate_batch, batch_points)
+
+    results = [None] * len(points)
+    for batch, batch_result in zip(batches, batch_results):
+        for i, result in zip(batch, batch_result):
+            results[i] = result
+    return results
+
+def _simulate_batch(points):
+    """ Simulate combinations of parameters of the same path at once.
+
+        Returns:
+            (list) tuples (energy consumed, end time), in the order of points
+    """
+    return batch_sim.run_batch([_sim_manager(point) for point in points],
+            points[0][5])
+
+def _sim_manager(point):
+    """ Create the simulation manager of one combination of parameters.
+
+        Returns:
+            (SimManager) simulation manager with the tasks of the combination
+            (boolean) if Valentin's idea should be used
+            (string) result file name, which tells the study
+    """
+    (name, freqs_volt), overheadB, overheadL, per_cent, study, path_name, \
+        time_slice = point
+    suffix, valentin = run.STUDIES.get(study, run.STUDIES['mine'])
+    path_file = dict(run.PATHS)[path_name]
+
+    simManager = sim_manager.SimManager(time_slice)
+    proc = processor.Processor(freqs_volt, name)
+    for wpath, mpath, abpaths, wcec, deadline, period, jitter, init_freq \
+            in _tasks:
+        # initial frequencies greater than all of the processor run with the
+        # greatest one
+        init_freq = proc.ceil_freq(init_freq)
+        if init_freq is None:
+            init_freq = proc.get_max_freq()
+        simManager.add_task_paths(wpath, mpath, abpaths[per_cent], wcec,
+                deadline, period, jitter, init_freq, proc, overheadB,
+                overheadL)
+    return (simManager, valentin,
+            'consumption-%s-%s.csv' % (path_file, suffix))
+
+def _parse_range(values):
+    """ Parse a comma separated list of numbers or an inclusive range
+        'start:stop:step'.
+    """
+    if ':' not in values:
+        return [float(v) for v in values.split(',')]
+    start, stop, step = [float(v) for v in values.split(':')]
+    count = int(round((stop - start) / step)) + 1
+    return [start + i * step for i in range(0, count)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+            description='Simulate all combinations of processor tables, '
+            'frequency change overheads and approximation per cent.')
+    parser.add_argument('config_file')
+    parser.add_argument('result_file')
+    parser.add_argument('--processor-info',
+            help='file with processor tables. If it is not given, the '
+            'frequencies of the configuration file are used')
+    parser.add_argument('--processors',
+            help='comma separated names of the tables to use, e.g. '
+            'XScale,PXA270. All tables are used by default')
+    parser.add_argument('--overhead-b', default='100',
+            help='list or range start:stop:step of type-B overheads')
+    parser.add_argument('--overhead-l', default='100',
+            help='list or range start:stop:step of type-L overheads')
+    parser.add_argument('--approx', default='0.15',
+            help='list or range start:stop:step of approximation per cent')
+    parser.add_argument('--studies', default='wfreq,valentin,mine')
+    parser.add_argument('--paths', default='w,m,a')
+    parser.add_argument('--time-slice', type=float, default=20)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+            help='number of processes to run simulations in parallel')
+    parser.add_argument('--batch', action='store_true',
+            help='simulate all combinations of a path at once with NumPy '
+            'arrays')
+    parser.add_argument('--path-sums', action='store_true',
+            help='choose middle and approximated best paths without '
+            'enumerating paths')
+    parser.add_argument('--path-cache', metavar='DIR',
+            help='keep the paths of each C file in this directory for the '
+            'next runs')
+    parser.add_argument('--max-paths', type=int, metavar='N',
+            help='keep at most N enumerated paths of a C file in memory; '
+            'older ones are spilled to a temporary file, but the RWCEC, '
+            'write count and file offset of every path stay in memory')
+    parser.add_argument('--cache-stats', action='store_true',
+            help='print path cache hits and misses at the end')
+    args = parser.parse_args()
+    if args.batch and batch_sim.numpy is None:
+        parser.error('--batch needs numpy')
+
+    processors = None
+    if args.processor_info:
+        processors = processor.read_processor_tables(args.processor_info)
+        if args.processors:
+            names = args.processors.split(',')
+            processors = [p for p in processors if p[0] in names]
+        if not processors:
+            print 'Processor not found'
+            sys.exit(1)
+
+    path_cache = PathCache(args.path_cache, args.max_paths)
+    try:
+        overheadsB = _parse_range(args.overhead_b)
+        overheadsL = _parse_range(args.overhead_l)
+        approx_percents = _parse_range(args.approx)
+    except ValueError:
+        print 'Arguments not valid'
+        sys.exit(1)
+
+    rows = sweep(args.config_file, processors, overheadsB, overheadsL,
+            approx_percents, args.studies.split(','), args.paths.split(','),
+            args.time_slice, args.jobs, not args.path_sums, path_cache,
+            args.batch)
+    write_rows(rows, args.result_file)
+    if args.cache_stats:
+        print >> sys.stderr, path_cache.format_stats()
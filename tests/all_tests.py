@@ -7,7 +7,25 @@ import unittest
 suite = unittest.TestLoader().loadTestsFromNames(
     [
         'test_simple_task',
-        'test_preemp_tasks'
+        'test_preemp_tasks',
+        'test_ready_queue',
+        'test_result_sink',
+        'test_trace',
+        'test_path_sums',
+        'test_segment_buffer',
+        'test_path_cache',
+        'test_processor',
+        'test_deep_paths',
+        'test_energy_timeline',
+        'test_idle_runs',
+        'test_batch_sim',
+        'test_shared_paths',
+        'test_path_trace',
+        'test_parallel_run',
+        'test_sweep',
+        'test_montecarlo',
+        'test_schedule',
+        'test_path_enumeration'
     ]
 )
 
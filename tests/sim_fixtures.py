@@ -0,0 +1,151 @@
+""" Tasks, paths and nodes shared by the tests that simulate tasks without
+    parsing any C file.
+"""
+import os
+
+from sim import sim, sim_manager
+from sim.cfg_paths import CFGPath
+from sim.result_sink import ResultSink, NullResultSink
+from cfg.cfg_nodes import CFGNodeType
+
+
+FREQS_VOLT = {1000.0: 1.8, 800.0: 1.6, 600.0: 1.3, 400.0: 1.0, 150.0: 0.75}
+
+# (WCEC of the nodes of the worst path, period, jitter, initial frequency)
+TASKS = [([1200, 900, 700], 10.0, 0.4, 800.0),
+        ([2000, 1500], 15.0, 0.0, 600.0),
+        ([3000, 2500, 1800], 30.0, 1.0, 1000.0)]
+
+# (if Valentin's idea should be used, result file name), as in run.STUDIES
+POLICIES = [(True, 'consumption-worst-wfreq.csv'),
+        (True, 'consumption-worst-v.csv'),
+        (False, 'consumption-worst-m.csv')]
+
+# WCEC of the nodes of the worst path of each C file of
+# c_files/sim_preemp.config, used by FakePathCache
+PREEMP_WCECS = {'ludcmp.c': [3000, 2500, 2000, 1500, 1107],
+        'minver.c': [4000, 2000, 1763, 1000],
+        'matmult.c': [5000, 4000, 3000, 1651]}
+
+
+class PathNode(object):
+    """ Node with the interface of CFGNode used by ExecPlan and PathCache.
+    """
+    def __init__(self, wcec=0, rwcec=0, node_type=CFGNodeType.NONE,
+            start_line=0):
+        self._wcec = wcec
+        self._rwcec = rwcec
+        self._type = node_type
+        self._start_line = start_line
+
+    def get_type(self):
+        return self._type
+
+    def get_wcec(self):
+        return self._wcec
+
+    def get_rwcec(self):
+        return self._rwcec
+
+    def get_start_line(self):
+        return self._start_line
+
+
+class ListResultSink(ResultSink):
+    """ Keep the lines of each result file in a list.
+    """
+    def __init__(self):
+        self.lines = {}
+
+    def write(self, filename, text):
+        self.lines.setdefault(filename, []).append(text)
+
+    def exists(self, filename):
+        return filename in self.lines
+
+
+class JobStateTask(sim.SimDVFS):
+    """ Task whose last job is given by set_job() instead of being
+        simulated, to write jobs in traces.
+    """
+    def set_job(self, call_time, start_time, total_run_time, segments):
+        """ Set the state returned by get_job_state().
+
+            Args:
+                call_time (float): time when the job was invoked
+                start_time (float): time when the job started to run
+                total_run_time (float): running time of the job
+                segments (list): tuples (frequency, cycles, start time, end
+                    time) of the frequency history of the job
+        """
+        self._job_state = (call_time, start_time, total_run_time,
+                list(segments))
+
+    def get_job_state(self):
+        return self._job_state
+
+
+class FakePathCache(object):
+    """ Cache with the interface of PathCache, which makes the paths of a C
+        file by make_task_paths() from the WCECs of its file name instead of
+        parsing it.
+    """
+    def __init__(self, wcecs=PREEMP_WCECS):
+        self._wcecs = wcecs
+
+    def find_paths(self, cfile, approx_percents=(0.15,), exhaustive=True):
+        wpath, mpath, abpath = make_task_paths(
+                self._wcecs[os.path.basename(cfile)], True)
+        return wpath, mpath, dict((per_cent, abpath)
+                for per_cent in approx_percents)
+
+
+def make_path(wcecs, branches=False):
+    """ Returns (CFGPath) path with one node for each WCEC. With branches,
+        all nodes but the last one are if nodes, so frequency is lowered on
+        their edges as if the worst successor had twice the cycles of the rest
+        of the path.
+    """
+    path = []
+    for i in range(0, len(wcecs)):
+        rwcec = sum(wcecs[i:])
+        if branches and i + 1 < len(wcecs):
+            node = PathNode(wcecs[i], wcecs[i] + 2 * (rwcec - wcecs[i]),
+                    CFGNodeType.IF)
+        else:
+            node = PathNode(wcecs[i], rwcec)
+        path.append((node, wcecs[i]))
+    return CFGPath(sum(wcecs), path)
+
+def make_task_paths(wcecs, branches=False):
+    """ Returns (tuple) worst path with the given WCECs, middle path without
+        the last node and approximated best path with only the first node
+    """
+    return (make_path(wcecs, branches), make_path(wcecs[:-1], branches),
+            make_path(wcecs[:1], branches))
+
+def make_sim_manager(tasks=TASKS, time_slice=5.0, branches=False,
+        result_sink=None):
+    """ Get a simulation manager of tasks whose deadline is 80% of their
+        period.
+
+        Args:
+            tasks (list): tuples (WCEC of the nodes of the worst path, period,
+                jitter, initial frequency)
+            time_slice (float): slices of time that simulation data must be
+                collected
+            branches (boolean): if paths have if nodes, as by make_path()
+            result_sink (ResultSink): where results are written. If it is
+                None, they are discarded.
+
+        Returns:
+            (SimManager) simulation manager with the tasks
+    """
+    simManager = sim_manager.SimManager(time_slice)
+    simManager.set_result_sink(result_sink if result_sink is not None else
+            NullResultSink())
+    for wcecs, period, jitter, init_freq in tasks:
+        wpath, mpath, abpath = make_task_paths(wcecs, branches)
+        simManager.add_task_paths(wpath, mpath, abpath, sum(wcecs),
+                period * 0.8, period, jitter, init_freq, FREQS_VOLT)
+    return simManager
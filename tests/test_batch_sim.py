@@ -0,0 +1,43 @@
+import sys, os
+import unittest
+
+sys.path.insert(0, '../src')
+
+from sim import batch_sim
+from sim_fixtures import TASKS, POLICIES, make_sim_manager
+
+
+# task sets: (time slice, tasks), where each task is (WCEC of the nodes of
+# the worst path, period, jitter, initial frequency)
+TASK_SETS = [(5.0, TASKS),
+        (0.5, [([800, 2400, 600, 900], 12.0, 0.0, 1000.0),
+            ([1500, 1500, 3000], 18.0, 2.5, 800.0)]),
+        (3.0, [([5000, 4000], 20.0, 0.4, 1000.0)])]
+
+
+
+class TestBatchSim(unittest.TestCase):
+    """ Check that task sets simulated at once consume the same energy and
+        end at the same time as when each one is simulated alone.
+    """
+
+    @unittest.skipIf(batch_sim.numpy is None, 'numpy is not installed')
+    def test_same_as_alone(self):
+        for path_name in ('w', 'm', 'a'):
+            alone = []
+            for time_slice, tasks in TASK_SETS:
+                for valentin, result_file in POLICIES:
+                    simManager = make_sim_manager(tasks, time_slice, True)
+                    simManager.run_sim(path_name, valentin, result_file)
+                    alone.append((simManager.get_acc_energy(),
+                            simManager.get_end_time()))
+
+            sims = [(make_sim_manager(tasks, time_slice, True), valentin,
+                    result_file) for time_slice, tasks in TASK_SETS
+                    for valentin, result_file in POLICIES]
+            self.assertEqual(batch_sim.run_batch(sims, path_name), alone)
+            self.assertNotEqual(alone[0], alone[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import sys, os
+import unittest
+
+sys.path.insert(0, '../src')
+
+from sim.cfg_paths import PathSums, CFGPaths
+from cfg.cfg import CFG
+from cfg.cfg_nodes import CFGNodeType, CFGNode
+
+
+class TestDeepPaths(unittest.TestCase):
+    """ Check that paths of a CFG deeper than the recursion limit are found,
+        and that they are the same ones given by PathSums, and that the same
+        paths are found when they are spilled.
+    """
+
+    def test_deep_cfg(self):
+        depth = sys.getrecursionlimit() * 3
+        graph = self._chain(depth, 6)
+        path_sums = PathSums(graph)
+        rwcecs = path_sums.get_rwcecs()
+
+        paths_finder = CFGPaths()
+        wpath = paths_finder.find_worst_path(graph)
+        bpath = paths_finder.find_best_path(graph)
+        self.assertEqual(wpath.get_path_rwcec(), rwcecs[-1])
+        self.assertEqual(bpath.get_path_rwcec(), rwcecs[0])
+        self.assertGreater(len(wpath.get_path()), depth)
+
+        all_paths = paths_finder._find_all_paths(graph)
+        self.assertEqual(sorted(all_paths), rwcecs)
+        for rwcec, path in all_paths.iteritems():
+            self.assertEqual(sum(wcec for n, wcec in path.get_path()), rwcec)
+
+    def test_max_paths(self):
+        graph = self._chain(300, 8)
+        paths_finder = CFGPaths()
+        all_paths = paths_finder._find_all_paths(graph)
+        spilling_finder = CFGPaths(max_paths=10)
+        spilled_paths = spilling_finder._find_all_paths(graph)
+        self.assertGreater(len(spilling_finder._spilled), 0)
+        self.assertEqual(list(spilled_paths), list(all_paths))
+        for rwcec, path in all_paths.iteritems():
+            self.assertEqual(spilling_finder._cached_path(rwcec).get_path(),
+                    path.get_path())
+
+        self.assertEqual(spilling_finder.find_middle_path(graph).get_path(),
+                paths_finder.find_middle_path(graph).get_path())
+        self.assertEqual(spilling_finder.find_approximate_best_path(graph,
+                0.9).get_path(), paths_finder.find_approximate_best_path(
+                graph, 0.9).get_path())
+
+    def _chain(self, depth, branches):
+        """ Build a chain of nodes where some nodes are if nodes with two
+            branches of different WCEC.
+        """
+        first = last = _Node(1, 10)
+        for i in range(1, depth):
+            n = _Node(i + 1, i % 7 + 1)
+            last.children = [n]
+            last = n
+            if i % (depth / branches) == 0:
+                cond = _Node(-i, 2, CFGNodeType.IF)
+                join = _Node(-i - depth, 3)
+                cond.children = [_Node(0, 20 + i % 11, children=[join]),
+                        _Node(0, 50 + i % 13, children=[join])]
+                last.children = [cond]
+                last = join
+
+        for n in _postorder(first):
+            n.rwcec = n.get_wcec() + max([c.rwcec for c in n.children] or [0])
+        return _Graph(first)
+
+
+def _postorder(start):
+    """ Returns (list) nodes reachable from start, each one after all its
+        children
+    """
+    order = []
+    seen = set()
+    stack = [(start, False)]
+    while stack:
+        n, done = stack.pop()
+        if done:
+            order.append(n)
+        elif id(n) not in seen:
+            seen.add(id(n))
+            stack.append((n, True))
+            stack.extend((child, False) for child in n.children)
+    return order
+
+
+class _Node(CFGNode):
+    """ CFG node made without parsing any C file.
+    """
+    def __init__(self, start_line, wcec, node_type=CFGNodeType.NONE,
+            children=None):
+        self.children = children or []
+        self.rwcec = 0
+        self._line = start_line
+        self._node_wcec = wcec
+        self._node_type = node_type
+
+    def get_children(self):
+        return self.children
+
+    def get_start_line(self):
+        return self._line
+
+    def get_type(self):
+        return self._node_type
+
+    def get_wcec(self):
+        return self._node_wcec
+
+    def get_rwcec(self):
+        return self.rwcec
+
+    def get_func_first_node(self):
+        return self
+
+
+class _Graph(CFG):
+    """ CFG made of _Node objects.
+    """
+    def __init__(self, start):
+        self._start = start
+
+    def get_entry_nodes(self):
+        return [self._start]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys, os
+import unittest
+import shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+from sim.trace import TraceWriter
+from sim.energy_timeline import EnergyTimeline, read_timelines
+from sim_fixtures import JobStateTask
+
+
+class TestEnergyTimeline(unittest.TestCase):
+    """ Check that the energy of any window and of time slices is found from
+        the segments of the jobs, and that each simulation of a trace has its
+        own timeline.
+    """
+
+    def test_windows_and_slices(self):
+        # segments (start, end, energy) out of time order, with idle time
+        timeline = EnergyTimeline([(6, 8, 40.0), (0, 2, 10.0), (2, 4, 30.0)],
+                12)
+        self.assertEqual(timeline.energy_at(-1), 0)
+        self.assertEqual(timeline.energy_at(1), 5.0)
+        self.assertEqual(timeline.energy_at(3), 25.0)
+        self.assertEqual(timeline.energy_at(5), 40.0)
+        self.assertEqual(timeline.energy_at(100), 80.0)
+        self.assertEqual(timeline.energy_between(3, 7), 35.0)
+        self.assertEqual(timeline.get_total(), 80.0)
+
+        self.assertEqual(timeline.slices(5), [(5, 40.0, 40.0),
+                (10, 40.0, 80.0)])
+        rows = timeline.slices(0.5)
+        self.assertEqual(len(rows), 24)
+        self.assertAlmostEqual(sum(row[1] for row in rows), 80.0)
+
+    def test_read_timelines(self):
+        trace_dir = tempfile.mkdtemp()
+        try:
+            task = JobStateTask(1000, 2, 20, 30, 0.4, 1000, {1000: 1.0})
+            writer = TraceWriter(trace_dir)
+            for jobs, sim_end in [(2, 60), (1, 30)]:
+                for job in range(jobs):
+                    task.set_job(job * 30, job * 30, 1, [(1000, 100,
+                            job * 30, job * 30 + 1)])
+                    writer.add_job(task, 'w', 100, False)
+                writer.end_sim(sim_end)
+            # a simulation which did not stop is not read
+            writer.add_job(task, 'w', 100, False)
+            writer.close()
+
+            timelines = read_timelines(trace_dir)
+            self.assertEqual([(t.get_end(), t.get_total()) for t in
+                    timelines], [(60, 200.0), (30, 100.0)])
+            self.assertEqual(timelines[0].energy_between(20, 60), 100.0)
+        finally:
+            shutil.rmtree(trace_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
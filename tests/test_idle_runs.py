@@ -0,0 +1,40 @@
+import sys, os
+import unittest
+
+sys.path.insert(0, '../src')
+
+from sim.idle_runs import IDLE_RUN, expand_idle_runs
+from sim_fixtures import ListResultSink, make_sim_manager
+
+
+# (WCEC of the nodes of the worst path, period, jitter, initial frequency),
+# with long idle times between jobs
+TASKS = [([1200, 900], 40.0, 0.4, 800.0),
+        ([2000], 60.0, 0.0, 600.0)]
+
+
+class TestIdleRuns(unittest.TestCase):
+    """ Check that idle records expand to the same rows that are written
+        without them, also over more than one hyperperiod.
+    """
+
+    def test_same_rows_expanded(self):
+        for hyperperiods in (1, 3):
+            rows = self._run(False, hyperperiods)
+            idle_rows = self._run(True, hyperperiods)
+            self.assertTrue(len(idle_rows) < len(rows) / 10)
+            self.assertTrue(any(line.startswith(IDLE_RUN)
+                    for line in idle_rows))
+            self.assertEqual(list(expand_idle_runs(idle_rows)), rows)
+
+    def _run(self, idle_runs, hyperperiods):
+        sink = ListResultSink()
+        simManager = make_sim_manager(TASKS, 0.1, result_sink=sink)
+        simManager.set_idle_runs(idle_runs)
+        simManager.run_sim('w', False, 'consumption-worst-m.csv',
+                hyperperiods)
+        return sink.lines['consumption-worst-m.csv']
+
+
+if __name__ == '__main__':
+    unittest.main()
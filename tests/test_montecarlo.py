@@ -0,0 +1,90 @@
+import sys, os
+import unittest
+import math, random
+
+sys.path.insert(0, '../src')
+
+import montecarlo
+from montecarlo import RunningStat
+from sim_fixtures import FakePathCache
+
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'c_files', 'sim_preemp.config')
+
+
+class TestRunningStat(unittest.TestCase):
+    """ Check the online mean and variance against the direct formulas, and
+        the interval of samples too small to have one.
+    """
+
+    def test_same_as_direct(self):
+        rand = random.Random(3)
+        values = [1e6 + rand.gauss(0, 50) for i in range(0, 500)]
+        stat = RunningStat()
+        for value in values:
+            stat.add(value)
+
+        n = len(values)
+        mean = math.fsum(values) / n
+        stdev = math.sqrt(math.fsum((v - mean) ** 2 for v in values) /
+                (n - 1))
+        self.assertEqual(stat.get_n(), n)
+        self.assertAlmostEqual(stat.get_mean(), mean, 6)
+        self.assertAlmostEqual(stat.get_stdev(), stdev, 6)
+        self.assertAlmostEqual(stat.get_half_width(),
+                montecarlo.Z_95 * stdev / math.sqrt(n), 6)
+        self.assertAlmostEqual(stat.get_rel_precision(),
+                stat.get_half_width() / mean, 12)
+
+    def test_small_samples(self):
+        stat = RunningStat()
+        self.assertEqual(stat.get_stdev(), 0.0)
+        self.assertEqual(stat.get_half_width(), float('inf'))
+        stat.add(-4.0)
+        self.assertEqual(stat.get_mean(), -4.0)
+        self.assertEqual(stat.get_half_width(), float('inf'))
+        stat.add(-4.0)
+        self.assertEqual(stat.get_half_width(), 0.0)
+        self.assertEqual(stat.get_rel_precision(), 0.0)
+
+    def test_zero_mean(self):
+        stat = RunningStat()
+        for value in (0, 0, 0):
+            stat.add(value)
+        self.assertEqual(stat.get_rel_precision(), 0.0)
+        stat.add(1)
+        stat.add(-1)
+        self.assertEqual(stat.get_mean(), 0.0)
+        self.assertEqual(stat.get_rel_precision(), float('inf'))
+
+
+class TestMonteCarlo(unittest.TestCase):
+    """ Check that replications do not depend on the number of processes and
+        stop once the means are precise enough.
+    """
+
+    def test_same_in_pool(self):
+        serial = self._monte_carlo(20)
+        self.assertEqual(self._means(self._monte_carlo(20, jobs=2)),
+                self._means(serial))
+        self.assertEqual(dict(serial)['energy'].get_n(), 20)
+        self.assertTrue(dict(serial)['energy'].get_stdev() > 0)
+
+    def test_precision(self):
+        stats = self._monte_carlo(40, precision=1.0, min_replications=5)
+        self.assertEqual(dict(stats)['energy'].get_n(), 5)
+        stats = self._monte_carlo(40, precision=1e-9, min_replications=5)
+        self.assertEqual(dict(stats)['energy'].get_n(), 40)
+
+    def _monte_carlo(self, replications, **kwargs):
+        return montecarlo.monte_carlo(CONFIG_FILE, 'mine', 20, 1,
+                replications, 7, path_cache=FakePathCache(), **kwargs)
+
+    def _means(self, stats):
+        return [(name, stat.get_n(), stat.get_mean(), stat.get_stdev())
+                for name, stat in stats]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys, os
+import unittest
+import glob, shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+import run
+from sim_fixtures import FakePathCache
+
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'c_files', 'sim_preemp.config')
+
+STUDIES = [(CONFIG_FILE, 'wfreq'), (CONFIG_FILE, 'valentin'),
+        (CONFIG_FILE, 'mine')]
+
+class TestParallelRun(unittest.TestCase):
+    """ Check that the result files merged by a parallel run are the same,
+        byte by byte, as the files of a serial run, and that a failed run
+        does not leave its work directory behind.
+    """
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_same_files_as_serial(self):
+        serial = self._result_dir('serial')
+        for config_file, study in STUDIES:
+            run.run(config_file, study, 20, serial, 2, True,
+                    path_cache=FakePathCache())
+        parallel = self._result_dir('parallel')
+        self.assertTrue(run.run_parallel(STUDIES, 20, parallel, 2, 3, True,
+                path_cache=FakePathCache()))
+
+        self.assertEqual(self._files(parallel), self._files(serial))
+        self.assertTrue(len(self._files(serial)) > len(STUDIES) * 3)
+        self.assertEqual(glob.glob(os.path.join(parallel, '.run-*')), [])
+
+    def test_work_directory_removed_on_error(self):
+        result_dir = self._result_dir('failed')
+        merge = run._merge_result_file
+        def fail(work_file, result_file):
+            raise OSError('merge failed')
+        run._merge_result_file = fail
+        try:
+            self.assertRaises(OSError, run.run_parallel, STUDIES[:1], 20,
+                    result_dir, 1, 2, path_cache=FakePathCache())
+        finally:
+            run._merge_result_file = merge
+        self.assertEqual(os.listdir(result_dir), [])
+
+    def _result_dir(self, name):
+        result_dir = os.path.join(self._directory, name)
+        os.mkdir(result_dir)
+        return result_dir
+
+    def _files(self, result_dir):
+        """ Returns (dic) contents of each file below a directory, by its
+            path relative to it
+        """
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(result_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, result_dir)] = f.read()
+        return files
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import sys, os
+import unittest
+import shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+from sim import path_cache
+from sim.path_cache import PathCache
+from sim.cfg_paths import CFGPath
+from cfg.cfg_nodes import CFGNodeType
+from sim_fixtures import PathNode
+
+
+class TestPathCache(unittest.TestCase):
+    """ Check that a path kept by the cache has the same RWCEC, nodes and
+        compiled plan as the found one, and that files which could not be
+        read are not used.
+    """
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_store_and_load(self):
+        path = CFGPath(17, [(PathNode(5, 20, CFGNodeType.IF, 1), 5),
+                (PathNode(8, 12, start_line=3), 8),
+                (PathNode(4, 4, start_line=7), 4)])
+        data = (path_cache._to_data(path), None, [(0.15, None)])
+        cache = PathCache(self._directory)
+        cache._store('k', data)
+        self.assertEqual(cache.get_stats()['files'], 1)
+
+        data = PathCache(self._directory)._load('k')
+        loaded = path_cache._from_data(data[0])
+        self.assertEqual(loaded.get_path_rwcec(), 17)
+        self.assertEqual([(n.get_start_line(), wcec)
+                for n, wcec in loaded.get_path()], [(1, 5), (3, 8), (7, 4)])
+        plan = path.get_plan()
+        self.assertEqual((loaded.get_plan().cycles, loaded.get_plan().kinds,
+                loaded.get_plan().args), (plan.cycles, plan.kinds, plan.args))
+        self.assertEqual(plan.args[0], (15, 12))
+
+        cache.clear()
+        self.assertIsNone(cache._load('k'))
+        self.assertEqual(cache.get_stats()['files'], 0)
+
+    def test_broken_file(self):
+        cache = PathCache(self._directory)
+        with open(cache._filename('k'), 'wb') as f:
+            f.write('not a pickle')
+        self.assertIsNone(cache._load('k'))
+        self.assertEqual(cache.get_stats()['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
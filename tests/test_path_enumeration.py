@@ -0,0 +1,230 @@
+import sys, os
+import unittest
+import random, math
+
+sys.path.insert(0, '../src')
+
+from sim.cfg_paths import CFGPaths
+from cfg.cfg import CFG
+from cfg.cfg_nodes import CFGNodeType, CFGNode
+
+
+class TestPathEnumeration(unittest.TestCase):
+    """ Check that the paths enumerated by CFGPaths, whose nodes are shared
+        between paths, are the same ones, in the same order, as the paths
+        found by a plain recursive enumeration that copies the nodes of each
+        path, on random graphs with loops reached from more than one node.
+    """
+
+    def test_same_as_reference(self):
+        rand = random.Random(17)
+        loops = 0
+        for i in range(0, 300):
+            graph = _random_graph(rand)
+            expected = _ReferencePaths().find_all_paths(graph)
+            for max_paths in (None, 3):
+                paths_finder = CFGPaths(max_paths=max_paths)
+                found = paths_finder._find_all_paths(graph)
+                self.assertEqual(list(found), list(expected))
+                for rwcec in found:
+                    path = paths_finder._cached_path(rwcec)
+                    self.assertEqual(path.get_path_rwcec(), rwcec)
+                    self.assertEqual(path.get_path(), expected[rwcec])
+            loops += any(n.get_type() == CFGNodeType.PSEUDO
+                    for n in _postorder(graph.get_entry_nodes()[0]))
+        self.assertTrue(loops > 100)
+
+
+class _ReferencePaths(object):
+    """ Recursive enumeration of all paths of a CFG, where each path is a
+        list of (node, WCEC) copied from the path of its parent, and paths
+        through a loop found before are taken from the paths already found.
+    """
+    def __init__(self):
+        self._all_paths = {}
+        self._visited_loops = {}
+
+    def find_all_paths(self, graph):
+        """ Returns (dic) path as a list of tuples (node, WCEC) by RWCEC
+        """
+        start = graph.get_entry_nodes()[0].get_func_first_node()
+        self._visit(start, [(start, start.get_wcec())], start.get_wcec(), 0)
+        return self._all_paths
+
+    def _visit(self, n, path, newrwcec, bestrwcec):
+        tmp_path = cfg_path = None
+        for child in n.get_children():
+            if child.get_type() != CFGNodeType.PSEUDO:
+                data = (child, child.get_wcec())
+                path.append(data)
+                tmp_path = self._visit(child, path,
+                        newrwcec + child.get_wcec(), bestrwcec)
+                path.remove(data)
+            else:
+                tmp_path = self._visit_loop(child, path, newrwcec, bestrwcec)
+            if tmp_path is not None and (cfg_path is None or
+                    tmp_path[0] > cfg_path[0]):
+                cfg_path = tmp_path
+                bestrwcec = cfg_path[0]
+
+        if n.get_children() == []:
+            self._all_paths[newrwcec] = list(path)
+            if newrwcec > bestrwcec:
+                cfg_path = (newrwcec, list(path))
+        return cfg_path
+
+    def _visit_loop(self, child, path, newrwcec, bestrwcec):
+        tmp_path = cfg_path = None
+        if child.get_start_line() in self._visited_loops:
+            paths_visited = self._visited_loops[child.get_start_line()]
+            for rwcec in list(self._all_paths):
+                if paths_visited == 0:
+                    break
+                found_path = self._all_paths[rwcec]
+                nodes = [node for node, wcec in found_path]
+                if child not in nodes:
+                    continue
+                new_path = path + found_path[nodes.index(child):]
+                newrwcec = sum(wcec for node, wcec in new_path)
+                if newrwcec not in self._all_paths:
+                    paths_visited -= 1
+                self._all_paths[newrwcec] = new_path
+                if newrwcec > bestrwcec:
+                    bestrwcec = newrwcec
+                    if cfg_path is None or newrwcec > cfg_path[0]:
+                        cfg_path = (newrwcec, new_path)
+            return cfg_path
+
+        prev_length = len(self._all_paths)
+        for i in range(0, child.get_loop_iters() + 1):
+            loop_wcec = _loop_wcec(child, i)
+            if (self._all_paths == {} or
+                    child.get_start_line() not in self._visited_loops):
+                data = (child, loop_wcec)
+                path.append(data)
+                tmp_path = self._visit(child, path, newrwcec + loop_wcec,
+                        bestrwcec)
+                path.remove(data)
+                self._visited_loops[child.get_start_line()] = 1
+            else:
+                prev_loop_wcec = _loop_wcec(child, i - 1)
+                data = (child, prev_loop_wcec)
+                for rwcec in list(self._all_paths):
+                    if data in self._all_paths[rwcec]:
+                        new_path = list(self._all_paths[rwcec])
+                        new_path[new_path.index(data)] = (child, loop_wcec)
+                        newrwcec = rwcec - prev_loop_wcec + loop_wcec
+                        self._all_paths[newrwcec] = new_path
+                        if newrwcec > bestrwcec:
+                            tmp_path = (newrwcec, new_path)
+                            bestrwcec = newrwcec
+            if tmp_path is not None and (cfg_path is None or
+                    tmp_path[0] > cfg_path[0]):
+                cfg_path = tmp_path
+                bestrwcec = cfg_path[0]
+
+        self._visited_loops[child.get_start_line()] = \
+                len(self._all_paths) - prev_length
+        return cfg_path
+
+
+def _loop_wcec(n, iters):
+    """ Returns (int) WCEC of a loop condition node when the loop is done the
+        given number of times
+    """
+    loop_wcec = float(n.get_refnode_rwcec() - n.get_wcec())
+    return int(math.ceil(n.get_wcec() + loop_wcec / n.get_loop_iters() *
+            iters))
+
+def _random_graph(rand):
+    """ Build a DAG of layers where each node has edges to some nodes of the
+        next layer, and some nodes are loop conditions.
+    """
+    lines = iter(range(1, 1000))
+    layers = [[_Node(next(lines), rand.randint(1, 20))]]
+    for i in range(0, rand.randint(2, 5)):
+        layer = []
+        for j in range(0, rand.randint(1, 3)):
+            if rand.random() < 0.3:
+                layer.append(_Node(next(lines), rand.randint(1, 5),
+                        CFGNodeType.PSEUDO, rand.randint(1, 4),
+                        rand.randint(10, 40)))
+            else:
+                layer.append(_Node(next(lines), rand.randint(1, 20)))
+        for n in layers[-1]:
+            n.children = rand.sample(layer, rand.randint(1, len(layer)))
+        layers.append(layer)
+
+    for n in _postorder(layers[0][0]):
+        wcec = n.get_refnode_rwcec() or n.get_wcec()
+        n.rwcec = wcec + max([c.rwcec for c in n.children] or [0])
+    return _Graph(layers[0][0])
+
+def _postorder(start):
+    """ Returns (list) nodes reachable from start, each one after all its
+        children
+    """
+    order = []
+    seen = set()
+    stack = [(start, False)]
+    while stack:
+        n, done = stack.pop()
+        if done:
+            order.append(n)
+        elif id(n) not in seen:
+            seen.add(id(n))
+            stack.append((n, True))
+            stack.extend((child, False) for child in n.children)
+    return order
+
+
+class _Node(CFGNode):
+    """ CFG node made without parsing any C file.
+    """
+    def __init__(self, start_line, wcec, node_type=CFGNodeType.NONE,
+            loop_iters=0, refnode_rwcec=0):
+        self.children = []
+        self.rwcec = 0
+        self._line = start_line
+        self._node_wcec = wcec
+        self._node_type = node_type
+        self._loop_iters = loop_iters
+        self._refnode_rwcec = refnode_rwcec
+
+    def get_children(self):
+        return self.children
+
+    def get_start_line(self):
+        return self._line
+
+    def get_type(self):
+        return self._node_type
+
+    def get_wcec(self):
+        return self._node_wcec
+
+    def get_rwcec(self):
+        return self.rwcec
+
+    def get_loop_iters(self):
+        return self._loop_iters
+
+    def get_refnode_rwcec(self):
+        return self._refnode_rwcec
+
+    def get_func_first_node(self):
+        return self
+
+
+class _Graph(CFG):
+    """ CFG made of _Node objects.
+    """
+    def __init__(self, start):
+        self._start = start
+
+    def get_entry_nodes(self):
+        return [self._start]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import sys, os
+import unittest
+import random, math
+
+sys.path.insert(0, '../src')
+
+from sim.cfg_paths import PathSums, CFGPaths
+from cfg.cfg import CFG
+from cfg.cfg_nodes import CFGNodeType
+
+
+class TestPathSums(unittest.TestCase):
+    """ Check that the RWCEC computed by dynamic programming are the same as
+        the ones found by walking all paths of small random graphs, that the
+        built paths have the requested RWCEC and that paths are generated in
+        RWCEC order.
+    """
+
+    def test_sums_of_all_paths(self):
+        rand = random.Random(7)
+        for i in range(0, 50):
+            graph = self._random_graph(rand)
+            path_sums = PathSums(graph)
+
+            counts = {}
+            start = graph.get_entry_nodes()[0].get_func_first_node()
+            self._walk(start, start.get_wcec(), counts)
+            self.assertEqual(path_sums.get_rwcecs(), sorted(counts.keys()))
+            self.assertEqual(path_sums.get_counts(), counts)
+            self.assertEqual(len(path_sums), len(counts))
+
+    def test_find_path(self):
+        rand = random.Random(11)
+        for i in range(0, 50):
+            graph = self._random_graph(rand)
+            path_sums = PathSums(graph)
+            for rwcec in path_sums.get_rwcecs():
+                path = path_sums.find_path(rwcec)
+                self.assertEqual(path.get_path_rwcec(), rwcec)
+                self.assertEqual(sum(wcec for n, wcec in path.get_path()),
+                        rwcec)
+            self.assertIsNone(path_sums.find_path(-1))
+            self.assertIsNone(path_sums.find_path(
+                    path_sums.get_rwcecs()[-1] + 1))
+
+    def test_greatest_not_above(self):
+        graph = self._random_graph(random.Random(3))
+        path_sums = PathSums(graph)
+        rwcecs = path_sums.get_rwcecs()
+        for limit in range(-1, rwcecs[-1] + 2):
+            below = [r for r in rwcecs if r <= limit]
+            expected = below[-1] if below else None
+            self.assertEqual(path_sums.greatest_not_above(limit), expected)
+
+    def test_iter_paths_sorted(self):
+        rand = random.Random(5)
+        for i in range(0, 50):
+            graph = self._random_graph(rand)
+            counts = {}
+            start = graph.get_entry_nodes()[0].get_func_first_node()
+            self._walk(start, start.get_wcec(), counts)
+            expected = sorted(r for r in counts for k in range(counts[r]))
+
+            for reverse in (False, True):
+                paths = list(CFGPaths().iter_paths(graph, reverse))
+                rwcecs = [path.get_path_rwcec() for path in paths]
+                self.assertEqual(rwcecs, sorted(expected, reverse=reverse))
+                for path in paths:
+                    self.assertEqual(sum(wcec for n, wcec in path.get_path()),
+                            path.get_path_rwcec())
+
+    def _walk(self, n, rwcec, counts):
+        """ Count the paths from n by walking all of them.
+        """
+        if not n.get_children():
+            counts[rwcec] = counts.get(rwcec, 0) + 1
+            return
+        for child in n.get_children():
+            if child.get_type() != CFGNodeType.PSEUDO:
+                self._walk(child, rwcec + child.get_wcec(), counts)
+                continue
+            for i in range(0, child.get_loop_iters() + 1):
+                loop_wcec = (child.get_refnode_rwcec() - child.get_wcec())
+                loop_wcec = float(loop_wcec) / child.get_loop_iters()
+                loop_wcec = int(math.ceil(child.get_wcec() + loop_wcec * i))
+                self._walk(child, rwcec + loop_wcec, counts)
+
+    def _random_graph(self, rand):
+        """ Build a DAG of layers where each node has edges to some nodes of
+            the next layer, and some nodes are loop conditions.
+        """
+        layers = [[_Node(rand.randint(1, 20))]]
+        for i in range(0, rand.randint(2, 5)):
+            layer = []
+            for j in range(0, rand.randint(1, 3)):
+                if rand.random() < 0.3:
+                    layer.append(_Node(rand.randint(1, 5), rand.randint(1, 4),
+                            rand.randint(10, 40)))
+                else:
+                    layer.append(_Node(rand.randint(1, 20)))
+            for n in layers[-1]:
+                n.children = rand.sample(layer, rand.randint(1, len(layer)))
+            layers.append(layer)
+        return _Graph(layers[0][0])
+
+
+class _Node(object):
+    """ Node with the interface of CFGNode used by PathSums.
+    """
+    def __init__(self, wcec, loop_iters=0, refnode_rwcec=0):
+        self.children = []
+        self._wcec = wcec
+        self._loop_iters = loop_iters
+        self._refnode_rwcec = refnode_rwcec
+
+    def get_children(self):
+        return self.children
+
+    def get_type(self):
+        if self._loop_iters > 0:
+            return CFGNodeType.PSEUDO
+        return CFGNodeType.NONE
+
+    def get_wcec(self):
+        return self._wcec
+
+    def get_loop_iters(self):
+        return self._loop_iters
+
+    def get_refnode_rwcec(self):
+        return self._refnode_rwcec
+
+    def get_func_first_node(self):
+        return self
+
+
+class _Graph(CFG):
+    """ CFG made of _Node objects.
+    """
+    def __init__(self, start):
+        self._start = start
+
+    def get_entry_nodes(self):
+        return [self._start]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys, os
+import unittest
+import shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+from sim.path_trace import PathTrace, read_path_trace, random_path_trace
+from sim_fixtures import TASKS, make_sim_manager
+
+
+class TestPathTrace(unittest.TestCase):
+    """ Check that a path trace is read back as it was written, and that
+        random path simulations which take their paths from a trace are the
+        same as simulations which draw them.
+    """
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_save_and_read(self):
+        path_trace = PathTrace()
+        paths = {1: 'wmaawm', 3: 'a' * 9}
+        for task_prio, path_names in paths.items():
+            for path_name in path_names:
+                path_trace.add_path(task_prio, path_name)
+        filename = os.path.join(self._directory, 'paths')
+        path_trace.save(filename)
+
+        read = read_path_trace(filename)
+        self.assertEqual(read.get_tasks(), [1, 3])
+        for task_prio, path_names in paths.items():
+            self.assertEqual(read.get_jobs(task_prio), len(path_names))
+            self.assertEqual(''.join(read.get_path(task_prio, job)
+                    for job in range(0, len(path_names))), path_names)
+        self.assertIsNone(read.get_path(1, 6))
+        self.assertIsNone(read.get_path(2, 0))
+
+    def test_same_as_seeded(self):
+        jobs = {1: 12, 2: 8}
+        for valentin, result_file in ((True, 'consumption-random-v.csv'),
+                (False, 'consumption-random-m.csv')):
+            seeded = make_sim_manager(TASKS[:2])
+            seeded.set_path_seed(5)
+            seeded.run_sim('', valentin, result_file, 4)
+
+            traced = make_sim_manager(TASKS[:2])
+            traced.set_path_trace(random_path_trace(jobs, 5))
+            traced.run_sim('', valentin, result_file, 4)
+            self.assertEqual((traced.get_acc_energy(),
+                    traced.get_end_time()), (seeded.get_acc_energy(),
+                    seeded.get_end_time()))
+
+        recorded = PathTrace()
+        simManager = make_sim_manager(TASKS[:2])
+        simManager.set_path_seed(5)
+        simManager.set_path_trace(recorded)
+        simManager.run_sim('', False, 'consumption-random-m.csv', 4)
+        drawn = random_path_trace(jobs, 5)
+        for task_prio in jobs:
+            self.assertEqual([recorded.get_path(task_prio, job)
+                    for job in range(0, recorded.get_jobs(task_prio))],
+                    [drawn.get_path(task_prio, job)
+                    for job in range(0, recorded.get_jobs(task_prio))])
+        self.assertEqual(set(drawn.get_path(1, job) for job in range(0, 12)),
+                set('wma'))
+
+    def test_extend_seeded(self):
+        jobs = {1: 12, 2: 8}
+        drawn = random_path_trace(jobs, 5)
+        partial = PathTrace()
+        for task_prio in jobs:
+            for job in range(0, 3):
+                partial.add_path(task_prio, drawn.get_path(task_prio, job))
+
+        simManager = make_sim_manager(TASKS[:2])
+        simManager.set_path_seed(5)
+        simManager.set_path_trace(partial)
+        simManager.run_sim('', False, 'consumption-random-m.csv', 4)
+        for task_prio in jobs:
+            self.assertTrue(partial.get_jobs(task_prio) > 3)
+            self.assertEqual([partial.get_path(task_prio, job)
+                    for job in range(0, partial.get_jobs(task_prio))],
+                    [drawn.get_path(task_prio, job)
+                    for job in range(0, partial.get_jobs(task_prio))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import sys, os
+import unittest
+
+sys.path.insert(0, '../src')
+
+from sim.processor import Processor
+
+
+class TestProcessor(unittest.TestCase):
+    """ Check that frequencies are mapped as by scanning all of them and that
+        energy is the same as computed from the supply voltage.
+    """
+
+    def test_ceil_freq(self):
+        freqs_volt = {1000.0: 1.8, 800.0: 1.6, 600.0: 1.3, 400.0: 1.0,
+                150.0: 0.75}
+        processor = Processor(freqs_volt)
+        self.assertEqual(processor.get_freqs(), sorted(freqs_volt))
+        self.assertEqual(processor.get_max_freq(), 1000.0)
+        for freq in range(0, 1100, 25) + [400.0, 400.5, 999.9]:
+            greater = [f for f in freqs_volt if f >= freq]
+            expected = min(greater) if greater else None
+            self.assertEqual(processor.ceil_freq(freq), expected)
+
+    def test_energy(self):
+        freqs_volt = {1000.0: 1.8, 600.0: 1.3, 150.0: 0.75}
+        processor = Processor(freqs_volt)
+        for freq, volt in freqs_volt.iteritems():
+            self.assertEqual(processor.energy(freq, 1234.0),
+                    1234.0 * (volt**2))
+            self.assertEqual(processor.get_volt(freq), volt)
+
+
+if __name__ == '__main__':
+    unittest.main()
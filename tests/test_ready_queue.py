@@ -0,0 +1,205 @@
+import sys, os
+import unittest
+import random
+
+sys.path.insert(0, '../src')
+
+from sim import sim
+from sim.ready_queue import ReadyQueue
+from sim.scheduler import FixedPriorityScheduler, EDFScheduler
+from sim_fixtures import make_sim_manager
+
+
+# (WCEC of the nodes of the worst path, period, jitter, initial frequency),
+# where jobs of the last task are released while a job of the second one
+# runs, and jobs of the first task straddle both
+STRADDLING_TASKS = [([600, 400], 10.0, 0.4, 1000.0),
+        ([4000, 4000, 3000], 30.0, 1.0, 600.0),
+        ([600, 300], 7.5, 0.0, 800.0)]
+
+
+class TestReadyQueue(unittest.TestCase):
+    """ Check that the heap-backed ready queue chooses the same jobs as a
+        linear search over all tasks, for fixed priority and EDF policies.
+
+        Attributes:
+            _tasks (list): SimDVFS objects whose priority is the list index
+                plus one
+    """
+
+    def test_dispatch_highest_priority_released(self):
+        self._init_data([(10, 0), (20, 1), (40, 0)])
+        queue = ReadyQueue(FixedPriorityScheduler())
+        queue.push(self._tasks[2], 0)
+        queue.push(self._tasks[1], 1.5)
+        queue.push(self._tasks[0], 3)
+
+        # task 2 is released only inside its jitter window
+        call_time, task = queue.next_dispatch(0.6)
+        self.assertEqual(task.get_priority(), 2)
+        self.assertEqual(call_time, 1.5)
+
+        # there is not any released job, so take the smallest call time
+        queue.remove(2)
+        queue.remove(3)
+        call_time, task = queue.next_dispatch(0)
+        self.assertEqual(task.get_priority(), 1)
+        self.assertEqual(call_time, 3)
+
+    def test_preemption_only_by_higher_priority(self):
+        self._init_data([(10, 0.4), (20, 0.4), (40, 0.4)])
+        queue = ReadyQueue(FixedPriorityScheduler())
+        queue.push(self._tasks[0], 10)
+        queue.push(self._tasks[2], 0)
+
+        self.assertEqual(queue.next_preemption(2, 10.4), None)
+        call_time, task = queue.next_preemption(2, 10.5)
+        self.assertEqual(task.get_priority(), 1)
+        self.assertEqual(queue.next_preemption(1, 10.5), None)
+
+    def test_edf_orders_by_absolute_deadline(self):
+        self._init_data([(10, 0), (20, 0), (40, 0)])
+        scheduler = EDFScheduler()
+        queue = ReadyQueue(scheduler)
+        queue.push(self._tasks[0], 35)
+        queue.push(self._tasks[1], 20)
+        queue.push(self._tasks[2], 0)
+
+        # deadlines: task 1 at 45, task 2 at 40 and task 3 at 40
+        call_time, task = queue.next_dispatch(36)
+        self.assertEqual(task.get_priority(), 2)
+
+        running = self._tasks[2]
+        cur_key = scheduler.job_key(running, 0)
+        self.assertEqual(queue.next_preemption(cur_key, 40), None)
+
+    def test_same_choices_as_linear_search(self):
+        rand = random.Random(7)
+        self._init_data([(rand.choice([10, 20, 30, 40, 60]),
+                rand.choice([0, 0.4, 1])) for i in range(300)])
+        queue = ReadyQueue(FixedPriorityScheduler())
+        call_times = {}
+        for task in self._tasks:
+            call_time = rand.randint(0, 100)
+            queue.push(task, call_time)
+            call_times[task.get_priority()] = call_time
+
+        sim_time = 0
+        for i in range(2000):
+            sim_time += rand.random() * 0.5
+            expected = self._linear_dispatch(call_times, sim_time)
+            call_time, task = queue.next_dispatch(sim_time)
+            self.assertEqual((call_time, task.get_priority()), expected)
+
+            curpriority = rand.randint(1, len(self._tasks))
+            time = sim_time + rand.random() * 5
+            expected = self._linear_preemption(call_times, curpriority, time)
+            job = queue.next_preemption(curpriority, time)
+            if job is not None:
+                job = (job[0], job[1].get_priority())
+            self.assertEqual(job, expected)
+
+            # dispatch the job and schedule its next invocation
+            prio = task.get_priority()
+            queue.remove(prio)
+            call_times[prio] = call_time + task.get_period()
+            queue.push(task, call_times[prio])
+
+    def test_release_straddling_horizon(self):
+        self._init_data([(10, 0.4), (20, 0.5), (40, 1)])
+        queue = ReadyQueue(FixedPriorityScheduler())
+        queue.push(self._tasks[2], 0)
+        queue.push(self._tasks[1], 3)
+        self.assertEqual(queue.next_release(3), 3.5)
+        self.assertEqual(queue.next_release(2), float('inf'))
+
+        # a job of task 1 released before the horizon moves it back
+        queue.push(self._tasks[0], 2)
+        self.assertEqual(queue.next_release(3), 2.4)
+        self.assertEqual(queue.next_release(2), 2.4)
+        queue.remove(1)
+        self.assertEqual(queue.next_release(3), 3.5)
+        queue.remove(2)
+        self.assertEqual(queue.next_release(3), float('inf'))
+
+    def test_same_releases_as_linear_search(self):
+        rand = random.Random(11)
+        self._init_data([(rand.choice([10, 20, 30, 40, 60]),
+                rand.choice([0, 0.4, 1])) for i in range(70)])
+        for scheduler in (FixedPriorityScheduler(), EDFScheduler()):
+            queue = ReadyQueue(scheduler)
+            call_times = {}
+            for i in range(3000):
+                task = rand.choice(self._tasks)
+                prio = task.get_priority()
+                if prio in call_times and rand.random() < 0.3:
+                    queue.remove(prio)
+                    del call_times[prio]
+                else:
+                    call_times[prio] = rand.randint(0, 400) * 0.25
+                    queue.push(task, call_times[prio])
+
+                running = rand.choice(self._tasks)
+                cur_key = scheduler.job_key(running, rand.randint(0, 100))
+                expected = min([call_times[p] + self._tasks[p - 1].get_jitter()
+                        for p in call_times if scheduler.job_key(
+                        self._tasks[p - 1], call_times[p]) < cur_key] +
+                        [float('inf')])
+                self.assertEqual(queue.next_release(cur_key), expected)
+
+    def test_same_simulation_without_horizon(self):
+        """ Jobs that run across the preemption horizon must be preempted as
+            when the simulation manager is asked at each node.
+        """
+        for path_name in ('w', 'm', 'a'):
+            for valentin, result_file in ((True, 'consumption-worst-v.csv'),
+                    (False, 'consumption-worst-m.csv')):
+                results = []
+                for horizon in (True, False):
+                    simManager = make_sim_manager(STRADDLING_TASKS, 1.0, True)
+                    if not horizon:
+                        simManager._ready_queue.next_release = \
+                                lambda cur_key: float('-inf')
+                    response_times = []
+                    simManager.set_job_hook(lambda task:
+                            response_times.append((task.get_priority(),
+                                task.get_response_time())))
+                    simManager.run_sim(path_name, valentin, result_file, 2)
+                    results.append((simManager.get_acc_energy(),
+                            simManager.get_end_time(), response_times))
+                self.assertEqual(results[0], results[1])
+                # jobs of task 2 run across the release of task 3 at 7.5
+                self.assertTrue(min(t for prio, t in results[0][2]
+                        if prio == 2) > 7.5)
+
+    def _init_data(self, periods_jitters):
+        """ Create one task for each tuple (period, jitter).
+        """
+        freqs_volt = {1000: 1.8}
+        self._tasks = []
+        for period, jitter in periods_jitters:
+            self._tasks.append(sim.SimDVFS(
+                    1000, len(self._tasks) + 1, period, period, jitter,
+                    1000, freqs_volt))
+
+    def _linear_dispatch(self, call_times, sim_time):
+        best = None
+        for prio in sorted(call_times):
+            task = self._tasks[prio - 1]
+            if call_times[prio] < sim_time + task.get_jitter():
+                return (call_times[prio], prio)
+            if best is None or call_times[prio] < best[0]:
+                best = (call_times[prio], prio)
+        return best
+
+    def _linear_preemption(self, call_times, curpriority, time):
+        for prio in sorted(call_times):
+            task = self._tasks[prio - 1]
+            if (prio < curpriority and
+                    call_times[prio] + task.get_jitter() < time):
+                return (call_times[prio], prio)
+        return None
+
+
+if __name__ == '__main__':
+    unittest.main()
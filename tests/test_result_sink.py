@@ -0,0 +1,62 @@
+import sys, os
+import unittest
+import shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+from sim.result_sink import CSVResultSink, NullResultSink
+
+
+class TestResultSink(unittest.TestCase):
+    """ Check that buffered sinks write the same files as writing each row
+        directly.
+
+        Attributes:
+            _dir (string): temporary directory of the result files
+    """
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_buffered_same_as_direct(self):
+        expected = self._write_rows(CSVResultSink(0), 'direct')
+        self.assertEqual(self._write_rows(CSVResultSink(7), 'buffered'),
+                expected)
+        self.assertEqual(self._write_rows(CSVResultSink(7, True),
+                'background'), expected)
+
+    def test_exists_before_flush(self):
+        sink = CSVResultSink(100)
+        filename = os.path.join(self._dir, 'a.csv')
+        self.assertFalse(sink.exists(filename))
+        sink.write(filename, '0,0,0\n')
+        self.assertTrue(sink.exists(filename))
+        self.assertFalse(os.path.exists(filename))
+        sink.close()
+        self.assertTrue(os.path.exists(filename))
+
+    def test_null_sink_writes_nothing(self):
+        sink = NullResultSink()
+        sink.write(os.path.join(self._dir, 'a.csv'), '0,0,0\n')
+        sink.close()
+        self.assertEqual(os.listdir(self._dir), [])
+
+    def _write_rows(self, sink, prefix):
+        """ Write rows interleaved in two files, then return their content.
+        """
+        names = [os.path.join(self._dir, prefix + str(i)) for i in range(2)]
+        for i in range(100):
+            sink.write(names[i % 3 % 2], '%d,%.2f\n' % (i, i * 0.5))
+        sink.close()
+        content = []
+        for name in names:
+            with open(name, 'rU') as f:
+                content.append(f.read())
+        return content
+
+
+if __name__ == '__main__':
+    unittest.main()
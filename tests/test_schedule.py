@@ -0,0 +1,68 @@
+import sys, os
+import unittest
+import random
+
+sys.path.insert(0, '../src')
+
+from sim import sim
+from sim_fixtures import POLICIES, ListResultSink, make_sim_manager
+
+
+# (WCEC of the nodes of the worst path, period, jitter, initial frequency),
+# where jobs of the last tasks are preempted in the middle of their paths
+TASKS = [([700, 500, 300], 6.0, 0.4, 1000.0),
+        ([2000, 1800, 1500, 900], 15.0, 0.7, 600.0),
+        ([3000, 2500, 2000, 1200], 30.0, 1.0, 400.0)]
+
+
+class TestSchedule(unittest.TestCase):
+    """ Check that jobs replayed from recorded schedules write the same
+        results as jobs whose paths are executed node by node, and that the
+        first preempted step is the one found by checking every chunk.
+    """
+
+    def test_same_as_not_memoized(self):
+        for path_name in ('w', 'm', 'a'):
+            for valentin, result_file in POLICIES:
+                memoized = self._run(path_name, valentin, result_file)
+                replay = sim.SimDVFS._replay_schedule
+                sim.SimDVFS._replay_schedule = \
+                        lambda self, simManager, plan, valentin: 0
+                try:
+                    executed = self._run(path_name, valentin, result_file)
+                finally:
+                    sim.SimDVFS._replay_schedule = replay
+                self.assertEqual(memoized, executed)
+
+    def test_first_preempted_step(self):
+        simManager = make_sim_manager(TASKS[-1:], 1.0, True)
+        task, path = simManager.get_tasks()[0][:2]
+        schedule = task.get_schedule(path, False)
+        chunks = schedule._chunks
+        self.assertTrue(len(chunks) > 2)
+
+        rand = random.Random(13)
+        for i in range(0, 500):
+            sim_time = rand.choice([0, 0.1, 7.3, 1e6 / 3])
+            step, running_time, time_to_execute = rand.choice(chunks)
+            end = sim_time + running_time + time_to_execute
+            horizon = end + rand.choice([-1e-7, -1e-12, 0, 1e-12, 1e-7]) * \
+                    max(1, end)
+            expected = schedule.get_steps()
+            for step, running_time, time_to_execute in chunks:
+                if sim_time + running_time + time_to_execute > horizon:
+                    expected = step
+                    break
+            self.assertEqual(schedule.first_preempted_step(sim_time,
+                    horizon), expected)
+
+    def _run(self, path_name, valentin, result_file):
+        sink = ListResultSink()
+        simManager = make_sim_manager(TASKS, 1.0, True, sink)
+        simManager.run_sim(path_name, valentin, result_file, 2)
+        return (sink.lines, simManager.get_acc_energy(),
+                simManager.get_end_time())
+
+
+if __name__ == '__main__':
+    unittest.main()
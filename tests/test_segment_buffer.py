@@ -0,0 +1,32 @@
+import sys, os
+import unittest
+
+sys.path.insert(0, '../src')
+
+from sim.segment_buffer import SegmentBuffer
+
+
+class TestSegmentBuffer(unittest.TestCase):
+    """ Check that the segment buffer keeps the same segments as a list of
+        tuples when it grows and when it is reused.
+    """
+
+    def test_grow_and_reuse(self):
+        buf = SegmentBuffer(2)
+        segments = [(1000.0, 500 + i, 0.5 * i, 0.5 * i + 0.25)
+                for i in range(0, 9)]
+        for segment in segments:
+            buf.append(*segment)
+        self.assertEqual(len(buf), 9)
+        self.assertEqual(list(buf), segments)
+        self.assertEqual(buf[-1], segments[-1])
+        self.assertRaises(IndexError, buf.__getitem__, 9)
+
+        buf.clear()
+        self.assertEqual(list(buf), [])
+        buf.append(*segments[3])
+        self.assertEqual(list(buf), [segments[3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys, os
+import unittest
+import cPickle
+
+sys.path.insert(0, '../src')
+
+from sim.shared_paths import SharedPaths
+from sim.cfg_paths import CFGPath
+from cfg.cfg_nodes import CFGNodeType
+from sim_fixtures import PathNode
+
+
+class TestSharedPaths(unittest.TestCase):
+    """ Check that paths read from a shared file by an unpickled handle have
+        the same RWCEC and compiled plan, with values of the same type, as
+        the paths that were shared.
+    """
+
+    def test_same_plans(self):
+        cache = _Cache()
+        shared = SharedPaths(cache)
+        paths = shared.find_paths('task.c', [0.15])
+        shared.share()
+        handle = cPickle.dumps(shared, cPickle.HIGHEST_PROTOCOL)
+        self.assertTrue(len(handle) < 1000)
+
+        attached = cPickle.loads(handle)
+        found = attached.find_paths('task.c', [0.15])
+        wpath, mpath, abpaths = paths
+        for path, shared_path in zip([wpath, mpath, abpaths[0.15]],
+                [found[0], found[1], found[2][0.15]]):
+            plan = path.get_plan()
+            shared_plan = shared_path.get_plan()
+            self.assertEqual(shared_path.get_path_rwcec(),
+                    path.get_path_rwcec())
+            self.assertEqual(len(shared_plan.cycles), len(plan.cycles))
+            for i in range(0, len(plan.cycles)):
+                self.assertEqual(repr(shared_plan.cycles[i]),
+                        repr(plan.cycles[i]))
+                self.assertEqual(shared_plan.kinds[i], plan.kinds[i])
+                self.assertEqual(repr(shared_plan.args[i]),
+                        repr(plan.args[i]))
+        self.assertIsNone(found[2][0.3])
+        self.assertRaises(KeyError, attached.find_paths, 'other.c', [0.15])
+
+        attached.close()
+        filename = shared.get_filename()
+        shared.close()
+        self.assertFalse(os.path.exists(filename))
+
+
+class _Cache(object):
+    """ Cache with the interface of PathCache used by SharedPaths. The worst
+        path has integer cycles, the middle one has float cycles and the
+        approximated best one has both, so its plan is not mapped.
+    """
+    def find_paths(self, cfile, approx_percents, exhaustive):
+        wpath = CFGPath(17, [(PathNode(5, 20, CFGNodeType.IF), 5),
+                (PathNode(8, 12), 8), (PathNode(4, 4), 4)])
+        mpath = CFGPath(12.5, [(PathNode(5.5, 12.5, CFGNodeType.IF), 5.5),
+                (PathNode(7.0, 7.0), 7.0)])
+        abpath = CFGPath(9, [(PathNode(5, 9), 5), (PathNode(4.0, 4.0), 4.0)])
+        return wpath, mpath, {0.15: abpath, 0.3: None}
+
+
+if __name__ == '__main__':
+    unittest.main()
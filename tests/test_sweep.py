@@ -0,0 +1,71 @@
+import sys, os
+import unittest
+import shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+import sweep
+from sim import batch_sim
+from sim_fixtures import FakePathCache
+
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'c_files', 'sim_preemp.config')
+
+# processor tables: the configuration one and one whose frequencies are all
+# less than the initial frequencies of the tasks
+PROCESSORS = [('config', {1000.0: 1.8, 800.0: 1.6, 600.0: 1.3, 400.0: 1.0,
+            150.0: 0.75}),
+        ('slow', {700.0: 1.4, 500.0: 1.1, 300.0: 0.9})]
+
+
+class TestSweep(unittest.TestCase):
+    """ Check that a small grid gives one row for each combination, written
+        as CSV, and the same rows in a pool of processes and in batches.
+    """
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_grid(self):
+        rows = self._sweep()
+        self.assertEqual(len(rows), 2 * 2 * 1 * 2 * 3 * 3)
+        self.assertEqual(sorted(set(row[:6] for row in rows)),
+                sorted(row[:6] for row in rows))
+        self.assertTrue(all(row[6] > 0 and row[7] > 0 for row in rows))
+        self.assertNotEqual(rows[0][6], rows[-1][6])
+
+        result_file = os.path.join(self._directory, 'sweep.csv')
+        sweep.write_rows(rows, result_file)
+        with open(result_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0],
+                'Processor,OverheadB,OverheadL,Approx,Study,Path,Energy,End')
+        self.assertEqual(len(lines), len(rows) + 1)
+        self.assertEqual(lines[1].split(',')[:6],
+                ['config', '0', '100', '0.15', 'wfreq', 'w'])
+
+    def test_same_in_pool(self):
+        self.assertEqual(self._sweep(jobs=2), self._sweep())
+
+    @unittest.skipIf(batch_sim.numpy is None, 'numpy is not installed')
+    def test_same_in_batches(self):
+        self.assertEqual(self._sweep(batch=True), self._sweep())
+
+    def test_parse_range(self):
+        self.assertEqual(sweep._parse_range('100,250'), [100.0, 250.0])
+        self.assertEqual(sweep._parse_range('0:400:100'),
+                [0.0, 100.0, 200.0, 300.0, 400.0])
+        self.assertEqual(len(sweep._parse_range('0.1:0.3:0.05')), 5)
+
+    def _sweep(self, jobs=1, batch=False):
+        return sweep.sweep(CONFIG_FILE, PROCESSORS, (0, 300), (100,),
+                (0.15, 0.3), jobs=jobs, path_cache=FakePathCache(),
+                batch=batch)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import sys, os
+import unittest
+import shutil, tempfile
+
+sys.path.insert(0, '../src')
+
+from sim.trace import TraceWriter, TraceReader, append_trace
+from sim_fixtures import JobStateTask
+
+
+class TestTrace(unittest.TestCase):
+    """ Check that jobs written in a binary trace are read back with the same
+        values and segments.
+
+        Attributes:
+            _dir (string): temporary directory of the traces
+            _task (JobStateTask): task whose job state is written
+    """
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._task = JobStateTask(1000, 2, 20, 30, 0.4, 1000,
+                {1000: 1.8, 600: 1.3})
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+
+    def test_write_and_read_jobs(self):
+        trace_dir = os.path.join(self._dir, 'trace')
+        writer = TraceWriter(trace_dir, buffer_jobs=2)
+        for job in range(5):
+            call = job * 30
+            self._task.set_job(call, call + 1, 2, [(1000, 500 + job,
+                    call + 1, call + 1.5), (600, 300, call + 1.5, call + 2)])
+            writer.add_job(self._task, 'wma'[job % 3], 800, job % 2 == 1)
+        writer.close()
+
+        reader = TraceReader(trace_dir)
+        self.assertEqual(len(reader), 5)
+        job = reader.job(3)
+        self.assertEqual(job['task'], 2)
+        self.assertEqual(job['path'], 'w')
+        self.assertEqual(job['valentin'], 1)
+        self.assertEqual(job['call'], 90)
+        self.assertEqual(job['end'], 93)
+        self.assertEqual(job['response'], 3)
+        self.assertEqual(job['total_wcec'], 503 + 300)
+        self.assertAlmostEqual(job['energy'], 503 * 1.8**2 + 300 * 1.3**2)
+        self.assertEqual(reader.segments(3), [(1000, 503, 91, 91.5,
+                503 * 1.8**2), (600, 300, 91.5, 92, 300 * 1.3**2)])
+        self.assertEqual(list(reader.column('cycles'))[::2],
+                [500, 501, 502, 503, 504])
+        reader.close()
+
+    def test_append_trace(self):
+        first = os.path.join(self._dir, 'first')
+        second = os.path.join(self._dir, 'second')
+        for trace_dir, segments in [(first, 1), (second, 3)]:
+            writer = TraceWriter(trace_dir)
+            self._task.set_job(0, 0, 1, [(1000, 10, 0, 1)] * segments)
+            writer.add_job(self._task, 'm', 10, False)
+            writer.close()
+
+        append_trace(second, first)
+        reader = TraceReader(first)
+        self.assertEqual(len(reader), 2)
+        self.assertEqual(len(reader.segments(0)), 1)
+        self.assertEqual(len(reader.segments(1)), 3)
+        reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()